@@ -3,11 +3,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.data.dbinit import get_db
 from app.data.user import User
 from app.service.user import get_current_active_user
-from app.common.exception import DatabaseConnectionException, RecordNotFoundException, IntegrityException, MissingDataException, GeneralDataException
+from app.common.exception import DatabaseConnectionException, RecordNotFoundException, IntegrityException, MissingDataException, GeneralDataException, InvalidCursor
 from app.common.request_metadata import get_request_metadata
 from app.common.messaging import get_rabbitmq_connection
 import aio_pika
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from fastapi.responses import JSONResponse
 from app.service.user_plan_approval import update_plan_header_svc
 from app.service.plan_manager import (add_subscriber_svc, get_subscription_svc, get_subscriber_svc, get_fmp_plans)
@@ -94,13 +94,24 @@ async def get_my_subscribers(fmp: FmpSubscriberGet,
 
 @router.get("/get_fmp_count/", response_model=Optional[List[FmpCountSummary]])
 async def get_my_subscribers(
+    response: Response,
     db: AsyncSession = Depends(get_db), 
     current_user: User = Depends(get_current_active_user),
     limit: int = Query(10, ge=1, le=100),   # default 10, max 100
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),           # only used without a cursor, kept for older clients
+    cursor: Optional[str] = Query(None)
 ):
+    """
+    Public plans of other users, newest first. The X-Next-Cursor response header holds
+    the cursor of the next page and is missing on the last page.
+    """
     try:
-        return await get_fmp_plans(db, current_user, limit, offset)
+        plans, next_cursor = await get_fmp_plans(db, current_user, limit, offset, cursor)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return plans
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.reason)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
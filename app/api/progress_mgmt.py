@@ -1,16 +1,17 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 from app.data.dbinit import get_db
-from typing import List
-from app.service.progress_mgmt import create_progress_update_svc, get_progress_by_user_entity_svc, get_plan_dashboard, get_plan_dashboard_detail, get_user_dashboard
+from typing import List, Optional
+from app.service.progress_mgmt import create_progress_update_svc, create_progress_updates_svc, get_progress_history_svc, get_progress_by_user_entity_svc, get_plan_dashboard, get_plan_dashboard_detail, get_user_dashboard
 from uuid import UUID
-from app.model.progress_mgmt import  ProgressUpdateCreate, ProgressUpdateOut, ProgressUpdateSummaryInput
+from app.model.progress_mgmt import  ProgressUpdateCreate, ProgressUpdateOut, ProgressUpdateSummaryInput, ProgressUpdateBatch, ProgressUpdateBatchOut, ProgressHistoryOut
 from app.common.request_metadata import get_request_metadata
 from app.service.user import get_current_active_user
 from app.data.user import User
 from app.common.rewards_init import get_rewards_service
 from app.service.rewards import RewardsService
+from app.common.exception import InvalidCursor
 
 
 router = APIRouter()
@@ -26,6 +27,37 @@ async def post_progress_update(pro_update: ProgressUpdateCreate,
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/progress/updates", response_model=ProgressUpdateBatchOut)
+async def post_progress_updates(batch: ProgressUpdateBatch,
+                                db: AsyncSession = Depends(get_db),
+                                rs = Depends(get_request_metadata),
+                                current_user: User = Depends(get_current_active_user)):
+    """
+    Several progress updates in one call, e.g. when a client syncs progress recorded
+    offline. Updates of the same entity are applied in order, the last one wins.
+    """
+    try:
+        return await create_progress_updates_svc(db, batch, rs, current_user)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/progress/history/{entity_id}", response_model=ProgressHistoryOut)
+async def get_progress_history(entity_id: UUID,
+                               db: AsyncSession = Depends(get_db),
+                               current_user: User = Depends(get_current_active_user),
+                               limit: int = Query(20, ge=1, le=100),
+                               cursor: Optional[str] = Query(None)):
+    """
+    Progress updates of a task, newest first. Older updates are compacted into summary
+    entries (event_count > 1). Pass next_cursor back as cursor for the next page.
+    """
+    try:
+        return await get_progress_history_svc(db, entity_id, current_user, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=e.reason)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 '''
 @router.get("/progress/{entity_id}", response_model=ProgressSummary)
 async def get_progress( db: AsyncSession = Depends(get_db),current_user: User = Depends(get_current_active_user), entity_id: UUID = None):
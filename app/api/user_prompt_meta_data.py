@@ -7,9 +7,11 @@ from app.service.user_plan_approval import  (build_approved_plan,
                                              update_approved_plan_dates, 
                                              set_reminder_svc, 
                                              update_objective_status_svc,
+                                             bulk_set_reminder_svc,
+                                             bulk_update_objective_status_svc,
                                              get_child_tasks_svc
                                             )
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, status, Query, Request
 from fastapi.responses import JSONResponse
 from app.model.user_prompt_response import (PlanDetailForUserManagement, 
                                             UXUserPromptInfo, 
@@ -20,6 +22,8 @@ from app.model.user_plan import (UserPlanIdentifier,
                                  UXPlanApprovalPL, 
                                  UXApprovedPlanDetail, 
                                  UXUpdateApprovedPlan, 
+                                 UXBulkReminderUpdate,
+                                 UXBulkStatusUpdate,
                                  UXUpcomingActivitiesRequest, 
                                  UXUpcomingActivitiesResponseRS, 
                                  UXUserPlanIdentifierRS,
@@ -29,11 +33,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.data.dbinit import get_db
 from app.data.user import User
 from app.service.user import get_current_active_user
-from app.common.exception import DatabaseConnectionException, IntegrityException, GeneralDataException, UserNotFound, PlanIllegalText, PlanAlreadyApproved, PlanContextChange, NotEnoughInfoToGenerateGoal
+from app.common.exception import DatabaseConnectionException, RecordNotFoundException, IntegrityException, GeneralDataException, UserNotFound, PlanIllegalText, PlanAlreadyApproved, PlanContextChange, NotEnoughInfoToGenerateGoal, InvalidCursor
 from app.common.request_metadata import get_request_metadata
 from app.common.messaging import get_rabbitmq_connection
 from app.common.rewards_init import get_rewards_service
 from app.service.rewards import RewardEarnedResponse, RewardsService
+from app.service.supplement_info import precompute_supplement_links_svc
+from app.service.plan_snapshot import serve_plan_snapshot
+from app.common.responses import ModelJSONResponse
+from app.common.qdrant_common import QdrantClient
 import aio_pika
 from typing import Optional, List
 from uuid import UUID
@@ -145,10 +153,11 @@ async def api_build_approved_plan(plan_input: UXPlanApprovalPL, db: AsyncSession
 
 
 @router.post("/approveplan/", response_model=UXApprovedPlanDetail)
-async def api_build_approved_plan(plan_input: UXPlanApprovalPL, db: AsyncSession = Depends(get_db), 
+async def api_build_approved_plan(plan_input: UXPlanApprovalPL, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), 
                                   current_user: User = Depends(get_current_active_user),
                                   request_metadata = Depends(get_request_metadata),
-                                  rewards_service: RewardsService = Depends(get_rewards_service)):
+                                  rewards_service: RewardsService = Depends(get_rewards_service),
+                                  client: QdrantClient = Depends(QdrantClient)):
 
     """
 
@@ -161,7 +170,10 @@ async def api_build_approved_plan(plan_input: UXPlanApprovalPL, db: AsyncSession
     """
 
     try:
-        return await build_approved_plan(plan_input, db, current_user, request_metadata, rewards_service )
+        approved_plan = await build_approved_plan(plan_input, db, current_user, request_metadata, rewards_service )
+        # supplement links are computed once per approved plan, after the approval is committed
+        background_tasks.add_task(precompute_supplement_links_svc, str(plan_input.plan_id), client)
+        return ModelJSONResponse(approved_plan)
         #return await build_approved_plan(plan_input, db, current_user, request_metadata )
     except PlanAlreadyApproved as e:
         logger.error(f" Plan Already exists")
@@ -261,6 +273,11 @@ async def set_reminder(plan_input: UXUpdateApprovedPlan, db: AsyncSession = Depe
         
         nRet = await set_reminder_svc(plan_input, db, current_user, request_metadata)
         return JSONResponse(status_code=200, content={"detail": "Successfully completed"})
+    except RecordNotFoundException as e:
+        raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=e.message,
+            )
     except DatabaseConnectionException as e:
         raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -302,6 +319,11 @@ async def set_objective_status(plan_input: UXUpdateApprovedPlan, db: AsyncSessio
         
         nRet = await update_objective_status_svc(plan_input, db, current_user, request_metadata)
         return JSONResponse(status_code=200, content={"detail": "Successfully completed"})
+    except RecordNotFoundException as e:
+        raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=e.message,
+            )
     except DatabaseConnectionException as e:
         raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -324,6 +346,81 @@ async def set_objective_status(plan_input: UXUpdateApprovedPlan, db: AsyncSessio
                 detail= f"Unable to create user plan {str(e)}",
             )
 
+@router.post("/setreminders/", response_model=UXApprovedPlanDetail)
+async def set_reminders(plan_input: UXBulkReminderUpdate, db: AsyncSession = Depends(get_db),
+                        current_user: User = Depends(get_current_active_user),
+                        request_metadata = Depends(get_request_metadata)):
+    """
+    Thie API is used to set reminders for several tasks of an approved plan in one call.
+
+    following fields are mandatory
+
+    plan_id,
+    changes: a list of entity_id, sequence_id, reminder_request and request_reminder_time
+
+    Returns the updated tasks. Use HH:MM for request_reminder_time, as for /setreminder/.
+    """
+    try:
+        return ModelJSONResponse(await bulk_set_reminder_svc(plan_input, db, current_user, request_metadata))
+    except RecordNotFoundException as e:
+        raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=e.message,
+            )
+    except GeneralDataException as e:
+        raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                 detail=f"Unable to set the reminders {str(e)}",
+            )
+    except IntegrityException as e:
+        raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                 detail=f"Unable to set the reminders {e.message}",
+            )
+    except Exception as e:
+        raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail= f"Unable to set the reminders {str(e)}",
+            )
+
+@router.post("/updateobjectivestatuses/", response_model=UXApprovedPlanDetail)
+async def set_objective_statuses(plan_input: UXBulkStatusUpdate, db: AsyncSession = Depends(get_db),
+                                 current_user: User = Depends(get_current_active_user),
+                                 request_metadata = Depends(get_request_metadata)):
+    """
+    Thie API is used to set the status of several tasks of an approved plan in one call,
+    for example when a whole day is checked off.
+
+    following fields are mandatory
+
+    plan_id,
+    changes: a list of entity_id, sequence_id and status_id
+
+    Returns the updated tasks.
+    """
+    try:
+        return ModelJSONResponse(await bulk_update_objective_status_svc(plan_input, db, current_user, request_metadata))
+    except RecordNotFoundException as e:
+        raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=e.message,
+            )
+    except GeneralDataException as e:
+        raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                 detail=f"Unable to update the objective status {str(e)}",
+            )
+    except IntegrityException as e:
+        raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                 detail=f"Unable to update the objective status {e.message}",
+            )
+    except Exception as e:
+        raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail= f"Unable to update the objective status {str(e)}",
+            )
+
 '''
 @router.post("/getplanimpersonate/", response_model=UXUserPlanIdentifierRS)
 async def get_plan_impersonate_api(fmp: FmpSubscriberGet, db: AsyncSession = Depends(get_db), 
@@ -360,11 +457,19 @@ async def get_plan_impersonate_api(fmp: FmpSubscriberGet, db: AsyncSession = Dep
 @router.post("/getallplans/", response_model=UXUserPlanIdentifierRS)
 async def get_approved_plan(db: AsyncSession = Depends(get_db), 
                             current_user: User = Depends(get_current_active_user),
-                            request_metadata = Depends(get_request_metadata)):
+                            request_metadata = Depends(get_request_metadata),
+                            limit: int = Query(100, ge=1, le=500),
+                            cursor: Optional[str] = Query(None)):
+    """
+    Plans of the user, newest first. Pass next_cursor of a response as cursor to get
+    the next page.
+    """
     try:
-        return await get_all_plans(db, current_user, request_metadata)
+        return await get_all_plans(db, current_user, request_metadata, limit, cursor)
     except UserNotFound as e:
         raise e
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.reason)
     except DatabaseConnectionException as e:
         raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -396,6 +501,8 @@ async def get_executable_plan_activities(
     try:
         print (f"The plan id is {obj.plan_id}")
         return await get_upcoming_activities_svc(obj,db, current_user, request_metadata)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.reason)
     except DatabaseConnectionException as e:
         raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -422,9 +529,16 @@ async def get_executable_plan_activities(
 @router.post("/getcreatedplandetail/{plan_id}", response_model=PlanDetailForUserManagement)
 async def get_created_plan_detail(plan_id: str,
                         db: AsyncSession = Depends(get_db), 
-                        current_user: User = Depends(get_current_active_user)):
+                        current_user: User = Depends(get_current_active_user),
+                        if_none_match: Optional[str] = Header(None)):
+    """
+    Served from the plan snapshot with an ETag; send it back in If-None-Match to get
+    304 Not Modified while the plan is unchanged.
+    """
     try:
-        return await get_created_plan_detail_svc(plan_id=plan_id, db=db, current_user=current_user)
+        return await serve_plan_snapshot(plan_id, "created", if_none_match,
+                                         lambda: get_created_plan_detail_svc(plan_id=plan_id, db=db, current_user=current_user),
+                                         db, current_user)
     except DatabaseConnectionException as e:
         raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -453,7 +567,7 @@ async def get_created_plan_detail(plan_id: str,
                         db: AsyncSession = Depends(get_db), 
                         current_user: User = Depends(get_current_active_user)):
     try:
-        return await get_created_plan_detail_svc(plan_id=plan_id, db=db, current_user=current_user, fmp_flag="yes")
+        return ModelJSONResponse(await get_created_plan_detail_svc(plan_id=plan_id, db=db, current_user=current_user, fmp_flag="yes"))
     except DatabaseConnectionException as e:
         raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -480,9 +594,16 @@ async def get_created_plan_detail(plan_id: str,
 @router.get("/getexecutedplandetail/{plan_id}", response_model=UXApprovedPlanDetail)
 async def get_executed_plan_detail(plan_id: str,
                         db: AsyncSession = Depends(get_db), 
-                        current_user: User = Depends(get_current_active_user)):
+                        current_user: User = Depends(get_current_active_user),
+                        if_none_match: Optional[str] = Header(None)):
+    """
+    Served from the plan snapshot with an ETag; send it back in If-None-Match to get
+    304 Not Modified while the plan is unchanged.
+    """
     try:
-        return await get_executable_plan_detail_svc(plan_id=plan_id, db=db, current_user=current_user)
+        return await serve_plan_snapshot(plan_id, "executed", if_none_match,
+                                         lambda: get_executable_plan_detail_svc(plan_id=plan_id, db=db, current_user=current_user),
+                                         db, current_user)
     except DatabaseConnectionException as e:
         raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
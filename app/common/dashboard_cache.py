@@ -0,0 +1,127 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+import structlog
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+
+logger = structlog.get_logger()
+
+
+class _Entry:
+    def __init__(self, value: Any):
+        self.value = value
+        self.loaded_at = time.monotonic()
+
+
+class DashboardCache:
+    """
+    Process local cache of the dashboard responses, one bucket per user holding one
+    entry per dashboard (key), users evicted in LRU order. An entry is served as is for
+    ttl seconds; for stale seconds after that it is still served while a background
+    refresh replaces it; older entries are loaded before answering. Only one load per
+    key runs at a time, concurrent requests for the key wait for it.
+
+    Writes that change a user's dashboards call invalidate_after_commit. Other worker
+    processes keep their own copy, so there the old figures live on for up to ttl
+    seconds plus one stale read.
+    """
+
+    def __init__(self, ttl: float, stale: float, max_users: int = 10000):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_users = max_users
+        self._users: "OrderedDict[str, Dict[Hashable, _Entry]]" = OrderedDict()
+        self._loads: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._refresh_errors = 0
+        self._refresh_seconds = deque(maxlen=1000)
+
+    async def get(self, user_id, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        user_id = str(user_id)
+        entry = self._users.get(user_id, {}).get(key)
+        age = time.monotonic() - entry.loaded_at if entry is not None else None
+        if age is not None and age < self.ttl:
+            self._hits += 1
+            self._users.move_to_end(user_id)
+            return entry.value
+        if age is not None and age < self.ttl + self.stale:
+            self._stale_hits += 1
+            self._users.move_to_end(user_id)
+            self._start_load(user_id, key, load)
+            return entry.value
+        self._misses += 1
+        return await asyncio.shield(self._start_load(user_id, key, load))
+
+    def invalidate(self, user_id):
+        """Drop the user's entries; loads already running are not stored."""
+        user_id = str(user_id)
+        self._users.pop(user_id, None)
+        for load_key in [k for k in self._loads if k[0] == user_id]:
+            self._loads.pop(load_key)
+
+    def invalidate_after_commit(self, db: AsyncSession, user_id):
+        """
+        Invalidate once the session's transaction commits, so a load running in between
+        cannot put the figures from before the write back into the cache.
+        """
+        event.listen(db.sync_session, "after_commit", lambda session: self.invalidate(user_id), once=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._stale_hits + self._misses
+        refreshes = sorted(self._refresh_seconds)
+        return {
+            "users": len(self._users),
+            "hits": self._hits,
+            "stale_hits": self._stale_hits,
+            "misses": self._misses,
+            "hit_ratio": round((self._hits + self._stale_hits) / lookups, 4) if lookups else None,
+            "refreshes_in_flight": len(self._loads),
+            "refresh_errors": self._refresh_errors,
+            "refresh_ms_avg": round(1000 * sum(refreshes) / len(refreshes), 2) if refreshes else None,
+            "refresh_ms_p95": round(1000 * refreshes[int(0.95 * (len(refreshes) - 1))], 2) if refreshes else None,
+            "refresh_ms_max": round(1000 * refreshes[-1], 2) if refreshes else None,
+        }
+
+    def _start_load(self, user_id: str, key: Hashable, load: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        load_key = (user_id, key)
+        task = self._loads.get(load_key)
+        if task is None:
+            task = asyncio.create_task(self._load(load_key, load))
+            # a failed background refresh has no one waiting for it, its error is logged in _load
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._loads[load_key] = task
+        return task
+
+    async def _load(self, load_key: Tuple[str, Hashable], load: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.monotonic()
+        try:
+            value = await load()
+        except Exception as e:
+            self._refresh_errors += 1
+            logger.error(f"Loading dashboard {load_key[1]} of user {load_key[0]} failed: {str(e)}")
+            raise
+        finally:
+            self._refresh_seconds.append(time.monotonic() - started)
+            # not the registered load any more when invalidated meanwhile, the value may predate the write
+            current = self._loads.get(load_key) is asyncio.current_task()
+            if current:
+                self._loads.pop(load_key)
+        if current:
+            user_id, key = load_key
+            self._users.setdefault(user_id, {})[key] = _Entry(value)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return value
+
+
+dashboard_cache = DashboardCache(ttl=settings.DASHBOARD_CACHE_TTL_SECONDS,
+                                 stale=settings.DASHBOARD_CACHE_STALE_SECONDS,
+                                 max_users=settings.DASHBOARD_CACHE_MAX_USERS)
@@ -0,0 +1,26 @@
+from openai import AsyncOpenAI
+from typing import List, Optional
+from app.config.config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+
+async def get_embeddings(texts: List[str], model: str = EMBEDDING_MODEL, dimensions: Optional[int] = None) -> List[List[float]]:
+    """
+    Embed a list of texts with one OpenAI call. The response keeps the input order.
+    dimensions is only supported by the text-embedding-3 models.
+    """
+    if not texts:
+        return []
+    ai_client = AsyncOpenAI(api_key=settings.OPEN_AI_API_KEY)
+    try:
+        if dimensions:
+            response = await ai_client.embeddings.create(input=texts, model=model, dimensions=dimensions)
+        else:
+            response = await ai_client.embeddings.create(input=texts, model=model)
+        return [item.embedding for item in sorted(response.data, key=lambda x: x.index)]
+    finally:
+        await ai_client.close()
@@ -82,4 +82,8 @@ class YoudraOpenAIError(Exception):
 class YoudraGeminiError(Exception): 
     def __init__(self, prompt_text: str, reason: str = "User not found"):
         self.prompt_text = prompt_text
-        self.reason = reason
\ No newline at end of file
+        self.reason = reason
+class InvalidCursor(Exception): 
+    def __init__(self, cursor: str, reason: str = "The page cursor is not valid"):
+        self.cursor = cursor
+        self.reason = reason
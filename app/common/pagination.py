@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from uuid import UUID
+from app.common.exception import InvalidCursor
+import base64
+import json
+
+# Keyset pagination: a page is the rows after the sort key of the last row of the
+# previous page, so every page is one index range scan however deep it is. The
+# cursor is that sort key, encoded so clients treat it as an opaque token.
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps([_plain(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], *types: Callable[[Any], Any]) -> Optional[Tuple[Any, ...]]:
+    """
+    Sort key of a cursor, each part converted with the matching entry of types, e.g.
+    decode_cursor(cursor, datetime.fromisoformat, UUID). None when there is no cursor.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong number of key parts")
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError, AttributeError) as e:
+        # AttributeError: a part of the wrong JSON type, e.g. UUID(123)
+        raise InvalidCursor(cursor, f"The page cursor is not valid: {str(e)}")
+
+
+def page_of(rows: Sequence[Any], limit: int, key: Callable[[Any], Tuple[Any, ...]]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Split rows fetched with LIMIT limit + 1 into the page and the cursor of the next
+    page, which is None on the last page.
+    """
+    page = list(rows[:limit])
+    if len(rows) > limit and page:
+        return page, encode_cursor(*key(page[-1]))
+    return page, None
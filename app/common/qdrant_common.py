@@ -1,6 +1,10 @@
 
 from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
 from app.config.config import settings
+import structlog
+
+logger = structlog.get_logger()
 
 class QdrantClient:
     def __init__(self):
@@ -38,4 +42,66 @@ class QdrantClient:
         except Exception as e:
             print(f"Error closing Qdrant client: {e}")
             raise RuntimeError("Failed to close Qdrant client") from e
-        
\ No newline at end of file
+        
+
+# Payload fields the services filter on. Without a payload index every filtered
+# search or scroll has to scan the payload of the whole collection.
+KEYWORD_PAYLOAD_FIELDS = ["session_id", "plan_id"]
+
+# int8 scalar quantization keeps a 4x smaller copy of the vectors in RAM for the
+# HNSW traversal; the candidates are rescored against the original float32 vectors.
+QUANTIZATION_CONFIG = models.ScalarQuantization(
+    scalar=models.ScalarQuantizationConfig(
+        type=models.ScalarType.INT8,
+        quantile=0.99,
+        always_ram=True
+    )
+)
+
+QUANTIZED_SEARCH_PARAMS = models.SearchParams(
+    quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0)
+)
+
+_known_collections = set()
+
+
+async def create_payload_indexes(client, collection_name: str):
+    for field_name in KEYWORD_PAYLOAD_FIELDS:
+        await client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+
+
+async def tune_collection(client, collection_name: str):
+    """
+    Apply the payload indexes and the quantization config to an existing collection.
+    Both calls are idempotent on the Qdrant side, but changing the quantization makes
+    Qdrant re-optimize the whole collection, so this is an admin step
+    (scripts/tune_qdrant_collections.py), never called while serving requests.
+    """
+    await create_payload_indexes(client, collection_name)
+    await client.update_collection(
+        collection_name=collection_name,
+        quantization_config=QUANTIZATION_CONFIG
+    )
+    logger.info(f"Applied payload indexes and quantization to collection {collection_name}")
+
+
+async def ensure_collection(client, collection_name: str, vector_size: int):
+    """
+    Create the collection with cosine distance, int8 quantization and the keyword
+    payload indexes if it is missing. Existing collections are left as they are.
+    """
+    if collection_name in _known_collections:
+        return
+    if not await client.collection_exists(collection_name):
+        await client.create_collection(
+            collection_name=collection_name,
+            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+            quantization_config=QUANTIZATION_CONFIG
+        )
+        await create_payload_indexes(client, collection_name)
+        logger.info(f"Created collection {collection_name}")
+    _known_collections.add(collection_name)
@@ -0,0 +1,14 @@
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+class ModelJSONResponse(Response):
+    """
+    JSON response for a pydantic model that is already validated. Returning it skips
+    the response_model round trip (dump, validate again, jsonable_encoder, json.dumps)
+    and serializes once in pydantic-core, with the same output.
+    """
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.__pydantic_serializer__.to_json(content)
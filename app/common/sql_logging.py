@@ -0,0 +1,16 @@
+from app.config.config import settings
+import structlog
+import random
+
+logger = structlog.get_logger()
+
+
+def log_sampled_sql(name: str, stmt) -> None:
+    """
+    Log the SQL of a statement for a sample of the calls (SQL_LOG_SAMPLE_RATE, 0 turns
+    it off, 1 logs every call). The statement is only compiled when it is logged.
+    """
+    rate = settings.SQL_LOG_SAMPLE_RATE
+    if rate <= 0 or random.random() >= rate:
+        return
+    logger.info(f"Generated SQL for {name} (sampled at {rate}): {stmt}")
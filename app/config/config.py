@@ -92,6 +92,15 @@ class Settings(BaseSettings):
     STRIPE_SECRET_KEY: str = ""
     STRIPE_WEBHOOK_SECRET: str = ""
     STRIPE_CUSTOM_SEAT_PRICE_ID: str = ""
+    SUPPLEMENT_TOP_K: int = 5
+    BULK_COPY_ROW_THRESHOLD: int = 500
+    PLAN_DOCUMENT_MODE: bool = False
+    DB_READ_POOL_SIZE: int = 4
+    SQL_LOG_SAMPLE_RATE: float = 0.01
+    PROGRESS_EVENT_RETENTION_DAYS: int = 90
+    DASHBOARD_CACHE_TTL_SECONDS: int = 30
+    DASHBOARD_CACHE_STALE_SECONDS: int = 300
+    DASHBOARD_CACHE_MAX_USERS: int = 10000
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         """Get SQLAlchemy database URI"""
@@ -0,0 +1,52 @@
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Sequence
+from app.config.config import settings
+import asyncpg
+import structlog
+
+logger = structlog.get_logger()
+
+# asyncpg caps a statement at 32767 bind parameters, so multi-row inserts are split
+# into chunks that stay below it for the widest table written this way
+BULK_INSERT_CHUNK_SIZE = 2000
+
+
+async def copy_records(db: AsyncSession, table_name: str, columns: Sequence[str], records: List[tuple]) -> int:
+    """
+    Stream records into a table with COPY on the session's own connection, so the rows
+    are part of the request transaction and are rolled back with it. Constraint
+    violations are raised as IntegrityError like any other statement of the session.
+    """
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    if not driver_connection.is_in_transaction():
+        # the asyncpg adapter opens its transaction on the first statement, COPY
+        # through the driver would otherwise run outside of it and autocommit
+        await db.execute(text("SELECT 1"))
+    try:
+        await driver_connection.copy_records_to_table(table_name, records=records, columns=list(columns))
+    except asyncpg.exceptions.IntegrityConstraintViolationError as e:
+        raise IntegrityError(f"COPY {table_name}", None, e)
+    return len(records)
+
+
+async def bulk_insert_rows(db: AsyncSession, model, rows: List[Dict[str, Any]]) -> int:
+    """
+    Write rows of a model with the cheapest path for their number. Up to
+    BULK_COPY_ROW_THRESHOLD rows go out as multi-row INSERTs, larger batches use COPY.
+    Every row must have the same keys.
+    """
+    if not rows:
+        return 0
+    if len(rows) > settings.BULK_COPY_ROW_THRESHOLD:
+        columns = list(rows[0])
+        records = [tuple(row[column] for column in columns) for row in rows]
+        logger.info(f"Copying {len(records)} rows into {model.__tablename__}")
+        return await copy_records(db, model.__tablename__, columns, records)
+
+    for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+        await db.execute(insert(model).values(rows[start:start + BULK_INSERT_CHUNK_SIZE]))
+    return len(rows)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, func
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Text, func
 from sqlalchemy.dialects.postgresql import UUID
 from app.data.dbinit import Base
 import uuid
@@ -20,4 +20,22 @@ class ProgressUpdate(Base):
     progress_percent = Column(Integer, nullable=False)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True),  server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ProgressEvent(Base):
+    """
+    Append-only history of progress updates, one row per update; progress_update only
+    keeps the latest state. compact_progress_events folds old events of an entity into a
+    single summary row, event_count says how many updates a row stands for.
+    """
+    __tablename__ = 'progress_event'
+
+    id = Column(BigInteger, primary_key=True)
+    plan_id = Column(UUID(as_uuid=True), nullable=False)
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    progress_percent = Column(Integer, nullable=False)
+    notes = Column(Text, nullable=True)
+    event_count = Column(Integer, nullable=False, server_default="1")
+    first_created_at = Column(DateTime(timezone=True), nullable=True)  # oldest update of a summary row
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from pathlib import Path
 from fastapi import FastAPI, Depends, HTTPException
@@ -7,7 +8,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy import Column, Integer, Float, Boolean, String
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, List, Optional
 from app.config.config import settings
 
 import structlog
@@ -42,11 +43,35 @@ SessionLocal = async_sessionmaker(
     expire_on_commit=False  # Important for async operations
 )
 
+# Separate pool for the read fan-out in gather_reads. Fan-out queries never wait on
+# the request pool, so requests that already hold a connection cannot starve each other.
+read_engine = create_async_engine(
+    settings.SQLALCHEMY_DATABASE_URI,
+    connect_args={'ssl':'require'},
+    pool_pre_ping=True,
+    pool_size=settings.DB_READ_POOL_SIZE,
+    max_overflow=0,
+    pool_recycle=3600
+)
+
+ReadSessionLocal = async_sessionmaker(
+    autoflush=False,
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+# queued here rather than in the pool, which would give up after pool_timeout
+_read_slots = asyncio.Semaphore(settings.DB_READ_POOL_SIZE)
+
 # Base class for declarative models
 Base = declarative_base()
 print ("I have connected to the db")
 from app.data import billing  # noqa: E402
 from app.data import org_member  # noqa: E402
+from app.data import plan_snapshot  # noqa: E402
+from app.data import plan_dashboard  # noqa: E402
+from app.data import migrations  # noqa: E402
 async def get_db():
     db = SessionLocal()
     try:
@@ -59,6 +84,19 @@ async def get_db():
     finally:
         await db.close()
 
+async def gather_reads(*reads: Callable[[AsyncSession], Awaitable[Any]]) -> List[Any]:
+    """
+    Run independent read-only queries concurrently, each on its own session from the
+    read pool, and return their results in order. The reads run outside the caller's
+    transaction and do not see its uncommitted writes.
+    """
+    async def run(read):
+        async with _read_slots:
+            async with ReadSessionLocal() as db:
+                return await read(db)
+
+    return list(await asyncio.gather(*(run(read) for read in reads)))
+
 # Updated to work with async
 async def execute_sql(query, params=None, fetch=True):
     """
@@ -81,6 +119,8 @@ async def init_db():
         print("I am inside init db")
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+        # everything create_all does not cover (columns, indexes, triggers)
+        await migrations.apply_migrations(engine)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
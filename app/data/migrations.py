@@ -0,0 +1,274 @@
+import asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from typing import List
+from app.data.plan_snapshot import PLAN_VERSIONED_TABLES
+import structlog
+
+logger = structlog.get_logger()
+
+# create_all only creates missing tables. Every other schema change (added columns,
+# indexes, functions, triggers) is a numbered migration below, applied once per
+# database in version order and recorded in schema_migrations. Never edit a migration
+# that has shipped, add a new one.
+
+# advisory lock key, held while migrating so instances starting together take turns
+MIGRATION_LOCK_KEY = 4207310001
+
+# Waiters poll pg_try_advisory_lock instead of blocking in pg_advisory_lock. A backend
+# blocked in a statement holds a snapshot, and CREATE INDEX CONCURRENTLY in the running
+# migration waits for every older snapshot to go away, so a blocked waiter would never
+# be let through. Between polls a waiter is idle and holds none.
+MIGRATION_LOCK_POLL_SECONDS = 1.0
+
+CREATE_MIGRATION_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(128) NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+
+class Migration:
+    """
+    One schema change. A transactional migration runs all of its statements and its
+    schema_migrations row in one transaction. A non transactional one runs each
+    statement on its own (CREATE INDEX CONCURRENTLY cannot run in a transaction), so
+    every statement must be safe to repeat after a partial run.
+    """
+    def __init__(self, version: int, name: str, statements: List[str], transactional: bool = True):
+        self.version = version
+        self.name = name
+        self.statements = statements
+        self.transactional = transactional
+
+
+# not started tasks of a set of executable_plan rows by plan and UTC start day, each
+# counted as sign; the upsert adds them to plan_open_task_day (migration 7)
+def _open_task_rows(rows: str, sign: str) -> str:
+    return (f"SELECT plan_id, coalesce((start_date AT TIME ZONE 'UTC')::date, 'infinity'::date) AS start_day, "
+            f"{sign} AS n FROM {rows} WHERE status_id = 0 AND entity_type NOT IN (2, 1000, 999)")
+
+
+_OPEN_TASK_DAY_UPSERT = """INSERT INTO plan_open_task_day (plan_id, start_day, open_tasks)
+                    SELECT plan_id, start_day, sum(n) FROM ({rows}) c
+                    GROUP BY plan_id, start_day HAVING sum(n) <> 0 ORDER BY plan_id, start_day
+                    ON CONFLICT (plan_id, start_day) DO UPDATE
+                    SET open_tasks = plan_open_task_day.open_tasks + EXCLUDED.open_tasks"""
+
+
+MIGRATIONS = [
+    # the DDL that used to be re-run at every startup, idempotent so it also applies
+    # cleanly to databases that already ran it
+    Migration(1, "baseline_schema_patches", [
+        "ALTER TABLE user_plan_activity_helper_data ADD COLUMN IF NOT EXISTS plan_id UUID",
+        "ALTER TABLE user_plan_activity_helper_data ADD COLUMN IF NOT EXISTS relevance_score DOUBLE PRECISION",
+        """CREATE INDEX IF NOT EXISTS ix_activity_helper_plan_entity
+            ON user_plan_activity_helper_data (plan_id, entity_id, relevance_score DESC)""",
+        "ALTER TABLE created_plan ADD COLUMN IF NOT EXISTS content_hash VARCHAR(40)",
+        # keyset pagination of the plan lists (get_plans_page, get_fmp_by_count); the
+        # first one also serves every lookup of a user's plans by user_id
+        """CREATE INDEX IF NOT EXISTS ix_user_plan_user_created
+            ON user_plan (user_id, created_dt DESC, plan_id DESC)""",
+        """CREATE INDEX IF NOT EXISTS ix_user_plan_public_created
+            ON user_plan (created_dt DESC, plan_id DESC) WHERE private_flag = 0""",
+    ]),
+    Migration(2, "plan_version_triggers", [
+        # statement level, so a plan written in one multi-row statement is bumped once
+        """CREATE OR REPLACE FUNCTION plan_version_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                INSERT INTO plan_version (plan_id, version)
+                SELECT DISTINCT plan_id, 1 FROM changed_rows WHERE plan_id IS NOT NULL
+                ON CONFLICT (plan_id) DO UPDATE SET version = plan_version.version + 1;
+                RETURN NULL;
+            END
+        $$""",
+    ] + [
+        # transition tables allow one event per trigger; skipped where the trigger exists
+        f"""DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_{table}_version_{event.lower()}') THEN
+                CREATE TRIGGER trg_{table}_version_{event.lower()} AFTER {event} ON {table}
+                REFERENCING {transition} TABLE AS changed_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION plan_version_bump();
+            END IF;
+        END $$"""
+        for table in PLAN_VERSIONED_TABLES
+        for event, transition in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD"))
+    ]),
+    # indexes for the hot predicates, built concurrently so writes to these tables are
+    # not blocked while they build. scripts/check_query_plans.py checks they are used.
+    Migration(3, "hot_path_indexes", [
+        # progress rollup: the parent of an updated task, then the children of that parent
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_executable_plan_entity
+            ON executable_plan (entity_id)""",
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_executable_plan_parent_type
+            ON executable_plan (parent_id, entity_type)""",
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_goal_builder_root
+            ON goal_builder (root_id)""",
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_progress_update_entity
+            ON progress_update (entity_id, plan_id)""",
+        # same name as the index behind the unique constraint create_all declares, so
+        # this only builds it where the constraint is missing
+        """CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS org_member_invite_token_key
+            ON org_member (invite_token)""",
+    ], transactional=False),
+    # get_upcoming_activities_db reads one partial index per branch of its UNION ALL and
+    # only needs the included columns to pick the page
+    Migration(4, "upcoming_activity_indexes", [
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_executable_plan_in_progress
+            ON executable_plan (plan_id, sequence_id, entity_id) INCLUDE (entity_type) WHERE status_id = 1""",
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_executable_plan_not_started
+            ON executable_plan (plan_id, start_date) INCLUDE (sequence_id, entity_id, entity_type) WHERE status_id = 0""",
+    ], transactional=False),
+    # running totals for the incremental progress rollup, NULL until a parent's first rollup
+    Migration(5, "progress_rollup_totals", [
+        "ALTER TABLE progress_tracking ADD COLUMN IF NOT EXISTS child_progress_sum DOUBLE PRECISION",
+        "ALTER TABLE progress_tracking ADD COLUMN IF NOT EXISTS child_count INTEGER",
+    ]),
+    # progress history moves to the append-only progress_event; progress_update and
+    # progress_tracking keep the latest note only. The history built up so far becomes
+    # one event per task, then the accumulated notes are cut to their last line.
+    Migration(6, "progress_event_log", [
+        """CREATE INDEX IF NOT EXISTS ix_progress_event_entity
+            ON progress_event (entity_id, created_at DESC, id DESC)""",
+        """INSERT INTO progress_event (plan_id, entity_id, progress_percent, notes, first_created_at, created_at)
+            SELECT plan_id, entity_id, progress_percent, nullif(btrim(notes), ''),
+                   created_at, coalesce(updated_at, created_at)
+            FROM progress_update
+            WHERE NOT EXISTS (SELECT 1 FROM progress_event)""",
+        "UPDATE progress_update SET notes = regexp_replace(rtrim(notes, chr(10) || ' '), '^.*\\n', '') WHERE notes LIKE '%' || chr(10) || '%'",
+        "UPDATE progress_tracking SET notes = regexp_replace(rtrim(notes, chr(10) || ' '), '^.*\\n', '') WHERE notes LIKE '%' || chr(10) || '%'",
+    ]),
+    # dashboard aggregates of app/data/plan_dashboard.py, kept in step by statement level
+    # triggers so a bulk write adjusts each plan once. Creating a trigger locks its table
+    # against writes until the migration commits, so the backfill below is exact.
+    Migration(7, "plan_dashboard_aggregates", [
+        """CREATE OR REPLACE FUNCTION plan_dashboard_count_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO plan_dashboard (plan_id, task_change_count, plan_change_count)
+                    SELECT plan_id,
+                           CASE WHEN TG_TABLE_NAME = 'plan_detail_change_log' THEN count(*) ELSE 0 END,
+                           CASE WHEN TG_TABLE_NAME = 'plan_change_log' THEN count(*) ELSE 0 END
+                    FROM changed_rows GROUP BY plan_id ORDER BY plan_id
+                    ON CONFLICT (plan_id) DO UPDATE
+                    SET task_change_count = plan_dashboard.task_change_count + EXCLUDED.task_change_count,
+                        plan_change_count = plan_dashboard.plan_change_count + EXCLUDED.plan_change_count,
+                        updated_at = now();
+                ELSE
+                    UPDATE plan_dashboard d
+                    SET task_change_count = d.task_change_count - CASE WHEN TG_TABLE_NAME = 'plan_detail_change_log' THEN c.n ELSE 0 END,
+                        plan_change_count = d.plan_change_count - CASE WHEN TG_TABLE_NAME = 'plan_change_log' THEN c.n ELSE 0 END,
+                        updated_at = now()
+                    FROM (SELECT plan_id, count(*) AS n FROM changed_rows GROUP BY plan_id) c
+                    WHERE d.plan_id = c.plan_id;
+                END IF;
+                RETURN NULL;
+            END
+        $$""",
+        # a task counts while it is not started; transition tables are only readable in
+        # the branch of the event that has them
+        f"""CREATE OR REPLACE FUNCTION plan_dashboard_count_open_tasks() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    {_OPEN_TASK_DAY_UPSERT.format(rows=_open_task_rows("new_rows", "1"))};
+                ELSIF TG_OP = 'UPDATE' THEN
+                    {_OPEN_TASK_DAY_UPSERT.format(rows=_open_task_rows("old_rows", "-1") + " UNION ALL " + _open_task_rows("new_rows", "1"))};
+                ELSE
+                    {_OPEN_TASK_DAY_UPSERT.format(rows=_open_task_rows("old_rows", "-1"))};
+                END IF;
+                RETURN NULL;
+            END
+        $$""",
+    ] + [
+        f"""DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_{table}_dashboard_{event.lower()}') THEN
+                CREATE TRIGGER trg_{table}_dashboard_{event.lower()} AFTER {event} ON {table}
+                REFERENCING {transition}
+                FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+            END IF;
+        END $$"""
+        for table, function in (("plan_detail_change_log", "plan_dashboard_count_changes"),
+                                ("plan_change_log", "plan_dashboard_count_changes"))
+        for event, transition in (("INSERT", "NEW TABLE AS changed_rows"), ("DELETE", "OLD TABLE AS changed_rows"))
+    ] + [
+        f"""DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_executable_plan_dashboard_{event.lower()}') THEN
+                CREATE TRIGGER trg_executable_plan_dashboard_{event.lower()} AFTER {event} ON executable_plan
+                REFERENCING {transition}
+                FOR EACH STATEMENT EXECUTE FUNCTION plan_dashboard_count_open_tasks();
+            END IF;
+        END $$"""
+        for event, transition in (("INSERT", "NEW TABLE AS new_rows"),
+                                  ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+                                  ("DELETE", "OLD TABLE AS old_rows"))
+    ] + [
+        """INSERT INTO plan_dashboard (plan_id, task_change_count, plan_change_count)
+            SELECT plan_id, sum(task_changes), sum(plan_changes)
+            FROM (SELECT plan_id, 1 AS task_changes, 0 AS plan_changes FROM plan_detail_change_log
+                  UNION ALL
+                  SELECT plan_id, 0, 1 FROM plan_change_log) c
+            GROUP BY plan_id
+            ON CONFLICT (plan_id) DO NOTHING""",
+        _OPEN_TASK_DAY_UPSERT.format(rows=_open_task_rows("executable_plan", "1")),
+    ]),
+]
+
+assert [m.version for m in MIGRATIONS] == list(range(1, len(MIGRATIONS) + 1)), "migration versions must be 1..n in order"
+
+
+async def _drop_invalid_indexes(conn, statement: str):
+    # a failed CREATE INDEX CONCURRENTLY leaves an invalid index behind, which
+    # IF NOT EXISTS would then keep forever; drop it so the retry rebuilds it
+    name = statement.split("IF NOT EXISTS", 1)[1].split()[0]
+    invalid = await conn.execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """), {"name": name})
+    if invalid.first() is not None:
+        logger.warning(f"Dropping invalid index {name} left by an earlier migration run")
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+async def apply_migrations(engine: AsyncEngine) -> List[int]:
+    """
+    Apply the migrations this database has not recorded yet, in version order, and
+    return their versions. Runs under an advisory lock, so concurrent callers wait
+    and then find nothing left to do.
+    """
+    applied_now = []
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        while True:
+            result = await lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            if result.scalar():
+                break
+            await asyncio.sleep(MIGRATION_LOCK_POLL_SECONDS)
+        try:
+            await lock_conn.execute(text(CREATE_MIGRATION_TABLE_SQL))
+            result = await lock_conn.execute(text("SELECT version FROM schema_migrations"))
+            applied = set(result.scalars().all())
+            for migration in MIGRATIONS:
+                if migration.version in applied:
+                    continue
+                logger.info(f"Applying migration {migration.version} {migration.name}")
+                record = text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)")
+                params = {"version": migration.version, "name": migration.name}
+                if migration.transactional:
+                    async with engine.begin() as conn:
+                        for statement in migration.statements:
+                            await conn.execute(text(statement))
+                        await conn.execute(record, params)
+                else:
+                    for statement in migration.statements:
+                        if "CONCURRENTLY IF NOT EXISTS" in statement:
+                            await _drop_invalid_indexes(lock_conn, statement)
+                        await lock_conn.execute(text(statement))
+                    await lock_conn.execute(record, params)
+                applied_now.append(migration.version)
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    if applied_now:
+        logger.info(f"Applied migrations {applied_now}")
+    return applied_now
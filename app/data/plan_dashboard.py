@@ -0,0 +1,104 @@
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Column, Integer, Date, DateTime, UUID, text
+from sqlalchemy.sql import func
+from typing import List, Optional
+from app.data.dbinit import Base
+from app.common.exception import GeneralDataException
+import structlog
+
+logger = structlog.get_logger()
+
+# The dashboard numbers of a plan are kept up to date by triggers on the tables they are
+# counted from (see migration 7 in app/data/migrations.py), so reading them never scans
+# the change logs or the plan's tasks:
+#   plan_detail_change_log, plan_change_log -> plan_dashboard counters
+#   executable_plan                         -> plan_open_task_day
+# Plan progress is already a running total in progress_tracking (entity_id = plan_id).
+
+
+class PlanDashboard(Base):
+    """
+    Per plan count of task and plan date changes. Plans without a row have none.
+    """
+    __tablename__ = "plan_dashboard"
+    plan_id = Column(UUID(as_uuid=True), primary_key=True)
+    task_change_count = Column(Integer, nullable=False, default=0)
+    plan_change_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class PlanOpenTaskDay(Base):
+    """
+    Number of not started tasks of a plan per start day (UTC). Which of them are due
+    today or delayed depends on the day the dashboard is read, so the counts are kept by
+    day and the read sums them. Tasks without a start date are counted under 'infinity'.
+    """
+    __tablename__ = "plan_open_task_day"
+    plan_id = Column(UUID(as_uuid=True), primary_key=True)
+    start_day = Column(Date, primary_key=True)
+    open_tasks = Column(Integer, nullable=False, default=0)
+
+
+# One row per plan of the user with everything the dashboards show. The task figures
+# are only given for approved plans and only count tasks that are not started yet;
+# completed and in progress counts are reported as 0 as the dashboards always did.
+DASHBOARD_ROWS_SQL = """
+    SELECT up.plan_id,
+           up.plan_type,
+           up.approved_by_user,
+           up.plan_start_date,
+           up.plan_end_date,
+           up.plan_goal,
+           1 AS total_plans,
+           CASE WHEN up.plan_status = 1 THEN 1 ELSE 0 END AS total_active_plans,
+           pt.cumulative_progress AS plan_progress,
+           coalesce(d.task_change_count, 0) AS task_change_count,
+           coalesce(d.plan_change_count, 0) AS plan_change_count,
+           coalesce(o.total_objectives, 0) AS total_objectives,
+           coalesce(o.total_current_tasks, 0) AS total_current_tasks,
+           coalesce(o.total_delayed_tasks, 0) AS total_delayed_tasks,
+           coalesce(o.objectives_delayed_time, 0) AS objectives_delayed_time,
+           coalesce(o.total_objectives, 0) AS total_not_started_tasks,
+           0 AS total_in_progress_tasks,
+           0 AS total_completed_tasks,
+           0 AS total_completed_tasks_today
+    FROM user_plan up
+    LEFT JOIN plan_dashboard d ON d.plan_id = up.plan_id
+    LEFT JOIN progress_tracking pt ON pt.entity_id = up.plan_id
+    LEFT JOIN LATERAL (
+        SELECT sum(t.open_tasks) AS total_objectives,
+               sum(t.open_tasks) FILTER (WHERE t.start_day = today.day) AS total_current_tasks,
+               sum(t.open_tasks) FILTER (WHERE t.start_day < today.day) AS total_delayed_tasks,
+               sum(today.day - t.start_day) FILTER (WHERE t.start_day < today.day) AS objectives_delayed_time
+        FROM plan_open_task_day t,
+             (SELECT (now() AT TIME ZONE 'UTC')::date AS day) today
+        WHERE t.plan_id = up.plan_id
+          AND t.open_tasks > 0
+          AND up.approved_by_user != 0
+    ) o ON true
+    WHERE up.user_id = CAST(:user_id AS uuid)
+      {plan_filter}
+"""
+
+
+async def get_dashboard_rows(db: AsyncSession, user_id: UUID, plan_id: Optional[UUID] = None) -> List[dict]:
+    """
+    Dashboard figures of each plan of the user (or of one plan), read from the
+    aggregates the triggers maintain.
+    """
+    try:
+        query = DASHBOARD_ROWS_SQL.format(plan_filter="AND up.plan_id = CAST(:plan_id AS uuid)" if plan_id else "")
+        params = {"user_id": str(user_id)}
+        if plan_id:
+            params["plan_id"] = str(plan_id)
+        result = await db.execute(text(query), params)
+        return result.mappings().all()
+
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when reading the dashboard aggregates: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while reading the dashboard aggregates",
+            context={"detail": f"Database error when reading the dashboard aggregates: {str(e)}"}
+        )
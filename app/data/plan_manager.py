@@ -171,17 +171,23 @@ async def get_subscription_db(db: AsyncSession, filter_params: dict) -> List[Dic
         )
 
 async def get_fmp_by_count(
-    db: AsyncSession, user_id: UUID, limit: int = 10, offset: int = 0
+    db: AsyncSession, user_id: UUID, limit: int = 10, offset: int = 0, after: Optional[tuple] = None
 ) -> Optional[List[dict]]:
+    """
+    Public plans of other users, newest first. Pages by keyset on (created_dt, plan_id)
+    when after (the key of the last row of the previous page) is given; offset is only
+    kept for clients that do not send a cursor yet.
+    """
     try:
-        query = """
-            SELECT DISTINCT 
+        query = f"""
+            SELECT
                 up.plan_id,
                 up.plan_name,
-                coalesce(followers,0),
+                coalesce(followers,0) AS follower_count,
                 up.user_id,
                 first_name,
-                last_name
+                last_name,
+                up.created_dt
             FROM 
                 user_plan up
             LEFT JOIN (
@@ -195,14 +201,19 @@ async def get_fmp_by_count(
                 up.user_id != :user_id
                 and up.private_flag = 0
                 AND du.user_id = up.user_id
-            LIMIT :limit OFFSET :offset
+                {"AND (up.created_dt, up.plan_id) < (:after_created_dt, :after_plan_id)" if after is not None else ""}
+            ORDER BY up.created_dt DESC, up.plan_id DESC
+            LIMIT :limit {"" if after is not None else "OFFSET :offset"}
         """
 
         params = {
             "user_id": str(user_id),
-            "limit": limit,
-            "offset": offset
+            "limit": limit
         }
+        if after is not None:
+            params["after_created_dt"], params["after_plan_id"] = after
+        else:
+            params["offset"] = offset
 
         result = await db.execute(text(query), params)
         res = result.mappings().all()
@@ -0,0 +1,131 @@
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Text, UUID, text
+from sqlalchemy.sql import func
+from typing import List, Optional, Dict, Any
+from app.data.dbinit import Base
+from app.common.exception import IntegrityException, GeneralDataException
+import structlog
+
+logger = structlog.get_logger()
+
+# tables whose rows make up the plan detail responses, every write to them bumps the
+# plan version through the plan_version_bump trigger (see app/data/migrations.py)
+PLAN_VERSIONED_TABLES = (
+    "user_plan",
+    "goal_builder",
+    "created_plan",
+    "executable_plan",
+    "plan_routine_summary",
+    "plan_general_guideline",
+)
+
+
+class PlanVersion(Base):
+    """
+    Per plan counter, incremented by trigger on every statement that writes a row of
+    the plan to one of PLAN_VERSIONED_TABLES. Plans without a row are at version 0.
+    """
+    __tablename__ = "plan_version"
+    plan_id = Column(UUID(as_uuid=True), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
+
+
+class PlanSnapshot(Base):
+    """
+    Serialized plan detail response (kind "executed" or "created") as of a plan version.
+    The snapshot is current while its version matches plan_version and its format
+    matches the code that reads it.
+    """
+    __tablename__ = "plan_snapshot"
+    plan_id = Column(UUID(as_uuid=True), primary_key=True)
+    kind = Column(String(16), primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    format = Column(Integer, nullable=False)
+    body = Column(Text, nullable=False)
+    built_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# One lookup that authorizes the read and returns the current plan version. The body is
+# only returned when the snapshot is current and the client does not hold it already,
+# so a 304 never reads the (toasted) body.
+GET_PLAN_SNAPSHOT_SQL = text("""
+    SELECT coalesce(v.version, 0) AS version,
+           CASE WHEN s.version = coalesce(v.version, 0)
+                 AND s.format = :format
+                 AND NOT coalesce(v.version, 0) = ANY(CAST(:known_versions AS bigint[]))
+                THEN s.body END AS body
+    FROM user_plan u
+    LEFT JOIN plan_version v ON v.plan_id = u.plan_id
+    LEFT JOIN plan_snapshot s ON s.plan_id = u.plan_id AND s.kind = :kind
+    WHERE u.plan_id = CAST(:plan_id AS uuid)
+      AND u.user_id = CAST(:user_id AS uuid)
+""")
+
+# A snapshot never replaces one built at a later version.
+SAVE_PLAN_SNAPSHOT_SQL = text("""
+    INSERT INTO plan_snapshot (plan_id, kind, version, format, body, built_at)
+    VALUES (CAST(:plan_id AS uuid), :kind, :version, :format, :body, now())
+    ON CONFLICT (plan_id, kind) DO UPDATE
+    SET version = EXCLUDED.version,
+        format = EXCLUDED.format,
+        body = EXCLUDED.body,
+        built_at = EXCLUDED.built_at
+    WHERE plan_snapshot.version <= EXCLUDED.version
+""")
+
+
+async def get_plan_snapshot(plan_id: str,
+                            user_id: str,
+                            kind: str,
+                            snapshot_format: int,
+                            known_versions: List[int],
+                            db: AsyncSession) -> Optional[Dict[str, Any]]:
+    """
+    Current version of a plan owned by user_id, with the snapshot body when it is
+    current and its version is not in known_versions. None when the user has no such plan.
+    """
+    try:
+        result = await db.execute(GET_PLAN_SNAPSHOT_SQL, {
+            "plan_id": plan_id,
+            "user_id": user_id,
+            "kind": kind,
+            "format": snapshot_format,
+            "known_versions": known_versions
+        })
+        row = result.mappings().first()
+        return dict(row) if row is not None else None
+
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when reading the plan snapshot: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while reading the plan snapshot",
+            context={"detail": "Database error occurred while reading the plan snapshot"}
+        )
+
+
+async def save_plan_snapshot(plan_id: str, kind: str, version: int, snapshot_format: int, body: str, db: AsyncSession):
+    try:
+        await db.execute(SAVE_PLAN_SNAPSHOT_SQL, {
+            "plan_id": plan_id,
+            "kind": kind,
+            "version": version,
+            "format": snapshot_format,
+            "body": body
+        })
+
+    except IntegrityError as e:
+
+        logger.error(f"IntegrityError when saving the plan snapshot: {str(e)}")
+        raise IntegrityException(
+            "Integrity error when saving the plan snapshot",
+            context = {"detail": "Possible duplicate entry or foreign key constraint failure in the plan snapshot."}
+        )
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when saving the plan snapshot: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while saving the plan snapshot",
+            context={"detail": "Database error occurred while saving the plan snapshot"}
+        )
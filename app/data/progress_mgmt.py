@@ -8,14 +8,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.model.progress_mgmt import ProgressUpdateCreate, ProgressUpdateOut, ProgressSummary, ProgressWeeklyDetail, ProgressDailyDetail
 from app.data.user_plan import ExecutablePlan, UserPlan, update_plan, update_executable_plan, get_plan
 from app.data.user import User as DreavUser
-from app.common.site_enums import TaskStatus, PlanStatus
+from app.common.site_enums import TaskStatus, PlanStatus, EntityType
 from sqlalchemy.exc import SQLAlchemyError, MultipleResultsFound, NoResultFound, IntegrityError
 from app.common.exception import GeneralDataException, IntegrityException
 from datetime import datetime, timezone, timedelta
 from app.data.common_table import ProgressUpdate
-from typing import List, Optional
+from typing import Dict, List, Optional
 from app.data.user import User
 import structlog
+import json
 
 
 class ProgressTracking(Base):
@@ -29,78 +30,426 @@ class ProgressTracking(Base):
     milestone_50 = Column(Integer, default=0)
     milestone_75 = Column(Integer, default=0)
     milestone_100 = Column(Integer, default=0)
+    # running totals of a parent (week, milestone or plan) over the children it averages,
+    # so a progress update applies a delta instead of re-aggregating; NULL until first rollup
+    child_progress_sum = Column(Float, nullable=True)
+    child_count = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 logger = structlog.get_logger()
 
+# entity types a parent averages over: a week or milestone its tasks, a plan the nodes
+# matching its plan type
+TASK_ENTITY_TYPES = (EntityType.DAY.value, EntityType.TASK.value)
+PLAN_CHILD_ENTITY_TYPE = {"Weekly": EntityType.WEEK.value, "Daily": EntityType.DAY.value}
+
+# progress of a parent moves by delta / child_count when one child moves by delta
+ROLLUP_DELTA_SQL = text("""
+    UPDATE progress_tracking
+    SET child_progress_sum = child_progress_sum + :delta,
+        cumulative_progress = (child_progress_sum + :delta) / child_count,
+        updated_at = now()
+    WHERE entity_id = :entity_id AND child_count > 0
+    RETURNING cumulative_progress, CAST(:delta AS double precision) / child_count AS change
+""")
+
+# first rollup of a parent (or one whose totals were reset to NULL): aggregate its
+# children once and store the totals. Executable plans do not change shape after
+# approval, so child_count stays right from then on.
+ROLLUP_INIT_SQL = """
+    WITH previous AS (
+        SELECT cumulative_progress FROM progress_tracking WHERE entity_id = :entity_id
+    ), children AS (
+        SELECT COALESCE(SUM(p.cumulative_progress), 0) AS total, COUNT(e.entity_id) AS n
+        FROM executable_plan e
+        LEFT JOIN progress_tracking p ON e.entity_id = p.entity_id
+        WHERE {children}
+    )
+    INSERT INTO progress_tracking (plan_id, entity_id, cumulative_progress, child_progress_sum, child_count, updated_at)
+    SELECT CAST(:plan_id AS uuid), CAST(:entity_id AS uuid), CASE WHEN n > 0 THEN total / n ELSE 0 END, total, n, now()
+    FROM children
+    ON CONFLICT (entity_id) DO UPDATE
+    SET cumulative_progress = EXCLUDED.cumulative_progress,
+        child_progress_sum = EXCLUDED.child_progress_sum,
+        child_count = EXCLUDED.child_count,
+        updated_at = now()
+    RETURNING cumulative_progress,
+              cumulative_progress - COALESCE((SELECT cumulative_progress FROM previous), 0) AS change
+"""
+
+# Taken before ROLLUP_INIT_SQL and held to the end of the transaction. Two first updates
+# under one parent would otherwise both aggregate without the other's uncommitted child
+# and the later upsert would overwrite the earlier. The waiter's aggregate runs after the
+# holder committed, so it sees that child; updates arriving after the totals exist apply
+# their delta on top of them.
+ROLLUP_INIT_LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtextextended(CAST(:entity_id AS text), 0))")
+
+# Locks the task, so concurrent updates of one task are applied one after the other and
+# the pipeline, which starts after the lock is granted, reads the progress left by the last.
+PROGRESS_TARGET_SQL = text("""
+    SELECT u.plan_type, e.entity_type, e.parent_id, parent.entity_type AS parent_type
+    FROM executable_plan e
+    JOIN user_plan u ON u.plan_id = e.plan_id
+    LEFT JOIN executable_plan parent ON parent.plan_id = e.plan_id AND parent.entity_id = e.parent_id
+    WHERE e.plan_id = :plan_id AND e.entity_id = :entity_id
+    FOR UPDATE OF e
+""")
+
+# One progress update in one statement: the progress_update log entry, the task's
+# progress_tracking row, the task status, the rollup into the parent and the plan (where
+# they already have running totals) and the plan status. Sub-statements all read the
+# state before the statement, so previous is the task's progress before this update.
+PROGRESS_PIPELINE_SQL = text("""
+    WITH previous AS (
+        SELECT coalesce((SELECT cumulative_progress FROM progress_tracking
+                         WHERE entity_id = CAST(:entity_id AS uuid)), 0) AS progress
+    ), last_update AS (
+        SELECT id FROM progress_update
+        WHERE entity_id = CAST(:entity_id AS uuid)
+        ORDER BY created_at DESC
+        LIMIT 1
+    ), updated_log AS (
+        UPDATE progress_update
+        SET plan_id = CAST(:plan_id AS uuid),
+            progress_percent = CAST(:percent AS integer),
+            notes = CASE WHEN :notes = '' THEN notes ELSE :notes END,
+            updated_at = now()
+        WHERE id IN (SELECT id FROM last_update)
+        RETURNING id
+    ), inserted_log AS (
+        INSERT INTO progress_update (plan_id, entity_id, progress_percent, notes)
+        SELECT CAST(:plan_id AS uuid), CAST(:entity_id AS uuid), CAST(:percent AS integer), :notes
+        WHERE NOT EXISTS (SELECT 1 FROM last_update)
+        RETURNING id
+    ), event AS (
+        INSERT INTO progress_event (plan_id, entity_id, progress_percent, notes)
+        VALUES (CAST(:plan_id AS uuid), CAST(:entity_id AS uuid), CAST(:percent AS integer), nullif(:notes, ''))
+        RETURNING id
+    ), task_tracking AS (
+        INSERT INTO progress_tracking (plan_id, entity_id, cumulative_progress, notes,
+                                       milestone_25, milestone_50, milestone_75, milestone_100)
+        VALUES (CAST(:plan_id AS uuid), CAST(:entity_id AS uuid), CAST(:percent AS integer), btrim(:notes),
+                :milestone_25, :milestone_50, :milestone_75, :milestone_100)
+        ON CONFLICT (entity_id) DO UPDATE
+        SET cumulative_progress = EXCLUDED.cumulative_progress,
+            milestone_25 = EXCLUDED.milestone_25,
+            milestone_50 = EXCLUDED.milestone_50,
+            milestone_75 = EXCLUDED.milestone_75,
+            milestone_100 = EXCLUDED.milestone_100,
+            notes = CASE WHEN EXCLUDED.notes = '' THEN progress_tracking.notes ELSE EXCLUDED.notes END,
+            updated_at = now()
+        RETURNING entity_id
+    ), task_status AS (
+        UPDATE executable_plan
+        SET status_id = :task_status,
+            objective_completion_dt = coalesce(CAST(:completed_at AS timestamptz), objective_completion_dt)
+        WHERE plan_id = CAST(:plan_id AS uuid) AND entity_id = CAST(:entity_id AS uuid)
+        RETURNING status_id
+    ), parent_rollup AS (
+        UPDATE progress_tracking pt
+        SET child_progress_sum = pt.child_progress_sum + d.delta,
+            cumulative_progress = (pt.child_progress_sum + d.delta) / pt.child_count,
+            updated_at = now()
+        FROM (SELECT CASE WHEN :task_counts_for_parent THEN :percent - progress ELSE 0 END AS delta
+              FROM previous) d
+        WHERE pt.entity_id = CAST(:parent_id AS uuid) AND pt.child_count > 0
+        RETURNING pt.cumulative_progress, d.delta / pt.child_count AS change
+    ), plan_rollup AS (
+        -- skipped (delta NULL) while the parent has no running totals yet
+        UPDATE progress_tracking pt
+        SET child_progress_sum = pt.child_progress_sum + d.delta,
+            cumulative_progress = (pt.child_progress_sum + d.delta) / pt.child_count,
+            updated_at = now()
+        FROM (SELECT CASE WHEN :task_counts_for_plan THEN :percent - (SELECT progress FROM previous)
+                          WHEN :parent_counts_for_plan THEN (SELECT change FROM parent_rollup)
+                          ELSE 0 END AS delta) d
+        WHERE pt.entity_id = CAST(:plan_id AS uuid) AND pt.child_count > 0 AND d.delta IS NOT NULL
+        RETURNING pt.cumulative_progress
+    ), plan_status AS (
+        -- a plan is complete once no other task of it is left open
+        UPDATE user_plan u
+        SET plan_status = :plan_status
+        WHERE u.plan_id = CAST(:plan_id AS uuid)
+          AND u.plan_status IS DISTINCT FROM :plan_status
+          AND (:plan_status <> 100 OR NOT EXISTS (
+                SELECT 1 FROM executable_plan ep
+                WHERE ep.plan_id = u.plan_id
+                  AND ep.entity_type NOT IN (2, 1000, 999)
+                  AND ep.status_id <> 100
+                  AND ep.entity_id <> CAST(:entity_id AS uuid)))
+        RETURNING plan_status
+    )
+    SELECT (SELECT status_id FROM task_status) AS task_status,
+           (SELECT change FROM parent_rollup) AS parent_change,
+           (SELECT cumulative_progress FROM plan_rollup) AS plan_progress,
+           coalesce((SELECT plan_status FROM plan_status),
+                    (SELECT plan_status FROM user_plan WHERE plan_id = CAST(:plan_id AS uuid))) AS plan_status
+""")
+
+
+# Batched progress updates (create_progress_updates). Every statement takes the whole
+# batch as arrays, so a sync of n updates costs the same round trips as one update.
+PROGRESS_BATCH_TARGET_SQL = text("""
+    SELECT e.plan_id, e.entity_id, u.plan_type, e.entity_type, e.parent_id, parent.entity_type AS parent_type
+    FROM unnest(CAST(:plan_ids AS uuid[]), CAST(:entity_ids AS uuid[])) AS t(plan_id, entity_id)
+    JOIN executable_plan e ON e.plan_id = t.plan_id AND e.entity_id = t.entity_id
+    JOIN user_plan u ON u.plan_id = e.plan_id
+    LEFT JOIN executable_plan parent ON parent.plan_id = e.plan_id AND parent.entity_id = e.parent_id
+    ORDER BY e.plan_id, e.entity_id
+    FOR UPDATE OF e
+""")
+
+# PROGRESS_PIPELINE_SQL without the rollups, for many tasks; returns how far each moved.
+# batch holds the last update of each entity, the event_* arrays all of them in order.
+PROGRESS_BATCH_WRITE_SQL = text("""
+    WITH batch AS (
+        SELECT *
+        FROM unnest(CAST(:entity_ids AS uuid[]), CAST(:plan_ids AS uuid[]), CAST(:percents AS integer[]),
+                    CAST(:notes AS text[]), CAST(:task_statuses AS integer[]))
+             AS b(entity_id, plan_id, percent, notes, task_status)
+    ), previous AS (
+        SELECT b.entity_id, coalesce(pt.cumulative_progress, 0) AS progress
+        FROM batch b
+        LEFT JOIN progress_tracking pt ON pt.entity_id = b.entity_id
+    ), last_update AS (
+        SELECT DISTINCT ON (pu.entity_id) pu.id, pu.entity_id
+        FROM progress_update pu
+        JOIN batch b ON b.entity_id = pu.entity_id
+        ORDER BY pu.entity_id, pu.created_at DESC
+    ), updated_log AS (
+        UPDATE progress_update pu
+        SET plan_id = b.plan_id,
+            progress_percent = b.percent,
+            notes = CASE WHEN b.notes = '' THEN pu.notes ELSE b.notes END,
+            updated_at = now()
+        FROM last_update l
+        JOIN batch b ON b.entity_id = l.entity_id
+        WHERE pu.id = l.id
+        RETURNING pu.id
+    ), inserted_log AS (
+        INSERT INTO progress_update (plan_id, entity_id, progress_percent, notes)
+        SELECT b.plan_id, b.entity_id, b.percent, b.notes
+        FROM batch b
+        WHERE NOT EXISTS (SELECT 1 FROM last_update l WHERE l.entity_id = b.entity_id)
+        RETURNING id
+    ), events AS (
+        -- every update of the batch, not only the last one of each entity
+        INSERT INTO progress_event (plan_id, entity_id, progress_percent, notes)
+        SELECT e.plan_id, e.entity_id, e.percent, nullif(e.notes, '')
+        FROM unnest(CAST(:event_entity_ids AS uuid[]), CAST(:event_plan_ids AS uuid[]),
+                    CAST(:event_percents AS integer[]), CAST(:event_notes AS text[]))
+             AS e(entity_id, plan_id, percent, notes)
+        RETURNING id
+    ), task_tracking AS (
+        INSERT INTO progress_tracking (plan_id, entity_id, cumulative_progress, notes,
+                                       milestone_25, milestone_50, milestone_75, milestone_100)
+        SELECT b.plan_id, b.entity_id, b.percent, btrim(b.notes),
+               CASE WHEN b.percent >= 25 THEN 1 ELSE 0 END,
+               CASE WHEN b.percent >= 50 THEN 1 ELSE 0 END,
+               CASE WHEN b.percent >= 75 THEN 1 ELSE 0 END,
+               CASE WHEN b.percent = 100 THEN 1 ELSE 0 END
+        FROM batch b
+        ON CONFLICT (entity_id) DO UPDATE
+        SET cumulative_progress = EXCLUDED.cumulative_progress,
+            milestone_25 = EXCLUDED.milestone_25,
+            milestone_50 = EXCLUDED.milestone_50,
+            milestone_75 = EXCLUDED.milestone_75,
+            milestone_100 = EXCLUDED.milestone_100,
+            notes = CASE WHEN EXCLUDED.notes = '' THEN progress_tracking.notes ELSE EXCLUDED.notes END,
+            updated_at = now()
+        RETURNING entity_id
+    ), task_status AS (
+        UPDATE executable_plan e
+        SET status_id = b.task_status,
+            objective_completion_dt = CASE WHEN b.percent = 100 THEN now() ELSE e.objective_completion_dt END
+        FROM batch b
+        WHERE e.plan_id = b.plan_id AND e.entity_id = b.entity_id
+        RETURNING e.entity_id, e.status_id
+    )
+    SELECT b.entity_id, s.status_id AS task_status, b.percent - p.progress AS delta
+    FROM batch b
+    JOIN previous p ON p.entity_id = b.entity_id
+    LEFT JOIN task_status s ON s.entity_id = b.entity_id
+""")
+
+# ROLLUP_DELTA_SQL for many parents (or plans), each with the summed delta of its children
+ROLLUP_BATCH_DELTA_SQL = text("""
+    UPDATE progress_tracking pt
+    SET child_progress_sum = pt.child_progress_sum + d.delta,
+        cumulative_progress = (pt.child_progress_sum + d.delta) / pt.child_count,
+        updated_at = now()
+    FROM unnest(CAST(:entity_ids AS uuid[]), CAST(:deltas AS double precision[])) AS d(entity_id, delta)
+    WHERE pt.entity_id = d.entity_id AND pt.child_count > 0
+    RETURNING pt.entity_id, pt.cumulative_progress, d.delta / pt.child_count AS change
+""")
+
+# plan status after a batch, by the rules of PROGRESS_PIPELINE_SQL: complete once no task
+# is left open, in progress when the batch left one of its tasks open
+PLAN_BATCH_STATUS_SQL = text("""
+    WITH batch AS (
+        SELECT *
+        FROM unnest(CAST(:plan_ids AS uuid[]), CAST(:any_open AS boolean[]), CAST(:any_complete AS boolean[]))
+             AS b(plan_id, any_open, any_complete)
+    ), target AS (
+        SELECT b.plan_id,
+               CASE WHEN b.any_complete AND NOT EXISTS (
+                        SELECT 1 FROM executable_plan ep
+                        WHERE ep.plan_id = b.plan_id
+                          AND ep.entity_type NOT IN (2, 1000, 999)
+                          AND ep.status_id <> 100) THEN 100
+                    WHEN b.any_open THEN 1 END AS plan_status
+        FROM batch b
+    ), updated AS (
+        UPDATE user_plan u
+        SET plan_status = t.plan_status
+        FROM target t
+        WHERE u.plan_id = t.plan_id
+          AND t.plan_status IS NOT NULL
+          AND u.plan_status IS DISTINCT FROM t.plan_status
+        RETURNING u.plan_id, u.plan_status
+    )
+    SELECT b.plan_id, coalesce(up.plan_status, u.plan_status) AS plan_status
+    FROM batch b
+    JOIN user_plan u ON u.plan_id = b.plan_id
+    LEFT JOIN updated up ON up.plan_id = b.plan_id
+""")
+
+
+# Progress history (get_progress_events, compact_progress_events). progress_event is
+# append only; compaction replaces the events of an entity older than the cutoff with one
+# summary row holding the latest percent, the notes (last :max_notes characters) and how
+# many updates it stands for. Entities whose old history is a single row are left alone,
+# so a run converges and repeating it finds nothing to do.
+PROGRESS_EVENTS_SQL = """
+    SELECT pe.id, pe.plan_id, pe.entity_id, pe.progress_percent, pe.notes, pe.event_count,
+           pe.first_created_at, pe.created_at
+    FROM progress_event pe
+    JOIN user_plan u ON u.plan_id = pe.plan_id
+    WHERE pe.entity_id = CAST(:entity_id AS uuid)
+      AND u.user_id = CAST(:user_id AS uuid)
+      {after}
+    ORDER BY pe.created_at DESC, pe.id DESC
+    LIMIT :limit
+"""
+
+COMPACT_PROGRESS_EVENTS_SQL = text("""
+    WITH candidates AS (
+        SELECT entity_id
+        FROM progress_event
+        WHERE created_at < CAST(:cutoff AS timestamptz)
+        GROUP BY entity_id
+        HAVING count(*) > 1
+        LIMIT :batch_size
+    ), removed AS (
+        DELETE FROM progress_event pe
+        USING candidates c
+        WHERE pe.entity_id = c.entity_id AND pe.created_at < CAST(:cutoff AS timestamptz)
+        RETURNING pe.*
+    ), summary AS (
+        INSERT INTO progress_event (plan_id, entity_id, progress_percent, notes, event_count,
+                                    first_created_at, created_at)
+        SELECT (array_agg(plan_id ORDER BY created_at DESC, id DESC))[1],
+               entity_id,
+               (array_agg(progress_percent ORDER BY created_at DESC, id DESC))[1],
+               right(string_agg(notes, E'\\n' ORDER BY created_at, id), CAST(:max_notes AS integer)),
+               sum(event_count),
+               min(coalesce(first_created_at, created_at)),
+               max(created_at)
+        FROM removed
+        GROUP BY entity_id
+        RETURNING entity_id
+    )
+    SELECT (SELECT count(*) FROM summary) AS entities, (SELECT count(*) FROM removed) AS events
+""")
+
+
+PARENT_CHILDREN = "e.parent_id = :entity_id AND e.entity_type IN (" + ", ".join(str(t) for t in TASK_ENTITY_TYPES) + ")"
+PLAN_CHILDREN = "e.plan_id = :plan_id AND e.entity_type = :child_type"
+
+
+async def _rollup_into(session: AsyncSession, plan_id: UUID, entity_id: UUID, delta: float, children: str, params: dict):
+    """
+    Apply a change of delta in one child to the totals of entity_id and return its new
+    progress and how much that moved.
+    """
+    result = await session.execute(ROLLUP_DELTA_SQL, {"entity_id": str(entity_id), "delta": float(delta)})
+    row = result.first()
+    if row is None:
+        await session.execute(ROLLUP_INIT_LOCK_SQL, {"entity_id": str(entity_id)})
+        result = await session.execute(text(ROLLUP_INIT_SQL.format(children=children)),
+                                       {"plan_id": str(plan_id), "entity_id": str(entity_id), **params})
+        row = result.first()
+    return row.cumulative_progress, row.change
+
+
+def _progress_statuses(percent: int):
+    """Task status set by a progress update, and the plan status it asks for."""
+    if percent == 100:
+        return TaskStatus.COMPLETE, PlanStatus.COMPLETE
+    if percent > 0:
+        return TaskStatus.IN_PROGRESS, PlanStatus.IN_PROGRESS
+    return TaskStatus.NOT_STARTED, PlanStatus.IN_PROGRESS
+
+
 async def create_progress_update(db: AsyncSession, update_data: ProgressUpdateCreate, current_user: User):
+    """
+    Record a progress update of a task and roll it up to its parent and plan. Two round
+    trips: one locks the task, PROGRESS_PIPELINE_SQL does the rest. Only the first update
+    under a parent or plan without running totals takes more, to aggregate them once.
+    """
     try:
-        stmt = select(ProgressUpdate).where(
-            ProgressUpdate.entity_id == update_data.entity_id
-        ).order_by(ProgressUpdate.created_at.desc())
+        percent = update_data.progress_percent
+        task_status, plan_status = _progress_statuses(percent)
+
+        result = await db.execute(PROGRESS_TARGET_SQL, {"plan_id": str(update_data.plan_id),
+                                                        "entity_id": str(update_data.entity_id)})
+        target = result.first()
+        if not target:
+            raise ValueError(f"No objective found for entity_id {update_data.entity_id}")
+        is_daily = target.plan_type == 'Daily'
+        if not is_daily and not target.parent_id:
+            raise ValueError(f"No parent objective found for entity_id {update_data.entity_id}")
+        plan_child_type = PLAN_CHILD_ENTITY_TYPE.get(target.plan_type, EntityType.MILESTONE.value)
+        parent_counts_for_plan = not is_daily and target.parent_type == plan_child_type
+
+        result = await db.execute(PROGRESS_PIPELINE_SQL, {
+            "plan_id": str(update_data.plan_id),
+            "entity_id": str(update_data.entity_id),
+            "parent_id": None if is_daily else str(target.parent_id),
+            "percent": percent,
+            "notes": update_data.notes or "",
+            "milestone_25": 1 if percent >= 25 else 0,
+            "milestone_50": 1 if percent >= 50 else 0,
+            "milestone_75": 1 if percent >= 75 else 0,
+            "milestone_100": 1 if percent == 100 else 0,
+            "task_status": task_status.value,
+            "completed_at": datetime.now(timezone.utc) if percent == 100 else None,
+            "plan_status": plan_status.value,
+            "task_counts_for_parent": not is_daily and target.entity_type in TASK_ENTITY_TYPES,
+            "task_counts_for_plan": is_daily and target.entity_type == plan_child_type,
+            "parent_counts_for_plan": parent_counts_for_plan
+        })
+        row = result.first()
+
+        plan_progress = row.plan_progress
+        plan_delta = 0
+        if not is_daily and row.parent_change is None:
+            # first update under this parent, the pipeline left it and its plan alone
+            _, parent_change = await _rollup_into(db, update_data.plan_id, target.parent_id, 0, PARENT_CHILDREN, {})
+            plan_delta = parent_change if parent_counts_for_plan else 0
+        if plan_progress is None:
+            plan_progress, _ = await _rollup_into(db, update_data.plan_id, update_data.plan_id, plan_delta,
+                                                  PLAN_CHILDREN, {"child_type": plan_child_type})
+
+        return ProgressUpdateOut(entity_id=update_data.entity_id,
+                                 progress_percent=percent,
+                                 notes=update_data.notes,
+                                 plan_progress=plan_progress,
+                                 task_status=row.task_status,
+                                 plan_status=row.plan_status)
 
-        result = await db.execute(stmt)
-        last_update = result.scalars().first()
-
-        task_status = 0;
-
-        if update_data.progress_percent == 100:
-            task_status = TaskStatus.COMPLETE
-        elif update_data.progress_percent > 0:
-            task_status = TaskStatus.IN_PROGRESS
-            
-        else:
-            task_status = TaskStatus.NOT_STARTED
-        value_params = {}
-        value_params["plan_id"] = update_data.plan_id
-
-        if task_status.value == TaskStatus.COMPLETE.value:
-            plan_res = await check_plan_completion(update_data.plan_id, db)
-            if plan_res:
-                if plan_res[0].total_tasks == plan_res[0].total_completed_tasks + 1:
-                    value_params["plan_status"] = PlanStatus.COMPLETE.value
-                    ret = await update_plan(update_data.plan_id,value_params, db)
-        else:
-            value_params["plan_status"] = PlanStatus.IN_PROGRESS.value
-            ret = await update_plan(update_data.plan_id,value_params, db)        
-
-        if last_update:
-            last_update.entity_id=update_data.entity_id
-            last_update.plan_id=update_data.plan_id
-            last_update.progress_percent=update_data.progress_percent
-            last_update.notes = (last_update.notes or "") + "\n" + (update_data.notes or "")
-        else:
-            new_update = ProgressUpdate(
-                entity_id=update_data.entity_id,
-                plan_id=update_data.plan_id,
-                progress_percent=update_data.progress_percent,
-                notes=update_data.notes
-            )
-            db.add(new_update)
-        await db.flush()
-        await update_progress_tracking(db, update_data.entity_id, 
-                                       update_data.plan_id, 
-                                       update_data.progress_percent,
-                                       update_data.notes)
-        await db.flush()
-        plan_progress_res = await rollup_progress(db, update_data.plan_id, update_data.entity_id, current_user.user_id)
-
-        ret = ProgressUpdateOut(entity_id=update_data.entity_id, 
-                                progress_percent=update_data.progress_percent, 
-                                notes=update_data.notes,
-                                 plan_progress= plan_progress_res )
-        filter_params = {}
-        value_params = {}
-        filter_params["plan_id"] = update_data.plan_id
-        filter_params["entity_id"] = update_data.entity_id
-        value_params["status_id"] = task_status.value
-        if update_data.progress_percent == 100:
-            value_params["objective_completion_dt"] = datetime.now(timezone.utc)
-        ret_objective_status = await update_executable_plan(filter_params, value_params, db)
-        return ret
-    
     except IntegrityError as e:
         logger.error(f"IntegrityError when updating executable plan: {str(e)}")
         raise IntegrityException(
@@ -120,310 +469,283 @@ async def create_progress_update(db: AsyncSession, update_data: ProgressUpdateCr
             context={"detail" : f"Database error when updating executable plan: {str(e)}"}
         )
 
-async def get_progress_by_user_entity(db: AsyncSession, user_id:UUID, entity_id: UUID = None):
+async def _rollup_many(session: AsyncSession, deltas: Dict[str, float], plan_of: Dict[str, str], children: str, params_of) -> Dict[str, tuple]:
+    """
+    _rollup_into for many parents (or plans) in one statement. deltas maps each to the
+    summed change of its children in the batch, plan_of to its plan. Returns
+    entity_id -> (new progress, how much it moved).
+    """
+    if not deltas:
+        return {}
+    entity_ids = list(deltas)
+    result = await session.execute(ROLLUP_BATCH_DELTA_SQL, {"entity_ids": [uuid.UUID(e) for e in entity_ids],
+                                                            "deltas": [float(deltas[e]) for e in entity_ids]})
+    rolled = {str(row.entity_id): (row.cumulative_progress, row.change) for row in result}
+    # sorted, so batches that need the same entities lock them in the same order
+    for entity_id in sorted(entity_ids):
+        if entity_id not in rolled:
+            # no running totals yet, aggregated once
+            await session.execute(ROLLUP_INIT_LOCK_SQL, {"entity_id": entity_id})
+            result = await session.execute(text(ROLLUP_INIT_SQL.format(children=children)),
+                                           {"plan_id": plan_of[entity_id], "entity_id": entity_id, **params_of(entity_id)})
+            row = result.first()
+            rolled[entity_id] = (row.cumulative_progress, row.change)
+    return rolled
+
+
+async def create_progress_updates(db: AsyncSession, updates: List[ProgressUpdateCreate], current_user: User) -> List[ProgressUpdateOut]:
+    """
+    Apply many progress updates (an offline sync) together: the tasks are locked and
+    written in one statement each, then every parent and plan they touch is rolled up
+    once with the summed change of its tasks. When an entity is updated more than once
+    the last update sets its state and every update is kept in progress_event. Tasks that
+    are not part of their plan are skipped.
+    """
     try:
-
-        # Step 2: Find all plans for the user
-        stmt = select(UserPlan)
-        stmt = stmt.filter(UserPlan.user_id == user_id)
-        if entity_id:
-            stmt = stmt.filter(UserPlan.plan_id == entity_id)
-        result = await db.execute(stmt)
-        user_plans = result.scalars().all()
-        if not user_plans:
-            return []  # No plans, return empty list
-
-        plan_ids = [plan.plan_id for plan in user_plans]
-        entity_type_arr = [1,2,1000]
-        # Step 3: Find top-level weeks for each plan (entity_type = 2)
-        stmt = select(ExecutablePlan)
-        stmt = stmt.filter(ExecutablePlan.plan_id.in_(plan_ids))
-        stmt = stmt.filter(ExecutablePlan.entity_type.in_(entity_type_arr))
-        stmt = stmt.order_by(ExecutablePlan.sequence_id)
-        logger.info(f"The sql statement is {stmt}")
-        result = await db.execute(stmt)
-        objectives = result.scalars().all()
-
-        # Step 4: Collect entity_ids of weeks and plan_ids
-        entity_ids = list(dict.fromkeys(week.entity_id for week in objectives))
-
-        # Step 5: Now get progress_tracking for:
-        # - Each weekly entity_id
-        # - Each plan_id (even though no node exists for plan, progress_tracking has entity_id = plan_id)
-
-        progress_entity_ids = entity_ids + plan_ids
-
-        if not progress_entity_ids:
+        latest = {}
+        notes = {}
+        for update_data in updates:
+            key = str(update_data.entity_id)
+            latest[key] = update_data
+            if update_data.notes:
+                notes[key] = update_data.notes
+
+        result = await db.execute(PROGRESS_BATCH_TARGET_SQL, {"plan_ids": [u.plan_id for u in latest.values()],
+                                                              "entity_ids": [u.entity_id for u in latest.values()]})
+        targets = {str(row.entity_id): row for row in result}
+        applied = []
+        for key, update_data in latest.items():
+            target = targets.get(key)
+            if target is None:
+                logger.warning(f"Skipping progress update of {key}, it is not a task of plan {update_data.plan_id}")
+            elif target.plan_type != 'Daily' and not target.parent_id:
+                logger.warning(f"Skipping progress update of {key}, no parent objective found")
+            else:
+                applied.append(update_data)
+        if not applied:
             return []
 
-        result = await db.execute(
-            select(ProgressTracking)
-            .where(ProgressTracking.entity_id.in_(progress_entity_ids))
-        )
-        tracking_data = result.scalars().all()
-
-        progress_map = {str(track.entity_id): track for track in tracking_data}
-
-        # Step 6: Structure the response
-        response = []
-        for plan in user_plans:
-            plan_progress = progress_map.get(str(plan.plan_id))
-            # Find weeks under the plan
-            plan_detail = [row for row in objectives if row.plan_id == plan.plan_id]
-            week_progress_list = []
-            day_progress_list = []
-            for row in plan_detail:               
-                progress = progress_map.get(str(row.entity_id))
-                if row.entity_type == 2:
-                    obj = ProgressWeeklyDetail(
-                        entity_id=row.entity_id,
-                        activity_desc=row.activity_desc,
-                        sequence_id=row.sequence_id,
-                        progress_percent=progress.cumulative_progress if progress else 0,
-                        milestone_100=progress.milestone_100 if progress else 0,
-                        milestone_25=progress.milestone_25 if progress else 0,
-                        milestone_50=progress.milestone_50 if progress else 0,
-                        milestone_75=progress.milestone_75 if progress else 0
-                    )
-                    week_progress_list.append(obj)
-                else:
-                    obj = ProgressDailyDetail(entity_id=row.entity_id, 
-                                              activity_desc=row.activity_desc,
-                                              progress_percent=progress.cumulative_progress if progress else 0,
-                                              parent_id=row.parent_id,
-                                              sequence_id=row.sequence_id)
-                    day_progress_list.append(obj)
-
-            progress_summary_obj = ProgressSummary(
-                plan_id= plan.plan_id,
-                plan_name= plan.plan_name,
-                plan_type=plan.plan_type,
-                plan_progress_percent=plan_progress.cumulative_progress if plan_progress else 0,
-                plan_milestone_100=plan_progress.milestone_100 if plan_progress else 0,
-                plan_milestone_25=plan_progress.milestone_25 if plan_progress else 0,
-                plan_milestone_50=plan_progress.milestone_50 if plan_progress else 0,
-                plan_milestone_75=plan_progress.milestone_75 if plan_progress else 0,
-                week_detail=week_progress_list,
-                day_detail=day_progress_list
-            )
-
-        return progress_summary_obj
+        applied_keys = {str(u.entity_id) for u in applied}
+        events = [u for u in updates if str(u.entity_id) in applied_keys]
+        result = await db.execute(PROGRESS_BATCH_WRITE_SQL, {
+            "entity_ids": [u.entity_id for u in applied],
+            "plan_ids": [u.plan_id for u in applied],
+            "percents": [u.progress_percent for u in applied],
+            "notes": [notes.get(str(u.entity_id), "") for u in applied],
+            "task_statuses": [_progress_statuses(u.progress_percent)[0].value for u in applied],
+            "event_entity_ids": [u.entity_id for u in events],
+            "event_plan_ids": [u.plan_id for u in events],
+            "event_percents": [u.progress_percent for u in events],
+            "event_notes": [u.notes or "" for u in events]
+        })
+        written = {str(row.entity_id): row for row in result}
+
+        # summed change per parent, and per plan for the tasks of daily plans
+        plan_of = {}
+        plan_child_type = {}
+        parent_counts_for_plan = {}
+        parent_deltas = {}
+        plan_deltas = {}
+        any_open = {}
+        any_complete = {}
+        for u in applied:
+            key, plan_key = str(u.entity_id), str(u.plan_id)
+            target = targets[key]
+            delta = written[key].delta
+            plan_of[plan_key] = plan_key
+            plan_child_type[plan_key] = PLAN_CHILD_ENTITY_TYPE.get(target.plan_type, EntityType.MILESTONE.value)
+            plan_deltas.setdefault(plan_key, 0.0)
+            any_open[plan_key] = any_open.get(plan_key, False) or u.progress_percent != 100
+            any_complete[plan_key] = any_complete.get(plan_key, False) or u.progress_percent == 100
+            if target.plan_type == 'Daily':
+                if target.entity_type == plan_child_type[plan_key]:
+                    plan_deltas[plan_key] += delta
+            else:
+                parent_key = str(target.parent_id)
+                plan_of[parent_key] = plan_key
+                parent_counts_for_plan[parent_key] = target.parent_type == plan_child_type[plan_key]
+                parent_deltas[parent_key] = parent_deltas.get(parent_key, 0.0) + (delta if target.entity_type in TASK_ENTITY_TYPES else 0)
+
+        parents = await _rollup_many(db, parent_deltas, plan_of, PARENT_CHILDREN, lambda entity_id: {})
+        for parent_key, (_, change) in parents.items():
+            if parent_counts_for_plan[parent_key]:
+                plan_deltas[plan_of[parent_key]] += change
+        plans = await _rollup_many(db, plan_deltas, plan_of, PLAN_CHILDREN,
+                                   lambda plan_key: {"child_type": plan_child_type[plan_key]})
+
+        plan_keys = list(plan_deltas)
+        result = await db.execute(PLAN_BATCH_STATUS_SQL, {"plan_ids": [uuid.UUID(p) for p in plan_keys],
+                                                          "any_open": [any_open[p] for p in plan_keys],
+                                                          "any_complete": [any_complete[p] for p in plan_keys]})
+        plan_statuses = {str(row.plan_id): row.plan_status for row in result}
+        logger.info(f"Applied {len(applied)} of {len(updates)} progress updates, rolled up {len(parents)} parents and {len(plans)} plans")
+
+        return [ProgressUpdateOut(entity_id=u.entity_id,
+                                  progress_percent=u.progress_percent,
+                                  notes=notes.get(str(u.entity_id), ""),
+                                  plan_progress=plans[str(u.plan_id)][0],
+                                  task_status=written[str(u.entity_id)].task_status,
+                                  plan_status=plan_statuses.get(str(u.plan_id)))
+                for u in applied]
 
     except IntegrityError as e:
-        logger.error(f"IntegrityError when updating executable plan: {str(e)}")
+        logger.error(f"IntegrityError when applying progress updates: {str(e)}")
         raise IntegrityException(
-            "Integrity error when updating executable plan",
-            context = {"detail": f"Issue with updating the executable plan {str(e)}"}
+            "Integrity error when applying progress updates",
+            context = {"detail": f"Issue with applying the progress updates {str(e)}"}
         )
     except SQLAlchemyError as e:
-        logger.error(f"Database error when updating executable plan: {str(e)}")
+        logger.error(f"Database error when applying progress updates: {str(e)}")
         raise GeneralDataException(
-            "Data base error occured while inserting the executable plan",
-            context={"detail": f"Database error when updating executable plan: {str(e)}"}
+            "Data base error occured while applying the progress updates",
+            context={"detail": f"Database error when applying progress updates: {str(e)}"}
         )
     except Exception as e:
-        logger.error(f"Database error when updating executable plan: {str(e)}")
+        logger.error(f"Unexpected error when applying progress updates: {str(e)}")
         raise GeneralDataException(
-            "Unexpected error occured updating the executable plan",
-            context={"detail" : f"Database error when updating executable plan: {str(e)}"}
+            "Unexpected error occured applying the progress updates",
+            context={"detail" : f"Unexpected error when applying progress updates: {str(e)}"}
         )
 
-
-async def update_progress_tracking(
-    db: AsyncSession, 
-    entity_id: UUID, 
-    plan_id: UUID,
-    new_percent: int, 
-    notes: Optional[str] = None
-):
+async def get_progress_events(db: AsyncSession, entity_id: UUID, user_id: UUID, limit: int = 20, after: Optional[tuple] = None) -> List[dict]:
     """
-    Update or create a ProgressTracking record for a given entity (daily, weekly, plan).
-    If notes are provided, append them to existing notes.
+    Progress history of an entity of one of the user's plans, newest first. Pages by
+    keyset on (created_at, id) when after (the key of the last row of the previous page)
+    is given.
     """
     try:
-        stmt = select(ProgressTracking).where(ProgressTracking.entity_id == entity_id)
-        result = await db.execute(stmt)
-        tracking = result.scalars().first()
-
-        '''
-        if new_percent == 100:
-            task_status = TaskStatus.COMPLETE
-        elif new_percent > 0:
-            task_status = TaskStatus.IN_PROGRESS
-            plan_status = PlanStatus.IN_PROGRESS
-        else:
-            task_status = TaskStatus.NOT_STARTED
-        value_params = {}
-        value_params["plan_id"] = plan_id
-        value_params["plan_status"] = plan_status.value
-        if task_status.value == TaskStatus.COMPLETE:
-            plan_res = await check_plan_completion(plan_id)
-            if plan_res:
-                if plan_res[0].total_tasks == plan_res[0].total_completed_tasks:
-                    ret = await update_plan(plan_id,value_params, db)
-        else:
-            task_status = PlanStatus.IN_PROGRESS
-            value_params["plan_status"] = task_status.value
-            ret = await update_plan(plan_id,value_params, db) 
-        '''
-
-        if not tracking:
-            # No tracking yet — create new
-            tracking = ProgressTracking(
-                entity_id=entity_id,
-                plan_id = plan_id,
-                cumulative_progress=new_percent,
-                notes=notes if notes else "",
-                milestone_25=1 if new_percent >= 25 else 0,
-                milestone_50=1 if new_percent >= 50 else 0,
-                milestone_75=1 if new_percent >= 75 else 0,
-                milestone_100=1 if new_percent == 100 else 0
-            )
-            db.add(tracking)
-        else:
-            # Update existing
-            new_cumulative_progress = new_percent
-            tracking.cumulative_progress = new_cumulative_progress
-            tracking.milestone_25 = 1 if new_cumulative_progress >= 25 else 0
-            tracking.milestone_50 = 1 if new_cumulative_progress >= 50 else 0
-            tracking.milestone_75 = 1 if new_cumulative_progress >= 75 else 0
-            tracking.milestone_100 = 1 if new_cumulative_progress == 100 else 0
-
-            if notes:
-                if tracking.notes:
-                    tracking.notes = tracking.notes.strip() + "\n" + notes.strip()
-                else:
-                    tracking.notes = notes.strip()
-        '''
-        filter_params = {}
-        value_params = {}
-        filter_params["plan_id"] = plan_id
-        filter_params["entity_id"] = entity_id
-        value_params["status_id"] = task_status.value
-        if new_percent == 100:
-            value_params["objective_completion_dt"] = datetime.now(timezone.utc)
-        ret_objective_status = await update_executable_plan(filter_params, value_params, db)
-        '''
-        await db.flush()
-    except IntegrityError as e:
-        logger.error(f"IntegrityError when updating progress tracking : {str(e)}")
-        raise IntegrityException(
-            "Integrity error when updating executable plan",
-            context = {"detail": f"Issue with updating the executable plan {str(e)}"}
+        query = PROGRESS_EVENTS_SQL.format(
+            after="AND (pe.created_at, pe.id) < (CAST(:after_created_at AS timestamptz), CAST(:after_id AS bigint))" if after is not None else ""
         )
+        params = {"entity_id": str(entity_id), "user_id": str(user_id), "limit": limit}
+        if after is not None:
+            params["after_created_at"], params["after_id"] = after
+        result = await db.execute(text(query), params)
+        return result.mappings().all()
+
     except SQLAlchemyError as e:
-        logger.error(f"Database error when updating executable plan: {str(e)}")
+        logger.error(f"Database error when reading progress history: {str(e)}")
         raise GeneralDataException(
-            "Data base error occured while inserting the executable plan",
-            context={"detail": f"Database error when updating executable plan: {str(e)}"}
+            "Data base error occured while reading the progress history",
+            context={"detail": f"Database error when reading progress history: {str(e)}"}
         )
     except Exception as e:
-        logger.error(f"Database error when updating executable plan: {str(e)}")
+        logger.error(f"Unexpected error when reading progress history: {str(e)}")
         raise GeneralDataException(
-            "Unexpected error occured updating the executable plan",
-            context={"detail" : f"Database error when updating executable plan: {str(e)}"}
+            "Unexpected error occured reading the progress history",
+            context={"detail" : f"Unexpected error when reading progress history: {str(e)}"}
+        )
+
+
+async def compact_progress_events(db: AsyncSession, cutoff: datetime, batch_size: int = 500, max_notes: int = 4000) -> tuple:
+    """
+    Fold the events older than cutoff of up to batch_size entities into one summary row
+    each. Returns (entities compacted, events removed); (0, 0) once nothing is left.
+    The caller commits.
+    """
+    try:
+        result = await db.execute(COMPACT_PROGRESS_EVENTS_SQL, {"cutoff": cutoff,
+                                                                "batch_size": batch_size,
+                                                                "max_notes": max_notes})
+        row = result.first()
+        return row.entities, row.events
+
+    except SQLAlchemyError as e:
+        logger.error(f"Database error when compacting progress events: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while compacting the progress events",
+            context={"detail": f"Database error when compacting progress events: {str(e)}"}
         )
+    except Exception as e:
+        logger.error(f"Unexpected error when compacting progress events: {str(e)}")
+        raise GeneralDataException(
+            "Unexpected error occured compacting the progress events",
+            context={"detail" : f"Unexpected error when compacting progress events: {str(e)}"}
+        )
+
+
+# Progress of a plan of the user in one statement: the plan's own progress and its top
+# level objectives (months, weeks, milestones) already grouped under it in sequence
+# order, each with its progress. Without a plan filter it is the user's latest plan.
+PROGRESS_BY_USER_SQL = """
+    SELECT up.plan_id,
+           up.plan_name,
+           up.plan_type,
+           coalesce(pt.cumulative_progress, 0) AS plan_progress_percent,
+           coalesce(pt.milestone_25, 0) AS plan_milestone_25,
+           coalesce(pt.milestone_50, 0) AS plan_milestone_50,
+           coalesce(pt.milestone_75, 0) AS plan_milestone_75,
+           coalesce(pt.milestone_100, 0) AS plan_milestone_100,
+           coalesce(o.objectives, '[]') AS objectives
+    FROM user_plan up
+    LEFT JOIN progress_tracking pt ON pt.entity_id = up.plan_id
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+                   'entity_id', e.entity_id,
+                   'entity_type', e.entity_type,
+                   'parent_id', e.parent_id,
+                   'activity_desc', e.activity_desc,
+                   'sequence_id', e.sequence_id,
+                   'progress_percent', coalesce(p.cumulative_progress, 0),
+                   'milestone_25', coalesce(p.milestone_25, 0),
+                   'milestone_50', coalesce(p.milestone_50, 0),
+                   'milestone_75', coalesce(p.milestone_75, 0),
+                   'milestone_100', coalesce(p.milestone_100, 0)
+               ) ORDER BY e.sequence_id) AS objectives
+        FROM executable_plan e
+        LEFT JOIN progress_tracking p ON p.entity_id = e.entity_id
+        WHERE e.plan_id = up.plan_id
+          AND e.entity_type IN ({objective_types})
+    ) o ON true
+    WHERE up.user_id = CAST(:user_id AS uuid)
+      {plan_filter}
+    ORDER BY up.created_dt DESC, up.plan_id DESC
+    LIMIT 1
+"""
+
 
-async def rollup_progress(session: AsyncSession, plan_id: UUID, updated_daily_entity_id: UUID, user_id: UUID):
+async def get_progress_by_user_entity(db: AsyncSession, user_id:UUID, entity_id: UUID = None):
+    """
+    Progress summary of the plan entity_id of the user, with its weeks and its other top
+    level objectives. Without entity_id it is the summary of the user's latest plan.
+    [] when the user has no such plan.
+    """
     try:
-        # 0. Get the plan information
-        result = await session.execute(select(UserPlan).where(UserPlan.plan_id == plan_id))
-        user_plan = result.scalars().first()
-        if not user_plan:
+        query = PROGRESS_BY_USER_SQL.format(
+            objective_types=", ".join(str(t.value) for t in (EntityType.MONTH, EntityType.WEEK, EntityType.MILESTONE)),
+            plan_filter="AND up.plan_id = CAST(:plan_id AS uuid)" if entity_id else ""
+        )
+        params = {"user_id": str(user_id)}
+        if entity_id:
+            params["plan_id"] = str(entity_id)
+        result = await db.execute(text(query), params)
+        plan = result.mappings().first()
+        if plan is None:
             return []  # No plans, return empty list
-        # 1. Find the parent weekly entity for the daily task
-        if user_plan.plan_type != 'Daily': 
-            result = await session.execute(
-                text("""
-                    SELECT parent_id
-                    FROM executable_plan
-                    WHERE entity_id = :entity_id 
-                """),
-                {"entity_id": str(updated_daily_entity_id)}
-            )
-            parent_id = result.scalar()
-            if not parent_id:
-                raise ValueError(f"No parent objective found for entity_id {updated_daily_entity_id}")
-
-            # 2. Recalculate Weekly Progress by averaging its daily children's progress
-            result = await session.execute(
-                text("""
-                    SELECT 
-                        COALESCE(SUM(p.cumulative_progress), 0) AS total_progress,
-                        COUNT(e.entity_id) AS total_tasks
-                    FROM executable_plan e
-                    LEFT JOIN progress_tracking p ON e.entity_id = p.entity_id
-                    WHERE e.parent_id = :weekly_id AND ( e.entity_type = 3 or e.entity_type = 1001)
-                """),
-                {"weekly_id": str(parent_id)}
-            )
-            row = result.fetchone()
-            total_progress, total_tasks = row
-            weekly_cumulative = (total_progress / total_tasks) if total_tasks > 0 else 0
-
-            # 3. Update the weekly tracking progress
-            await session.execute(
-                text("""
-                    INSERT INTO progress_tracking (plan_id, entity_id, cumulative_progress, updated_at)
-                    VALUES (:plan_id, :entity_id, :progress, now())
-                    ON CONFLICT (entity_id) DO UPDATE 
-                    SET cumulative_progress = :progress, updated_at = now()
-                """),
-                {"plan_id": str(plan_id), "entity_id": str(parent_id), "progress": weekly_cumulative}
-            )
-        # 4. Recalculate plan progress based on the plan type
-        if user_plan.plan_type == "Weekly":
-            result = await session.execute(
-                text("""
-                    SELECT 
-                        COALESCE(SUM(p.cumulative_progress), 0) AS total_progress,
-                        COUNT(e.entity_id) AS total_weeks
-                    FROM executable_plan e
-                    LEFT JOIN progress_tracking p ON e.entity_id = p.entity_id
-                    WHERE e.plan_id = :plan_id AND e.entity_type = 2
-                """),
-                {"plan_id": str(plan_id)}
-            )
-        elif user_plan.plan_type == "Daily":
-            result = await session.execute(
-                text("""
-                    SELECT 
-                        COALESCE(SUM(p.cumulative_progress), 0) AS total_progress,
-                        COUNT(e.entity_id) AS total_weeks
-                    FROM executable_plan e
-                    LEFT JOIN progress_tracking p ON e.entity_id = p.entity_id
-                    WHERE e.plan_id = :plan_id AND e.entity_type = 3
-                """),
-                {"plan_id": str(plan_id)}
-            )
-        else: # This is a milestone levely plan
-                result = await session.execute(
-                text("""
-                    SELECT 
-                        COALESCE(SUM(p.cumulative_progress), 0) AS total_progress,
-                        COUNT(e.entity_id) AS total_weeks
-                    FROM executable_plan e
-                    LEFT JOIN progress_tracking p ON e.entity_id = p.entity_id
-                    WHERE e.plan_id = :plan_id AND e.entity_type = 1000
-                """),
-                {"plan_id": str(plan_id)}
-            )
-        row = result.fetchone()
-        total_progress, total_weeks = row
-        plan_progress = (total_progress / total_weeks) if total_weeks > 0 else 0
-
-        # 5 Update the plan tracking progress
-        await session.execute(
-            text("""
-                INSERT INTO progress_tracking (plan_id, entity_id, cumulative_progress, updated_at)
-                VALUES (:plan_id, :entity_id, :progress, now())
-                ON CONFLICT (entity_id) DO UPDATE 
-                SET cumulative_progress = :progress, updated_at = now()
-            """),
-            {"plan_id": str(plan_id), "entity_id": str(plan_id), "progress": plan_progress}
+
+        objectives = plan["objectives"]
+        if isinstance(objectives, str):
+            objectives = json.loads(objectives)
+        week_progress_list = []
+        day_progress_list = []
+        for row in objectives:
+            if row["entity_type"] == EntityType.WEEK.value:
+                week_progress_list.append(ProgressWeeklyDetail.model_validate(row))
+            else:
+                day_progress_list.append(ProgressDailyDetail.model_validate(row))
+
+        return ProgressSummary(
+            plan_id=plan["plan_id"],
+            plan_name=plan["plan_name"],
+            plan_type=plan["plan_type"],
+            plan_progress_percent=plan["plan_progress_percent"],
+            plan_milestone_100=plan["plan_milestone_100"],
+            plan_milestone_25=plan["plan_milestone_25"],
+            plan_milestone_50=plan["plan_milestone_50"],
+            plan_milestone_75=plan["plan_milestone_75"],
+            week_detail=week_progress_list,
+            day_detail=day_progress_list
         )
-        
-        return plan_progress
 
     except IntegrityError as e:
         logger.error(f"IntegrityError when updating executable plan: {str(e)}")
@@ -444,6 +766,7 @@ async def rollup_progress(session: AsyncSession, plan_id: UUID, updated_daily_en
             context={"detail" : f"Database error when updating executable plan: {str(e)}"}
         )
 
+
 async def get_progress_tracking_by_plan(db: AsyncSession, plan_id: UUID, user_id: UUID)-> Optional[dict]:
     try:
         stmt = select(ProgressTracking).where(
@@ -471,247 +794,3 @@ async def get_progress_tracking_by_plan(db: AsyncSession, plan_id: UUID, user_id
             "Unexpected error occured updating the executable plan",
             context={"detail" : f"Database error when updating executable plan: {str(e)}"}
         )
-
-
-
-async def get_dashboard_summary_sql(db: AsyncSession, user_id: UUID, plan_id: Optional[UUID] = None) -> Optional[dict]:
-    try:
-        # Base query string
-        query = """
-            WITH user_plans AS (
-                SELECT plan_id, plan_type, approved_by_user, plan_start_date, plan_end_date, plan_goal, plan_status, user_id
-                FROM user_plan
-                WHERE user_id = :user_id
-                """ + (" AND plan_id = :plan_id" if plan_id else "") + """
-            ),
-        progress_per_plan AS (
-            SELECT 
-                pt.entity_id AS plan_id,
-                MAX(pt.cumulative_progress) AS plan_progress
-            FROM progress_tracking pt
-            INNER JOIN user_plans up ON up.plan_id = pt.entity_id
-            GROUP BY pt.entity_id
-        ),
-        task_changes_per_plan AS (
-            SELECT 
-                pdc.plan_id,
-                COUNT(DISTINCT pdc.id) AS task_change_count
-            FROM plan_detail_change_log pdc
-            INNER JOIN user_plans up ON up.plan_id = pdc.plan_id
-            GROUP BY pdc.plan_id
-        ),
-        plan_changes_per_plan AS (
-            SELECT 
-                pc.plan_id,
-                COUNT(DISTINCT pc.id) AS plan_change_count
-            FROM plan_change_log pc
-            INNER JOIN user_plans up ON up.plan_id = pc.plan_id
-            GROUP BY pc.plan_id
-        )
-        SELECT
-            COALESCE(pp.plan_progress, NULL) AS plan_progress,  
-            COALESCE(tc.task_change_count, 0) AS task_change_count,
-            COALESCE(pc.plan_change_count, 0) AS plan_change_count,
-            
-            COUNT(DISTINCT up.plan_id) AS total_plans,
-            COUNT(DISTINCT CASE WHEN up.plan_status = 1 THEN up.plan_id END) 
-                 AS total_active_plans,
-            up.plan_id,
-            up.plan_type,
-            up.approved_by_user,
-            up.plan_start_date,
-            up.plan_end_date,
-            up.plan_goal
-        FROM user_plans up
-        LEFT JOIN progress_per_plan pp 
-            ON pp.plan_id = up.plan_id
-        LEFT JOIN task_changes_per_plan tc
-            ON tc.plan_id = up.plan_id
-        LEFT JOIN plan_changes_per_plan pc
-            ON pc.plan_id = up.plan_id
-        GROUP BY 
-            up.plan_id,
-            up.plan_type,
-            up.approved_by_user,
-            up.plan_start_date,
-            up.plan_end_date,
-            up.plan_goal,
-            pp.plan_progress,
-            tc.task_change_count,
-            pc.plan_change_count
-        """
-
-
-        # Add optional plan_id filter
-
-        params = {"user_id": str(user_id)}
-
-        if plan_id:
-            params["plan_id"] = str(plan_id)
-        
-        '''
-        query = """
-            SELECT 
-                MAX(CASE 
-                    WHEN pt_plan.entity_id = up.plan_id THEN pt_plan.cumulative_progress 
-                    ELSE 0 
-                END) AS plan_progress,
-                COUNT(DISTINCT pdc.id) AS task_change_count,
-                COUNT(DISTINCT pc.id) AS plan_change_count,
-                coalesce(count(distinct up.plan_id),0) as total_plans,
-                coalesce(count(distinct case when up.plan_status = 1 then up.plan_id else null end),0) as total_active_plans,
-                up.plan_id,
-                up.plan_type,
-                up.approved_by_user,
-                up.plan_start_date,
-                up.plan_end_date,
-                up.plan_goal
-            FROM 
-                user_plan up
-            LEFT JOIN progress_tracking pt_plan ON pt_plan.entity_id = up.plan_id
-            LEFT JOIN plan_detail_change_log pdc ON pdc.plan_id = up.plan_id
-            LEFT JOIN plan_change_log pc ON pc.plan_id = up.plan_id
-            WHERE 
-                up.user_id = :user_id
-        """
-
-        # Parameters dictionary
-        params = {"user_id": str(user_id)}
-
-        # Add conditionally if plan_id is provided
-        if plan_id:
-            query += " AND up.plan_id = :plan_id"
-            params["plan_id"] = str(plan_id)
-
-        # Add GROUP BY clause
-        query += """
-            GROUP BY 
-                up.plan_id,
-                up.plan_type,
-                up.approved_by_user,
-                up.plan_start_date,
-                up.plan_end_date,
-                up.plan_goal
-        """
-        '''
-
-        # Execute the query
-        result = await db.execute(text(query), params)
-        res = result.mappings().all()
-        return res
-
-    except IntegrityError as e:
-        logger.error(f"IntegrityError when updating executable plan: {str(e)}")
-        raise IntegrityException(
-            "Integrity error when updating executable plan",
-            context={"detail": f"Issue with updating the executable plan {str(e)}"}
-        )
-    except SQLAlchemyError as e:
-        logger.error(f"Database error when updating executable plan: {str(e)}")
-        raise GeneralDataException(
-            "Database error occurred while inserting the executable plan",
-            context={"detail": f"Database error when updating executable plan: {str(e)}"}
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error when updating executable plan: {str(e)}")
-        raise GeneralDataException(
-            "Unexpected error occurred updating the executable plan",
-            context={"detail": f"Database error when updating executable plan: {str(e)}"}
-        )
-
-
-async def calculate_task_delay(user_id: UUID, db: AsyncSession):
-
-    try:
-        params ={"user_id": str(user_id)}
-        sql = """
-                SELECT 
-                    coalesce(sum(distinct case when  
-                        ep.start_date < current_timestamp then current_date - ep.start_date::date else null end),0) as objectives_delayed_time ,
-                    coalesce(count(ep.entity_id),0) as total_objectives,
-                    coalesce(count(case when ep.start_date::date = current_date then ep.entity_id else null end),0) as total_current_tasks,
-                    coalesce(count(case when  status_id = 100 then ep.entity_id else null end),0) as total_completed_tasks,
-                    coalesce(count(case when  status_id = 100 and objective_completion_dt::date = current_date::date then ep.entity_id else null end),0) as total_completed_tasks_today,
-                    coalesce(count(case when status_id = 99 then ep.entity_id else null end),0) as total_in_progress_tasks,
-                    coalesce(count(case when status_id = 0 then ep.entity_id else null end),0) as total_not_started_tasks,
-                    coalesce(count(case when start_date::date < current_date and status_id not in (99,100) then ep.entity_id else null end), 0) as total_delayed_tasks,
-                    up.plan_id,
-                    up.plan_start_date
-                FROM 
-                    user_plan up
-                JOIN executable_plan ep ON ep.plan_id = up.plan_id
-                WHERE 
-                    up.user_id = :user_id and 
-                    approved_by_user != 0 and 
-                    entity_type not in ( 2, 1000, 999) and 
-                    ep.status_id = 0 
-                            GROUP BY 
-                    up.plan_id,
-                    up.plan_start_date
-
-            """
-        result = await db.execute(text(sql), params)
-        res = result.mappings().all()
-        return res
-    
-    except IntegrityError as e:
-        logger.error(f"IntegrityError when updating executable plan: {str(e)}")
-        raise IntegrityException(
-            "Integrity error when updating executable plan",
-            context={"detail": f"Issue with updating the executable plan {str(e)}"}
-        )
-    except SQLAlchemyError as e:
-        logger.error(f"Database error when updating executable plan: {str(e)}")
-        raise GeneralDataException(
-            "Database error occurred while inserting the executable plan",
-            context={"detail": f"Database error when updating executable plan: {str(e)}"}
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error when updating executable plan: {str(e)}")
-        raise GeneralDataException(
-            "Unexpected error occurred updating the executable plan",
-            context={"detail": f"Database error when updating executable plan: {str(e)}"}
-        )
-
-
-async def check_plan_completion(plan_id: UUID, db: AsyncSession):
-
-    try:
-        filter_params = {}
-        filter_params["plan_id"] = plan_id
-        params = {"plan_id": str(plan_id)}
-        sql = """
-            select
-                count(ep.entity_id ) as total_tasks,
-                count(case when  status_id = 100 then ep.entity_id else null end) as total_completed_tasks,
-                count(case when status_id = 99 then ep.entity_id else null end) as total_in_progress_tasks,
-                count(case when status_id = 0 then ep.entity_id else null end) as total_not_started_tasks,
-                count(case when start_date::date < current_date and status_id not in (99,100) then ep.entity_id else null end) as total_delayed_tasks
-            from 
-                executable_plan ep
-            where
-                plan_id = :plan_id and
-                ep.entity_type not in (2, 1000, 999)
-            """
-        result = await db.execute(text(sql), params)
-        res = result.mappings().all()
-        return res
-    
-    except IntegrityError as e:
-        logger.error(f"IntegrityError when updating executable plan: {str(e)}")
-        raise IntegrityException(
-            "Integrity error when updating executable plan",
-            context={"detail": f"Issue with updating the executable plan {str(e)}"}
-        )
-    except SQLAlchemyError as e:
-        logger.error(f"Database error when updating executable plan: {str(e)}")
-        raise GeneralDataException(
-            "Database error occurred while inserting the executable plan",
-            context={"detail": f"Database error when updating executable plan: {str(e)}"}
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error when updating executable plan: {str(e)}")
-        raise GeneralDataException(
-            "Unexpected error occurred updating the executable plan",
-            context={"detail": f"Database error when updating executable plan: {str(e)}"}
-        )
\ No newline at end of file
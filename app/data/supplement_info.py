@@ -1,8 +1,8 @@
 
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, insert
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import Integer, String, Boolean, Column, Table, DateTime, UUID, BigInteger
+from sqlalchemy import Integer, String, Boolean, Column, Table, DateTime, UUID, BigInteger, Float
 from sqlalchemy.sql import func
 from typing import List, Optional, Dict, Any, Union
 from app.data.dbinit import Base
@@ -19,10 +19,12 @@ class DBSupplementData(Base):
     __tablename__ = "user_plan_activity_helper_data"
     c_id = Column(BigInteger, primary_key=True)
     rec_id = Column(UUID(as_uuid=True))
+    plan_id = Column(UUID(as_uuid=False), nullable=True)
     entity_id = Column(UUID(as_uuid=False), nullable=False)
     ext_site_url = Column(String, nullable=True)
     ext_site_title = Column(String, nullable=True)
     ext_site_keyword = Column(String, nullable=True)
+    relevance_score = Column(Float, nullable=True)
 
 
 async def get_data(db: AsyncSession, filter_params: dict) -> Optional[List[DBSupplementData]]:
@@ -30,9 +32,11 @@ async def get_data(db: AsyncSession, filter_params: dict) -> Optional[List[DBSup
 
         stmt = select(DBSupplementData)
         if filter_params:
+            if filter_params.get("plan_id") is not None:
+                stmt = stmt.where(DBSupplementData.plan_id == str(filter_params["plan_id"]))
             if filter_params.get("entity_id") is not None:
-                print ("The entity id is ", filter_params["entity_id"])
-                stmt = stmt.where(DBSupplementData.entity_id == filter_params["entity_id"])
+                stmt = stmt.where(DBSupplementData.entity_id == str(filter_params["entity_id"]))
+            stmt = stmt.order_by(DBSupplementData.entity_id, DBSupplementData.relevance_score.desc().nulls_last())
         else:
             raise GeneralDataException(message="No filters given",
                                        context = "Trying to fetch rows from supplement data without providing filters")
@@ -70,6 +74,33 @@ async def get_data(db: AsyncSession, filter_params: dict) -> Optional[List[DBSup
 
 
 
+async def replace_plan_supplement_data(db: AsyncSession, plan_id: str, rows: List[Dict[str, Any]]) -> int:
+    """
+    Replace the precomputed supplement links of a plan with the given rows.
+    Each row is a dict of DBSupplementData columns.
+    """
+    try:
+        await db.execute(delete(DBSupplementData).where(DBSupplementData.plan_id == str(plan_id)))
+        if rows:
+            await db.execute(insert(DBSupplementData), rows)
+        return len(rows)
+
+    except IntegrityError as e:
+
+        logger.error(f"IntegrityError when storing supplement data: {str(e)}")
+        raise IntegrityException(
+            "Integrity error when storing supplement data",
+            context = {"detail": f"Integrity error when storing supplement data for plan {plan_id}"}
+        )
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when storing supplement data: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while storing supplement data",
+            context={"detail": f"Database error occurred while storing supplement data for plan {plan_id}"}
+        )
+
+
 async def get_data_no_orm(db: AsyncSession, filter_params: dict) -> Optional[List[DBSupplementData]]:
     try:
         if not filter_params:
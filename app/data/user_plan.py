@@ -1,15 +1,20 @@
 from app.model.user import UserCreate, UserUpdate
 from app.model.user_prompt_response import UXGoalBuilder, GeneralRecommendationAndGuidelines, RoutineSummary
 from sqlalchemy.exc import SQLAlchemyError, MultipleResultsFound, NoResultFound, IntegrityError
-from sqlalchemy import select, update, insert, bindparam, ForeignKey, BigInteger, cast
+from sqlalchemy import select, update, insert, bindparam, ForeignKey, BigInteger, cast, values, column, tuple_, union_all, literal_column
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import Integer, String, Boolean, Column, Table, DateTime, UUID, Text, Float, or_, and_, func, text
+from sqlalchemy import Computed, Index
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.model.user_plan import UserPlan as UserPlanModel, UserPlanIdentifier as UserPlanIdentifierModel, UXUserPlanIdentifier, IExecutionPlanDetail, ICreatedPlan
 from typing import List, Optional, Dict, Any, Union
 from app.data.dbinit import Base, get_db
+from app.data.bulk_write import bulk_insert_rows
+from app.common.site_enums import Level, EntityType, PlanStatus
 from app.data.common_table import ProgressUpdate
+from app.common.sql_logging import log_sampled_sql
 import structlog
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status
@@ -77,9 +82,30 @@ class CreatedPlan(Base):
     entity_desc = Column(String, nullable=False)
     suggested_duration = Column(String, nullable=False)
     suggested_start_time = Column(String, nullable=True)
+    # hash of the node and everything below it, used to reuse subtrees across revisions
+    content_hash = Column(String(40), nullable=True)
 
     created_plan = relationship("UserPlan" ,back_populates="created_activities")
 
+class CreatedPlanDocument(Base):
+    """
+    Document storage mode (settings.PLAN_DOCUMENT_MODE): the whole created plan as one
+    JSONB value, shaped like PlanDetailForUserManagement. The few fields we filter on
+    are generated columns, and the GIN index serves containment queries on the rest.
+    """
+    __tablename__ = "created_plan_document"
+    __table_args__ = (
+        Index("ix_created_plan_document_user_id", "user_id"),
+        Index("ix_created_plan_document_root_id", "root_id"),
+        Index("ix_created_plan_document_doc", "document", postgresql_using="gin", postgresql_ops={"document": "jsonb_path_ops"}),
+    )
+    plan_id = Column(UUID(as_uuid=True), ForeignKey('user_plan.plan_id'), primary_key=True)
+    document = Column(JSONB, nullable=False)
+    user_id = Column(UUID(as_uuid=True), Computed("CAST(document -> 'plan_header' ->> 'user_id' AS uuid)", persisted=True))
+    root_id = Column(UUID(as_uuid=True), Computed("CAST(document -> 'plan_header' ->> 'root_id' AS uuid)", persisted=True))
+    plan_type = Column(String, Computed("document -> 'plan_header' ->> 'plan_type'", persisted=True))
+    created_dt = Column(DateTime(timezone=True), server_default=func.now())
+
 class ExecutablePlan(Base):
     __tablename__ = "executable_plan"
     plan_id = Column(UUID(as_uuid=True),ForeignKey('user_plan.plan_id'), primary_key=True )
@@ -237,6 +263,33 @@ async def get_plan(filter_params: Optional[Dict[str, Any]], db: AsyncSession) ->
         )
 
 
+async def get_plans_page(user_id: UUID, limit: int, after: Optional[tuple], db: AsyncSession) -> List[UserPlan]:
+    """
+    Plans of a user newest first, keyset paginated on (created_dt, plan_id). after is
+    the key of the last plan of the previous page. Fetches limit + 1 rows so the
+    caller can tell whether there is a next page.
+    """
+    try:
+        stmt = (
+            select(UserPlan)
+            .where(UserPlan.user_id == user_id)
+            .order_by(UserPlan.created_dt.desc(), UserPlan.plan_id.desc())
+            .limit(limit + 1)
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(UserPlan.created_dt, UserPlan.plan_id) < tuple_(*after))
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when selecting the plans of a user: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while selecting the plans",
+            context={"detail": "Database error occurred while selecting the plans of the user"}
+        )
+
+
 async def update_plan(
     plan_id: UUID,
     value_params: dict,
@@ -450,6 +503,265 @@ async def insert_created_plan(user_plan: ICreatedPlan , db: AsyncSession) -> Opt
             context={"detail" : "An unexpected error occurred while creating the user plan"}
         )
 
+
+async def upsert_created_plan_document(plan_id: str, document: Dict[str, Any], db: AsyncSession) -> None:
+    try:
+        stmt = pg_insert(CreatedPlanDocument).values(plan_id=plan_id, document=document)
+        stmt = stmt.on_conflict_do_update(index_elements=[CreatedPlanDocument.plan_id], set_={"document": stmt.excluded.document})
+        await db.execute(stmt)
+
+    except IntegrityError as e:
+
+        logger.error(f"IntegrityError when storing the plan document: {str(e)}")
+        raise IntegrityException(
+            "Integrity error when storing the plan document",
+            context = {"detail": "Possible foreign key constraint failure in the plan document."}
+        )
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when storing the plan document: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while storing the plan document",
+            context={"detail": "Database error occurred while storing the plan document"}
+        )
+
+
+async def get_created_plan_document(plan_id: str, user_id: Optional[str], db: AsyncSession) -> Optional[Any]:
+    """
+    The plan document together with the user_plan header columns that can change after
+    the plan is created, in one primary key lookup. None when the plan has no document.
+    """
+    try:
+        stmt = (
+            select(CreatedPlanDocument.document,
+                   UserPlan.plan_name,
+                   UserPlan.plan_goal,
+                   UserPlan.plan_start_date,
+                   UserPlan.plan_end_date)
+            .join(UserPlan, CreatedPlanDocument.plan_id == UserPlan.plan_id)
+            .filter(CreatedPlanDocument.plan_id == plan_id)
+        )
+        if user_id is not None:
+            stmt = stmt.filter(CreatedPlanDocument.user_id == user_id)
+        result = await db.execute(stmt)
+        return result.first()
+
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when reading the plan document: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while reading the plan document",
+            context={"detail": "Database error occurred while reading the plan document"}
+        )
+
+
+async def get_created_plan_subtree_hashes(plan_id: str, user_id: str, db: AsyncSession) -> List[Any]:
+    """
+    Sequence id, level and content hash of the root and branch nodes of a plan owned
+    by the user. Plans written before content hashing return nothing.
+    """
+    try:
+        stmt = (
+            select(CreatedPlan.sequence_id, CreatedPlan.level_id, CreatedPlan.content_hash)
+            .join(UserPlan, CreatedPlan.plan_id == UserPlan.plan_id)
+            .filter(CreatedPlan.plan_id == plan_id)
+            .filter(UserPlan.user_id == user_id)
+            .filter(CreatedPlan.level_id.in_([Level.ROOT.value, Level.BRANCH.value]))
+            .filter(CreatedPlan.content_hash.is_not(None))
+            .order_by(CreatedPlan.sequence_id)
+        )
+        result = await db.execute(stmt)
+        return result.all()
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when reading subtree hashes: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while reading the previous plan",
+            context={"detail": "Database error occurred while reading subtree hashes of the previous plan"}
+        )
+
+
+# Copies whole sequence id blocks of the previous plan (a week is [s, s+10000), a day
+# inside a week is [s, s+100)) under new entity ids. Parents are remapped inside each
+# block; the top node of a block gets parent_id from the block (NULL for roots).
+COPY_CREATED_PLAN_BLOCKS_SQL = text("""
+    WITH blocks AS (
+        SELECT * FROM unnest(CAST(:block_start AS int[]), CAST(:block_size AS int[]),
+                             CAST(:shift AS int[]), CAST(:parent_id AS uuid[]))
+               WITH ORDINALITY AS b(block_start, block_size, shift, parent_id, block_no)
+    ),
+    src AS MATERIALIZED (
+        SELECT c.*, gen_random_uuid() AS new_entity_id, b.block_no, b.shift, b.parent_id AS block_parent_id
+        FROM created_plan c
+        JOIN blocks b ON c.sequence_id >= b.block_start AND c.sequence_id < b.block_start + b.block_size
+        WHERE c.plan_id = :prev_plan_id
+    )
+    INSERT INTO created_plan (plan_id, entity_id, parent_id, entity_type, status_id, source_id, level_id,
+                              sequence_id, entity_desc, suggested_duration, suggested_start_time, content_hash)
+    SELECT CAST(:plan_id AS uuid), s.new_entity_id, COALESCE(p.new_entity_id, s.block_parent_id), s.entity_type, s.status_id,
+           s.source_id, s.level_id, s.sequence_id + s.shift, s.entity_desc, s.suggested_duration,
+           s.suggested_start_time, s.content_hash
+    FROM src s
+    LEFT JOIN src p ON p.entity_id = s.parent_id AND p.block_no = s.block_no
+    RETURNING plan_id, entity_id, parent_id, entity_type, status_id, source_id, level_id, sequence_id,
+              entity_desc, suggested_duration, suggested_start_time, content_hash
+""")
+
+
+async def copy_created_plan_blocks(prev_plan_id: str, plan_id: str, blocks: List[Dict[str, Any]], db: AsyncSession) -> List[Dict[str, Any]]:
+    """
+    Copy unchanged subtrees of the previous revision server side with one
+    INSERT ... SELECT. Each block has block_start, block_size, shift and parent_id.
+    Returns the rows written.
+    """
+    if not blocks:
+        return []
+    try:
+        result = await db.execute(COPY_CREATED_PLAN_BLOCKS_SQL, {
+            "prev_plan_id": prev_plan_id,
+            "plan_id": plan_id,
+            "block_start": [block["block_start"] for block in blocks],
+            "block_size": [block["block_size"] for block in blocks],
+            "shift": [block["shift"] for block in blocks],
+            "parent_id": [block["parent_id"] for block in blocks],
+        })
+        return [dict(row) for row in result.mappings().all()]
+
+    except IntegrityError as e:
+
+        logger.error(f"IntegrityError when copying plan subtrees: {str(e)}")
+        raise IntegrityException(
+            "Integrity error when copying the unchanged part of the plan",
+            context = {"detail": "Possible duplicate entry or foreign key constraint failure in the created plan."}
+        )
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when copying plan subtrees: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while copying the unchanged part of the plan",
+            context={"detail": "Database error occurred while copying the unchanged part of the plan"}
+        )
+
+
+# Approves a plan in one statement. Start dates follow the plan shape: the first week
+# starts on the plan start date and later weeks a week after it, the n-th day starts
+# n-1 days after the plan start, the n-th milestone (n-1) * days_per_milestone days
+# after it. Every other node (activity, task) inherits the date of the closest
+# dated node before it in sequence order. Nothing is inserted if the plan was
+# already approved.
+APPROVE_PLAN_SQL = text("""
+    WITH ranked AS (
+        SELECT c.*,
+               row_number() OVER (PARTITION BY c.entity_type ORDER BY c.sequence_id) AS type_rank,
+               count(*) FILTER (WHERE c.entity_type = :milestone) OVER () AS n_milestones
+        FROM created_plan c
+        WHERE c.plan_id = :plan_id
+    ),
+    anchored AS (
+        SELECT r.*,
+               CASE r.entity_type
+                   WHEN :week THEN CAST(:start_date AS timestamptz)
+                        + CASE WHEN r.type_rank = 1 THEN interval '0 days' ELSE interval '7 days' END
+                   WHEN :day THEN CAST(:start_date AS timestamptz) + (r.type_rank - 1) * interval '1 day'
+                   WHEN :milestone THEN CAST(:start_date AS timestamptz) + (r.type_rank - 1) * interval '1 day'
+                        * CASE WHEN CAST(:goal_days AS float8) <> 0
+                               THEN trunc(CAST(:goal_days AS float8) / r.n_milestones)
+                               ELSE CAST(:default_days AS int) END
+               END AS anchor_date
+        FROM ranked r
+    ),
+    grouped AS (
+        SELECT a.*, count(a.anchor_date) OVER (ORDER BY a.sequence_id) AS date_group
+        FROM anchored a
+    ),
+    dated AS (
+        SELECT g.*, max(g.anchor_date) OVER (PARTITION BY g.date_group) AS start_date
+        FROM grouped g
+    )
+    INSERT INTO executable_plan (plan_id, entity_id, parent_id, entity_type, status_id, reminder_request,
+                                 progress_measure, activity_desc, start_date, sequence_id, level_id,
+                                 request_reminder_time)
+    SELECT d.plan_id, d.entity_id, d.parent_id, d.entity_type, CAST(:status_id AS int), NULL,
+           0.0, d.entity_desc, d.start_date, d.sequence_id, d.level_id, NULL
+    FROM dated d
+    WHERE NOT EXISTS (SELECT 1 FROM executable_plan e WHERE e.plan_id = :plan_id)
+    ORDER BY d.sequence_id
+    RETURNING *
+""")
+
+
+async def approve_created_plan(plan_id: str,
+                               start_date: datetime,
+                               status_id: int,
+                               goal_days: float,
+                               default_days: int,
+                               db: AsyncSession) -> List[ExecutablePlan]:
+    """
+    Copy the created plan into executable_plan with INSERT ... SELECT, deriving the
+    start dates in SQL (see APPROVE_PLAN_SQL). Returns the inserted rows in sequence
+    order, or an empty list when the plan is already approved or has no nodes.
+    """
+    try:
+        stmt = select(ExecutablePlan).from_statement(APPROVE_PLAN_SQL.bindparams(
+            plan_id=plan_id,
+            start_date=start_date,
+            status_id=status_id,
+            goal_days=goal_days,
+            default_days=default_days,
+            week=EntityType.WEEK.value,
+            day=EntityType.DAY.value,
+            milestone=EntityType.MILESTONE.value
+        ))
+        result = await db.execute(stmt)
+        return sorted(result.scalars().all(), key=lambda row: row.sequence_id)
+
+    except IntegrityError as e:
+
+        logger.error(f"IntegrityError when approving the plan: {str(e)}")
+        raise IntegrityException(
+            "Integrity error when approving the plan",
+            context = {"detail": "This plan conflicts with an existing plan. Possible duplicate entry or foreign key constraint failure."}
+        )
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when approving the plan: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while approving the plan",
+            context={"detail": "Database error occurred while approving the plan"}
+        )
+
+
+async def bulk_insert_created_plan(rows: List[Dict[str, Any]], db: AsyncSession) -> int:
+    """
+    Insert the nodes of a plan in bulk, with COPY for very large plans. The rows carry
+    client generated entity_id values, so nothing has to be returned to link children
+    to their parents.
+    """
+    try:
+        return await bulk_insert_rows(db, CreatedPlan, rows)
+
+    except IntegrityError as e:
+
+        logger.error(f"IntegrityError when bulk inserting created plan: {str(e)}")
+        raise IntegrityException(
+            "Integrity error when inserting the created plan",
+            context = {"detail": "Possible duplicate entry or foreign key constraint failure in the created plan."}
+        )
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when bulk inserting created plan: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while inserting the created plan",
+            context={"detail": "Database error occurred while inserting the created plan"}
+        )
+    except Exception as e:
+
+        logger.error(f"Unexpected error in bulk_insert_created_plan: {str(e)}")
+        raise GeneralDataException(
+            "Unexpected error occured inserting the created plan",
+            context={"detail" : "An unexpected error occurred while inserting the created plan"}
+        )
+
 async def get_executable_plan(filter_params: Optional[Dict[str, Any]], db: AsyncSession) -> Optional[List[IExecutionPlanDetail]]:
     try:
 
@@ -516,7 +828,7 @@ async def get_created_plan(filter_params: Optional[Dict[str, Any]], db: AsyncSes
                 end_date = filter_params["start_date"] + timedelta(days=filter_params["days_to_add"])
                 stmt = stmt.filter(CreatedPlan.start_date <= end_date)
 
-            stmt.order_by(CreatedPlan.sequence_id)
+        stmt = stmt.order_by(CreatedPlan.sequence_id)
 
         logger.info(f"The SQL statement is {stmt}")
         result = await db.execute(stmt)
@@ -575,12 +887,74 @@ ORDER BY start_date;
 
 
 
+def _upcoming_branch(condition, filter_params: Dict[str, Any]):
+    """
+    Keys of the open tasks matching one branch of the upcoming activities, filtered and
+    limited the way the outer query is, so each branch is a range scan of one partial index.
+    """
+    stmt = select(
+        ExecutablePlan.plan_id,
+        ExecutablePlan.entity_id,
+        ExecutablePlan.sequence_id
+    ).join(
+        UserPlan,
+        ExecutablePlan.plan_id == UserPlan.plan_id
+    ).where(
+        condition,
+        ExecutablePlan.entity_type != 999
+    )
+    if filter_params.get("exclude_entity_types"):
+        stmt = stmt.filter(ExecutablePlan.entity_type.notin_(filter_params["exclude_entity_types"]))
+    if filter_params.get("after") is not None:
+        # keyset pagination, after is the (sequence_id, entity_id) of the last row of the previous page
+        stmt = stmt.filter(tuple_(ExecutablePlan.sequence_id, ExecutablePlan.entity_id) > tuple_(*filter_params["after"]))
+    if "plan_id" in filter_params:
+        stmt = stmt.filter(ExecutablePlan.plan_id == filter_params["plan_id"])
+    if "user_id" in filter_params:
+        stmt = stmt.filter(UserPlan.user_id == filter_params["user_id"])
+    if "sequence_id" in filter_params:
+        stmt = stmt.filter(ExecutablePlan.sequence_id >= filter_params["sequence_id"])
+    if "entity_id" in filter_params:
+        stmt = stmt.filter(ExecutablePlan.entity_id == filter_params["entity_id"])
+    if filter_params.get("limit"):
+        # the first n rows of the union are among the first n rows of its branches
+        stmt = stmt.order_by(ExecutablePlan.sequence_id, ExecutablePlan.entity_id).limit(filter_params["limit"] + 1)
+    return stmt
+
+
 async def get_upcoming_activities_db(filter_params: Optional[Dict[str, Any]], db: AsyncSession):
+    """
+    Tasks in progress, not started and overdue, or not started and due within
+    days_to_add of start_date. One OR over status and dates cannot use an index, so the
+    three cases are separate branches of a UNION ALL (disjoint, no dedup needed), each
+    served by a partial index on executable_plan (migration 4). Only the keys go through
+    the union; the selected page is then joined to its details and progress.
+    """
+    # statuses are inlined, a bind parameter would keep a generic plan off the partial indexes
+    in_progress = literal_column(str(PlanStatus.IN_PROGRESS.value))
+    not_started = literal_column(str(PlanStatus.TO_BE_STARTED.value))
     try:
+        end_date = filter_params["start_date"] + timedelta(
+            days=filter_params.get("days_to_add", 7)
+        )
+        open_tasks = union_all(
+            _upcoming_branch(ExecutablePlan.status_id == in_progress, filter_params),
+            _upcoming_branch(and_(
+                ExecutablePlan.status_id == not_started,
+                ExecutablePlan.start_date <= func.now()
+            ), filter_params),
+            _upcoming_branch(and_(
+                ExecutablePlan.status_id == not_started,
+                ExecutablePlan.start_date > func.now(),
+                ExecutablePlan.start_date.between(filter_params["start_date"], end_date)
+            ), filter_params)
+        ).subquery("open_tasks")
+
         stmt = select(
             UserPlan.plan_id.label("user_plan_id"), 
             UserPlan.plan_name.label("plan_name"),
             ExecutablePlan.entity_id.label("entity_id"),
+            ExecutablePlan.sequence_id.label("sequence_id"),
             ExecutablePlan.activity_desc.label("activity_desc"),
             func.to_char(ExecutablePlan.start_date, "YYYY-MM-DD HH24:MI:SS").label("start_date"),
             ExecutablePlan.reminder_request.label("reminder_request"),
@@ -589,6 +963,14 @@ async def get_upcoming_activities_db(filter_params: Optional[Dict[str, Any]], db
             ExecutablePlan.status_id.label("status_id"),
             ExecutablePlan.progress_measure,
             func.coalesce(ProgressUpdate.progress_percent,0.0).label("progress_percent")  # <-- new field
+        ).select_from(
+            open_tasks
+        ).join(
+            ExecutablePlan,
+            and_(
+                ExecutablePlan.plan_id == open_tasks.c.plan_id,
+                ExecutablePlan.entity_id == open_tasks.c.entity_id
+            )
         ).join(
             UserPlan, 
             ExecutablePlan.plan_id == UserPlan.plan_id
@@ -600,48 +982,12 @@ async def get_upcoming_activities_db(filter_params: Optional[Dict[str, Any]], db
             )
         )
 
-        if "start_date" in filter_params:
-            end_date = filter_params["start_date"] + timedelta(
-            days=filter_params.get("days_to_add", 7)
-            )
-        
-        # Core filtering logic for task status and timeline
-        stmt = stmt.where(
-            or_(
-                ExecutablePlan.status_id == 1,  # In-progress tasks
-                and_(
-                    ExecutablePlan.status_id == 0,  # Not started
-                    or_(
-                        ExecutablePlan.start_date <= func.now(),  # Overdue
-                        ExecutablePlan.start_date.between(  # Upcoming
-                            filter_params["start_date"],
-                            end_date
-                        )
-                    )
-                )
-            )
-        )
-        stmt = stmt.filter(ExecutablePlan.entity_type != 999)
-        # Apply additional filters
-        if filter_params:
-            if "plan_id" in filter_params:
-                stmt = stmt.filter(UserPlan.plan_id == filter_params["plan_id"])
-            if "user_id" in filter_params:
-                stmt = stmt.filter(UserPlan.user_id == filter_params["user_id"])
-            if "sequence_id" in filter_params:
-                stmt = stmt.filter(
-                    ExecutablePlan.sequence_id >= filter_params["sequence_id"]
-                )
-            if "entity_id" in filter_params:
-                stmt = stmt.filter(
-                    ExecutablePlan.entity_id == filter_params["entity_id"]
-                )
-
-
-        # Consistent ordering
-        stmt = stmt.order_by(ExecutablePlan.sequence_id)
+        # Consistent ordering, entity_id breaks ties between plans so pages are stable
+        stmt = stmt.order_by(open_tasks.c.sequence_id, open_tasks.c.entity_id)
+        if filter_params.get("limit"):
+            stmt = stmt.limit(filter_params["limit"] + 1)
 
-        logger.info(f"Generated SQL: {stmt}")
+        log_sampled_sql("get_upcoming_activities_db", stmt)
         result = await db.execute(stmt)
         ret =  result.mappings().all()
         return ret
@@ -693,6 +1039,8 @@ async def update_executable_plan(
                 params["b_entity_id"] = filter_params["entity_id"]
             if "sequence_id" in filter_params:
                 params["b_sequence_id"] = filter_params["sequence_id"]  
+            if "user_id" in filter_params:
+                params["b_user_id"] = filter_params["user_id"]
            
 
         if not update_values or not params:
@@ -706,6 +1054,11 @@ async def update_executable_plan(
         if "sequence_id" in filter_params:
             where_clauses.append(ExecutablePlan.sequence_id == bindparam("b_sequence_id"))
 
+        if "user_id" in filter_params:
+            # only tasks of the user's own plans
+            where_clauses.append(UserPlan.plan_id == ExecutablePlan.plan_id)
+            where_clauses.append(UserPlan.user_id == bindparam("b_user_id"))
+
         stmt = (
             update(ExecutablePlan)
             .where(*where_clauses)
@@ -734,6 +1087,99 @@ async def update_executable_plan(
         raise GeneralDataException("Unexpected error updating executable plan", context={"detail": str(e)})
 
 
+# Moves every node of a plan from :sequence_id on by :days in one statement. Only the
+# requested task gets a change log row, with the user's reason; every logged row counts
+# as a task move on the dashboards, so the nodes that move along with it are not logged.
+# A plan level move (:sequence_id 0) moves all nodes and logs the old and new plan
+# start. The plan end becomes the date of the last node; the plan start follows the
+# first node when the first root is moved. All CTEs see the same snapshot, so
+# u.plan_start_date below is the value before the move.
+SHIFT_PLAN_DATES_SQL = text("""
+    WITH shifted AS (
+        UPDATE executable_plan e
+        SET start_date = e.start_date + CAST(:days AS int) * interval '1 day'
+        WHERE e.plan_id = :plan_id
+          AND e.sequence_id >= :sequence_id
+        RETURNING e.entity_id,
+                  e.sequence_id,
+                  e.start_date - CAST(:days AS int) * interval '1 day' AS old_start_date,
+                  e.start_date AS new_start_date
+    ),
+    task_log AS (
+        INSERT INTO plan_detail_change_log (plan_id, entity_id, old_start_date, new_start_date, change_reason, changed_by)
+        SELECT CAST(:plan_id AS uuid), s.entity_id, s.old_start_date, s.new_start_date,
+               CAST(:change_reason AS text), 'system'
+        FROM shifted s
+        WHERE s.sequence_id = :sequence_id
+          AND s.entity_id::text = CAST(:entity_id AS text)
+          AND s.new_start_date IS NOT NULL
+    ),
+    plan_log AS (
+        INSERT INTO plan_change_log (plan_id, old_start_date, new_start_date, change_reason, changed_by)
+        SELECT u.plan_id, u.plan_start_date, u.plan_start_date + CAST(:days AS int) * interval '1 day',
+               CAST(:change_reason AS text), 'system'
+        FROM user_plan u
+        WHERE u.plan_id = :plan_id
+          AND CAST(:sequence_id AS int) = 0
+          AND u.plan_start_date IS NOT NULL
+    ),
+    bounds AS (
+        SELECT (array_agg(s.new_start_date ORDER BY s.sequence_id))[1] AS first_start,
+               (array_agg(s.new_start_date ORDER BY s.sequence_id DESC))[1] AS last_start
+        FROM shifted s
+    )
+    UPDATE user_plan u
+    SET plan_start_date = CASE WHEN CAST(:sequence_id AS int) = 0
+                                   THEN u.plan_start_date + CAST(:days AS int) * interval '1 day'
+                               WHEN CAST(:sequence_id AS int) = :first_root
+                                   THEN coalesce(b.first_start, u.plan_start_date)
+                               ELSE u.plan_start_date END,
+        plan_end_date = coalesce(b.last_start, u.plan_end_date)
+    FROM bounds b
+    WHERE u.plan_id = :plan_id
+    RETURNING u.plan_start_date, u.plan_end_date
+""")
+
+
+async def shift_plan_dates(plan_id: str,
+                           sequence_id: int,
+                           entity_id: str,
+                           days: int,
+                           change_reason: Optional[str],
+                           db: AsyncSession) -> Optional[Dict[str, Any]]:
+    """
+    Move the plan from sequence_id on by days, write the change log and recompute the
+    plan start and end in one round trip (see SHIFT_PLAN_DATES_SQL). Returns the new
+    plan_start_date and plan_end_date, or None when the plan does not exist.
+    """
+    try:
+        result = await db.execute(SHIFT_PLAN_DATES_SQL, {
+            "plan_id": plan_id,
+            "sequence_id": sequence_id,
+            "entity_id": entity_id,
+            "days": days,
+            "change_reason": change_reason,
+            "first_root": 10000
+        })
+        row = result.mappings().first()
+        return dict(row) if row is not None else None
+
+    except IntegrityError as e:
+
+        logger.error(f"IntegrityError when moving the plan dates: {str(e)}")
+        raise IntegrityException(
+            "Integrity error when moving the plan dates",
+            context = {"detail": "Check if you have given the right values for the parameters."}
+        )
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when moving the plan dates: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while moving the plan dates",
+            context={"detail": "Database error occurred while moving the plan dates"}
+        )
+
+
 async def set_reminder_executable_plan(
     filter_params: Optional[Dict[str, Any]],
     value_params: Optional[Dict[str, Any]],
@@ -788,6 +1234,82 @@ async def set_reminder_executable_plan(
         raise GeneralDataException("Unexpected error updating executable plan", context={"detail": str(e)})
 
 
+# executable_plan columns a bulk task update may set, with the type of their VALUES column
+BULK_TASK_UPDATE_COLUMNS = {
+    "status_id": Integer,
+    "reminder_request": Integer,
+    "request_reminder_time": String,
+}
+
+
+async def bulk_update_executable_plan(
+    plan_id: str,
+    user_id: str,
+    changes: List[Dict[str, Any]],
+    columns: List[str],
+    db: AsyncSession
+) -> List[ExecutablePlan]:
+    """
+    Apply a list of task changes to one plan of the user with a single UPDATE ... FROM
+    (VALUES ...). Every change holds entity_id, sequence_id and a value for each of
+    columns. Returns the updated rows in sequence order; changes that match no task of
+    the plan are skipped. Raises RecordNotFoundException when the plan is not the user's.
+    """
+    try:
+        if not changes or not columns:
+            raise ValueError("Missing required filter or update values.")
+
+        key_columns = ("entity_id", "sequence_id")
+        changes_table = values(
+            column("entity_id", UUID(as_uuid=True)),
+            column("sequence_id", Integer),
+            *[column(name, BULK_TASK_UPDATE_COLUMNS[name]) for name in columns],
+            name="changes"
+        ).data([tuple(change[name] for name in (*key_columns, *columns)) for change in changes])
+
+        stmt = (
+            update(ExecutablePlan)
+            .where(
+                ExecutablePlan.plan_id == plan_id,
+                UserPlan.plan_id == ExecutablePlan.plan_id,
+                UserPlan.user_id == user_id,
+                ExecutablePlan.entity_id == changes_table.c.entity_id,
+                ExecutablePlan.sequence_id == changes_table.c.sequence_id
+            )
+            .values({name: changes_table.c[name] for name in columns})
+            .returning(ExecutablePlan)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        updated_rows = result.scalars().all()
+
+        if not updated_rows:
+            # nothing matched, tell a plan of someone else apart from tasks that are not in the plan
+            owned = await db.scalar(select(UserPlan.plan_id).where(UserPlan.plan_id == plan_id, UserPlan.user_id == user_id))
+            if owned is None:
+                raise RecordNotFoundException(f"Plan {plan_id} not found", context={"detail": f"Plan {plan_id} not found"})
+
+        return sorted(updated_rows, key=lambda row: row.sequence_id)
+
+    except RecordNotFoundException:
+        raise
+
+    except IntegrityError as e:
+
+        logger.error(f"IntegrityError when bulk updating executable plan: {str(e)}")
+        raise IntegrityException("Integrity error when updating executable plan", context={"detail": str(e)})
+
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when bulk updating executable plan: {str(e)}")
+        raise GeneralDataException("Database error updating executable plan", context={"detail": str(e)})
+
+    except Exception as e:
+
+        logger.error(f"Unexpected error when bulk updating executable plan: {str(e)}")
+        raise GeneralDataException("Unexpected error updating executable plan", context={"detail": str(e)})
+
+
 """
 APIs for 
 - Upcoming tasks - current day + 2
@@ -980,6 +1502,45 @@ async def insert_plan_routine_summary(plan_id_x: str, summary_item: str , db: As
         )
 
 
+async def bulk_insert_plan_text_items(plan_id_x: str, general_descriptions: List[str], summary_items: List[str], db: AsyncSession) -> int:
+    """
+    Insert the general guidelines and the routine summary of a plan, one multi-row
+    INSERT per table.
+    """
+    try:
+        if general_descriptions:
+            await db.execute(insert(PlanGeneralGuideline).values(
+                [{"plan_id": plan_id_x, "guideline": item} for item in general_descriptions]
+            ))
+        if summary_items:
+            await db.execute(insert(PlanRoutineSummary).values(
+                [{"plan_id": plan_id_x, "routine": item} for item in summary_items]
+            ))
+        return len(general_descriptions) + len(summary_items)
+
+    except IntegrityError as e:
+
+        logger.error(f"IntegrityError when inserting guidelines and routine summary: {str(e)}")
+        raise IntegrityException(
+            f"Integrity error when inserting guidelines and routine summary{str(e)}",
+            context = {"detail": f"Issue inserting into the general guideline or routine summary"}
+        )
+    except SQLAlchemyError as e:
+
+        logger.error(f"Database error when inserting guidelines and routine summary: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while inserting guidelines and routine summary",
+            context={"detail": "Database error occurred while inserting guidelines and routine summary"}
+        )
+    except Exception as e:
+
+        logger.error(f"Unexpected error in bulk_insert_plan_text_items: {str(e)}")
+        raise GeneralDataException(
+            "Unexpected error occured inserting guidelines and routine summary",
+            context={"detail" : "An unexpected error occurred while inserting guidelines and routine summary"}
+        )
+
+
 async def get_general_guidelines(filter_params: Optional[Dict[str, Any]], db: AsyncSession) -> Optional[List[PlanGeneralGuideline]]:
     try:
 
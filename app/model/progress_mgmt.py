@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from uuid import UUID
 from typing import Optional, Union, List
 from datetime import datetime
@@ -13,11 +13,16 @@ class ProgressUpdateCreate(BaseModel):
     progress_percent: int
     notes: Optional[str] = ""
 
+class ProgressUpdateBatch(BaseModel):
+    updates: List[ProgressUpdateCreate] = Field(..., min_length=1, max_length=1000)
+
 class ProgressUpdateOut(BaseModel):
     entity_id: UUID
     progress_percent: Optional[float] = 0.00
     notes: Optional[str]
     plan_progress: Optional[float] = 0.00
+    task_status: Optional[int] = None
+    plan_status: Optional[int] = None
 
     @field_validator("plan_progress", mode="before")
     @classmethod
@@ -26,6 +31,22 @@ class ProgressUpdateOut(BaseModel):
             return 0.00
         return round(float(v), 2)
 
+class ProgressUpdateBatchOut(BaseModel):
+    updates: List[ProgressUpdateOut]
+
+class ProgressEventOut(BaseModel):
+    entity_id: UUID
+    plan_id: UUID
+    progress_percent: int
+    notes: Optional[str] = None
+    event_count: int = 1        # more than 1 for a compacted summary of older updates
+    first_created_at: Optional[datetime] = None
+    created_at: datetime
+
+class ProgressHistoryOut(BaseModel):
+    events: List[ProgressEventOut]
+    next_cursor: Optional[str] = None
+
 class ProgressDailyDetail(BaseModel):
     entity_id: UUID
     parent_id: Optional[UUID] = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter, field_validator, model_validator
 from typing import Optional, List, Any, Union
 from datetime import datetime
 from uuid import UUID
@@ -187,6 +187,7 @@ class UXUserPlanIdentifier(BaseModel):
 
 class UXUserPlanIdentifierRS(BaseModel):
     content: Optional[List[UXUserPlanIdentifier]]
+    next_cursor: Optional[str] = None
 
 class UXPlanApprovalPL(BaseModel):
     plan_id: str
@@ -241,6 +242,9 @@ class IExecutionPlanDetail(BaseModel):
     class Config:
         from_attributes = True 
     
+# validates a whole list of executable_plan rows in one call instead of one model per row
+execution_plan_details_adapter = TypeAdapter(List[IExecutionPlanDetail])
+
 class UXApprovedPlanDetail(BaseModel):
     plan_detail: Optional[List[IExecutionPlanDetail]]
     routine_summary: Optional[RoutineSummary]
@@ -258,6 +262,29 @@ class UXUpdateApprovedPlan(BaseModel):
     status_id: Optional[int] = 0
 
 
+class UXTaskReminderChange(BaseModel):
+    entity_id: UUID
+    sequence_id: int
+    reminder_request: int
+    request_reminder_time: Optional[str] = None
+
+
+class UXTaskStatusChange(BaseModel):
+    entity_id: UUID
+    sequence_id: int
+    status_id: int
+
+
+class UXBulkReminderUpdate(BaseModel):
+    plan_id: UUID
+    changes: List[UXTaskReminderChange] = Field(..., min_length=1, max_length=1000)
+
+
+class UXBulkStatusUpdate(BaseModel):
+    plan_id: UUID
+    changes: List[UXTaskStatusChange] = Field(..., min_length=1, max_length=1000)
+
+
 class UXApprovedPlanUpdateReminder(BaseModel):
     plan_id: str
     entity_id: str
@@ -310,6 +337,8 @@ class UXApprovedPlanUpdateReminder(BaseModel):
 class UXUpcomingActivitiesRequest(BaseModel):
     plan_id: Optional[str]
     days_to_add: int
+    limit: int = Field(200, ge=1, le=1000)
+    cursor: Optional[str] = None
     @field_validator('plan_id', mode="before")
     def validate_parent_id(cls, v):
         if v is None or v == '' or v == "None":
@@ -369,6 +398,7 @@ class UXUpcomingActivitiesResponse(BaseModel):
 
 class UXUpcomingActivitiesResponseRS(BaseModel):
     content: Optional[list[UXUpcomingActivitiesResponse]]
+    next_cursor: Optional[str] = None
 
 
 class IUXCreatedPlan(BaseModel):
@@ -386,6 +416,8 @@ class IUXCreatedPlan(BaseModel):
     class Config:
         from_attributes = True
 
+created_plan_adapter = TypeAdapter(List[IUXCreatedPlan])
+
 class ICreatedPlan(BaseModel):
     plan_id: UUID
     sequence_id: int
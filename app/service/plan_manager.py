@@ -20,7 +20,9 @@ from uuid import UUID
 from app.model.progress_mgmt import ProgressUpdateCreate, ProgressUpdateOut
 from app.data.progress_mgmt import create_progress_update, get_progress_by_user_entity
 from app.data.user import User
-from app.common.exception import IntegrityException, TimeZoneException, GeneralDataException
+from app.common.exception import IntegrityException, TimeZoneException, GeneralDataException, InvalidCursor
+from app.common.pagination import decode_cursor, page_of
+from typing import Optional
 import structlog
 
 logger = structlog.get_logger()
@@ -101,15 +103,22 @@ async def get_subscription_svc(fmp: FmpSubscriberGet, db: AsyncSession, current_
             context={"detail" : "An unexpected error occurred while formatting the date in inserting progress update"}
         )
 
-async def get_fmp_plans(db: AsyncSession, current_user: User, limit: int, offset: int):
+async def get_fmp_plans(db: AsyncSession, current_user: User, limit: int, offset: int, cursor: Optional[str] = None):
+    """
+    One page of public plans and the cursor of the next page (None on the last page).
+    """
     try:
-        ret = await get_fmp_by_count(db, current_user.user_id, limit, offset)
+        after = decode_cursor(cursor, datetime.fromisoformat, UUID)
+        ret = await get_fmp_by_count(db, current_user.user_id, limit + 1, offset, after)
+        rows, next_cursor = page_of(ret, limit, lambda row: (row["created_dt"], row["plan_id"]))
 
         obj_fmp_count_summary = [
-            FmpCountSummary.model_validate(row) for row in ret
+            FmpCountSummary.model_validate(row) for row in rows
         ]
-        return obj_fmp_count_summary
+        return obj_fmp_count_summary, next_cursor
 
+    except InvalidCursor:
+        raise
 
     except GeneralDataException as e:
 
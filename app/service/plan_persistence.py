@@ -0,0 +1,265 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple
+from app.model.user_prompt_response import UserPromptResponse
+from app.data.user_plan import bulk_insert_created_plan, bulk_insert_plan_text_items, get_created_plan_subtree_hashes, copy_created_plan_blocks
+from app.common.site_enums import Level, EntityType
+import structlog
+import hashlib
+import uuid
+import re
+
+logger = structlog.get_logger()
+
+CREATED_PLAN_COLUMNS = (
+    "plan_id",
+    "entity_id",
+    "parent_id",
+    "entity_type",
+    "status_id",
+    "source_id",
+    "level_id",
+    "sequence_id",
+    "entity_desc",
+    "suggested_duration",
+    "suggested_start_time",
+    "content_hash",
+)
+
+# sequence ids encode the tree: a root owns [s, s+10000), a branch owns [s, s+100)
+ROOT_BLOCK_SIZE = 10000
+BRANCH_BLOCK_SIZE = 100
+
+
+# "Run in the park — Suggested duration: 20 min — Suggested repetition: 3"
+_SEGMENT_RE = re.compile(r"—([^—]*)")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def parse_activities(values: List[str]) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Split every activity string of a plan in one pass into three columns: description,
+    suggested duration and suggested repetition (empty string when not given).
+    """
+    descriptions, durations, repetitions = [], [], []
+    for value in values:
+        value = value.strip() if value else ""
+        duration = repetition = ""
+        head, sep, _ = value.partition("—")
+        if sep:
+            for segment in _SEGMENT_RE.findall(value):
+                segment = segment.lower()
+                if "suggested duration" in segment:
+                    match = _DIGITS_RE.search(segment)
+                    if match:
+                        duration = match.group()
+                elif "suggested repetition" in segment:
+                    match = _DIGITS_RE.search(segment)
+                    if match:
+                        repetition = match.group()
+            value = head.strip()
+        descriptions.append(value)
+        durations.append(duration)
+        repetitions.append(repetition)
+    return descriptions, durations, repetitions
+
+
+class PlanBatch:
+    """
+    Columnar image of a generated plan, one list per created_plan column. Entity ids
+    are generated here, so parents and children are linked before anything is written
+    and every table goes to the database in one multi-row insert.
+    """
+
+    def __init__(self, plan_id):
+        self.plan_id = plan_id
+        self.created_plan: Dict[str, List[Any]] = {column: [] for column in CREATED_PLAN_COLUMNS}
+        self.general_descriptions: List[str] = []
+        self.summary_items: List[str] = []
+        # row positions and raw text of the activities, parsed together by parse_pending_activities
+        self._activity_rows: List[int] = []
+        self._activity_text: List[str] = []
+
+    def __len__(self):
+        return len(self.created_plan["entity_id"])
+
+    def add_node(self,
+                 sequence_id: int,
+                 level_id: int,
+                 entity_type: int,
+                 parent_id: Optional[uuid.UUID],
+                 entity_desc: str,
+                 suggested_start_time: Optional[str] = None,
+                 suggested_duration: Optional[str] = None) -> uuid.UUID:
+        entity_id = uuid.uuid4()
+        columns = self.created_plan
+        columns["plan_id"].append(self.plan_id)
+        columns["entity_id"].append(entity_id)
+        columns["parent_id"].append(parent_id)
+        columns["entity_type"].append(entity_type)
+        columns["status_id"].append(1)
+        columns["source_id"].append(0)
+        columns["level_id"].append(level_id)
+        columns["sequence_id"].append(sequence_id)
+        columns["entity_desc"].append(entity_desc)
+        columns["suggested_duration"].append(suggested_duration)
+        columns["suggested_start_time"].append(suggested_start_time)
+        columns["content_hash"].append(None)
+        return entity_id
+
+    def add_activity(self, sequence_id: int, parent_id: uuid.UUID, activity_text: str) -> uuid.UUID:
+        self._activity_rows.append(len(self))
+        self._activity_text.append(activity_text)
+        return self.add_node(sequence_id, Level.LEAF.value, EntityType.ACTIVITY.value, parent_id, activity_text)
+
+    def parse_pending_activities(self):
+        # the activity text carries no start time, so suggested_start_time stays unset
+        descriptions, durations, _ = parse_activities(self._activity_text)
+        columns = self.created_plan
+        for row, description, activity_duration in zip(self._activity_rows, descriptions, durations):
+            columns["entity_desc"][row] = description
+            columns["suggested_duration"][row] = activity_duration
+        self._activity_rows, self._activity_text = [], []
+
+    def created_plan_rows(self) -> List[Dict[str, Any]]:
+        names = list(self.created_plan)
+        return [dict(zip(names, values)) for values in zip(*self.created_plan.values())]
+
+    def compute_subtree_hashes(self):
+        """
+        Hash every node together with its subtree, children in order. Nodes are added
+        parent first, so walking backwards sees all children before their parent.
+        """
+        columns = self.created_plan
+        position = {entity_id: i for i, entity_id in enumerate(columns["entity_id"])}
+        children: List[List[int]] = [[] for _ in range(len(self))]
+        for i, parent_id in enumerate(columns["parent_id"]):
+            if parent_id is not None:
+                children[position[parent_id]].append(i)
+
+        hashes: List[Optional[str]] = [None] * len(self)
+        for i in reversed(range(len(self))):
+            digest = hashlib.sha1()
+            content = (columns["entity_type"][i], columns["entity_desc"][i],
+                       columns["suggested_start_time"][i], columns["suggested_duration"][i])
+            digest.update("\x1f".join("" if value is None else str(value) for value in content).encode())
+            for child in children[i]:
+                digest.update(hashes[child].encode())
+            hashes[i] = digest.hexdigest()
+        columns["content_hash"] = hashes
+
+
+def _add_activities(batch: PlanBatch, parent_sequence_id: int, parent_id: uuid.UUID, activities):
+    for k, activity in enumerate(activities or []):
+        batch.add_activity(parent_sequence_id + (k+1), parent_id, activity.activity)
+
+
+def flatten_plan(obj_user_profile: UserPromptResponse, plan_id) -> PlanBatch:
+    """
+    Walk the generated plan in the same order and with the same sequence ids as the
+    per-node load used to, producing the batch to persist.
+    """
+    batch = PlanBatch(plan_id)
+
+    if obj_user_profile.plan_type == "Weekly":
+        for i, week in enumerate(obj_user_profile.plan):
+            week_sequence_id = (i+1)*10000
+            week_id = batch.add_node(week_sequence_id, Level.ROOT.value, EntityType.WEEK.value, None, week.weekly_objective)
+            for j, day in enumerate(week.dailyactivity):
+                day_sequence_id = week_sequence_id + (j+1)*100
+                day_id = batch.add_node(day_sequence_id, Level.BRANCH.value, EntityType.DAY.value, week_id, day.daily_objective,
+                                        day.suggested_time, day.suggested_duration)
+                _add_activities(batch, day_sequence_id, day_id, day.activity_detail)
+
+    elif obj_user_profile.plan_type == "Daily":
+        for i, day in enumerate(obj_user_profile.plan):
+            day_sequence_id = (i+1)*10000
+            day_id = batch.add_node(day_sequence_id, Level.ROOT.value, EntityType.DAY.value, None, day.daily_objective,
+                                    day.suggested_time, day.suggested_duration)
+            _add_activities(batch, day_sequence_id, day_id, day.activity_detail)
+
+    else:
+        # plan with no time criteria, milestones with tasks
+        for i, milestone in enumerate(obj_user_profile.plan):
+            milestone_sequence_id = (i+1)*10000
+            milestone_id = batch.add_node(milestone_sequence_id, Level.ROOT.value, EntityType.MILESTONE.value, None, milestone.milestone_desc)
+            for j, task in enumerate(milestone.activities or []):
+                task_sequence_id = milestone_sequence_id + (j+1)*100
+                task_id = batch.add_node(task_sequence_id, Level.BRANCH.value, EntityType.TASK.value, milestone_id, task.daily_objective,
+                                         task.suggested_time, task.suggested_duration)
+                _add_activities(batch, task_sequence_id, task_id, task.activity_detail)
+
+    batch.parse_pending_activities()
+    batch.compute_subtree_hashes()
+
+    if obj_user_profile.general_recommendation_guideline is not None:
+        batch.general_descriptions = list(obj_user_profile.general_recommendation_guideline.general_descripton or [])
+    if obj_user_profile.routine_summary is not None:
+        batch.summary_items = list(obj_user_profile.routine_summary.summary_item or [])
+
+    return batch
+
+
+def plan_subtree_reuse(rows: List[Dict[str, Any]], previous) -> Tuple[List[Dict[str, Any]], set]:
+    """
+    Match the subtrees of the new plan against the (sequence_id, level_id, content_hash)
+    of the previous revision. An unchanged root is copied whole; under a changed root
+    each unchanged branch is copied and attached to the new root. Returns the blocks to
+    copy and the positions of the new rows they replace.
+    """
+    previous_roots = {}
+    previous_branches = {}
+    for sequence_id, level_id, content_hash in previous:
+        target = previous_roots if level_id == Level.ROOT.value else previous_branches
+        target.setdefault(content_hash, sequence_id)
+
+    blocks = []
+    reused = set()
+    i = 0
+    while i < len(rows):
+        root = rows[i]
+        end = i + 1
+        while end < len(rows) and rows[end]["level_id"] != Level.ROOT.value:
+            end += 1
+
+        if root["content_hash"] in previous_roots:
+            old_sequence_id = previous_roots[root["content_hash"]]
+            blocks.append({"block_start": old_sequence_id, "block_size": ROOT_BLOCK_SIZE,
+                           "shift": root["sequence_id"] - old_sequence_id, "parent_id": None})
+            reused.update(range(i, end))
+        else:
+            j = i + 1
+            while j < end:
+                branch_end = j + 1
+                while branch_end < end and rows[branch_end]["level_id"] == Level.LEAF.value:
+                    branch_end += 1
+                branch = rows[j]
+                if branch["level_id"] == Level.BRANCH.value and branch["content_hash"] in previous_branches:
+                    old_sequence_id = previous_branches[branch["content_hash"]]
+                    blocks.append({"block_start": old_sequence_id, "block_size": BRANCH_BLOCK_SIZE,
+                                   "shift": branch["sequence_id"] - old_sequence_id, "parent_id": root["entity_id"]})
+                    reused.update(range(j, branch_end))
+                j = branch_end
+        i = end
+    return blocks, reused
+
+
+async def persist_plan_batch(batch: PlanBatch, db: AsyncSession, prev_plan_id: Optional[str] = None, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Write the batch in the caller's transaction. The number of round trips does not
+    depend on the size of the plan. For a revision, subtrees that did not change since
+    prev_plan_id are copied server side instead of being sent again. Returns the
+    created_plan rows of the new plan in sequence order.
+    """
+    rows = batch.created_plan_rows()
+    blocks, reused = [], set()
+    if prev_plan_id is not None:
+        previous = await get_created_plan_subtree_hashes(prev_plan_id, user_id, db)
+        blocks, reused = plan_subtree_reuse(rows, previous)
+
+    new_rows = [row for i, row in enumerate(rows) if i not in reused]
+    await bulk_insert_created_plan(new_rows, db)
+    copied_rows = await copy_created_plan_blocks(prev_plan_id, batch.plan_id, blocks, db)
+    await bulk_insert_plan_text_items(str(batch.plan_id), batch.general_descriptions, batch.summary_items, db)
+
+    logger.info(f"Persisted plan {batch.plan_id}: {len(new_rows)} nodes written, {len(copied_rows)} copied from {prev_plan_id}")
+    return sorted(new_rows + copied_rows, key=lambda row: row["sequence_id"])
@@ -0,0 +1,63 @@
+from fastapi import Response, status
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Awaitable, Callable, List, Optional
+from app.data.user import User
+from app.data.plan_snapshot import get_plan_snapshot, save_plan_snapshot
+from app.common.responses import ModelJSONResponse
+import structlog
+import re
+
+logger = structlog.get_logger()
+
+# bump when the shape of a plan detail response changes, so older snapshots are rebuilt
+PLAN_SNAPSHOT_FORMAT = 1
+
+_ETAG_RE = re.compile(r'^(?:W/)?"' + str(PLAN_SNAPSHOT_FORMAT) + r'\.(\d+)"$')
+
+
+def plan_etag(version: int) -> str:
+    return f'"{PLAN_SNAPSHOT_FORMAT}.{version}"'
+
+
+def etag_versions(if_none_match: Optional[str]) -> List[int]:
+    """Plan versions named by an If-None-Match header; tags of another format are ignored."""
+    versions = []
+    for tag in (if_none_match or "").split(","):
+        match = _ETAG_RE.match(tag.strip())
+        if match:
+            versions.append(int(match.group(1)))
+    return versions
+
+
+async def serve_plan_snapshot(plan_id: str,
+                              kind: str,
+                              if_none_match: Optional[str],
+                              build: Callable[[], Awaitable[BaseModel]],
+                              db: AsyncSession,
+                              current_user: User):
+    """
+    Answer a plan detail read from the snapshot of the plan. A client that already
+    holds the current version gets 304, a current snapshot is sent as stored, and
+    otherwise build() produces the response, which is stored for the next read.
+    Plans the user does not own are passed to build() untouched, so they fail or come
+    back empty exactly as before.
+    """
+    known_versions = etag_versions(if_none_match)
+    snapshot = await get_plan_snapshot(plan_id, str(current_user.user_id), kind, PLAN_SNAPSHOT_FORMAT, known_versions, db)
+    if snapshot is None:
+        return ModelJSONResponse(await build())
+
+    version = snapshot["version"]
+    headers = {"ETag": plan_etag(version), "Cache-Control": "private, no-cache"}
+    if version in known_versions:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if snapshot["body"] is not None:
+        return Response(content=snapshot["body"], media_type="application/json", headers=headers)
+
+    # built from data at least as new as version, so labelling it with version is safe
+    response = await build()
+    body = response.model_dump_json()
+    await save_plan_snapshot(plan_id, kind, version, PLAN_SNAPSHOT_FORMAT, body, db)
+    logger.info(f"Rebuilt the {kind} snapshot of plan {plan_id} at version {version}")
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -3,16 +3,19 @@ from sqlalchemy.future import select
 from fastapi import HTTPException
 from sqlalchemy import update
 from datetime import datetime
-from app.data.dbinit import get_db
+from app.data.dbinit import get_db, gather_reads
 from fastapi import Request
 from uuid import UUID
-from app.model.progress_mgmt import ProgressUpdateCreate, ProgressUpdateOut, ProgressUpdateSummaryInput
-from app.data.progress_mgmt import create_progress_update, get_progress_by_user_entity, get_progress_tracking_by_plan, get_dashboard_summary_sql, calculate_task_delay
+from app.model.progress_mgmt import ProgressUpdateCreate, ProgressUpdateOut, ProgressUpdateSummaryInput, ProgressUpdateBatch, ProgressUpdateBatchOut, ProgressEventOut, ProgressHistoryOut
+from app.data.progress_mgmt import create_progress_update, create_progress_updates, get_progress_events, get_progress_by_user_entity, get_progress_tracking_by_plan
 from app.data.user_plan import get_plan, get_executable_plan, get_task_change_history, get_plan_change_history
 from app.data.progress_mgmt import get_progress_by_user_entity
+from app.data.plan_dashboard import get_dashboard_rows
+from app.common.dashboard_cache import dashboard_cache
 from typing import List, Optional
 from app.data.user import User
-from app.common.exception import IntegrityException, TimeZoneException, GeneralDataException
+from app.common.exception import IntegrityException, TimeZoneException, GeneralDataException, InvalidCursor
+from app.common.pagination import decode_cursor, page_of
 import structlog
 from app.common.date_functions import convert_to_user_timezone, convert_user_time_to_utc, format_date_time
 from datetime import datetime, timezone, timedelta
@@ -25,6 +28,7 @@ async def create_progress_update_svc(db: AsyncSession, update_data: ProgressUpda
 
     try:
         res = await create_progress_update(db, update_data, current_user)
+        dashboard_cache.invalidate_after_commit(db, current_user.user_id)
         '''
         total_response = RewardEarnedResponse(
             points_earned=0, 
@@ -86,6 +90,65 @@ async def create_progress_update_svc(db: AsyncSession, update_data: ProgressUpda
         )
 
 
+async def create_progress_updates_svc(db: AsyncSession, batch: ProgressUpdateBatch, request_metdata: Request, current_user: User) -> ProgressUpdateBatchOut:
+    """
+    - Apply the progress updates of an offline sync in one go
+    - Each parent and plan is rolled up once, however many of its tasks were updated
+    """
+    try:
+        res = await create_progress_updates(db, batch.updates, current_user)
+        dashboard_cache.invalidate_after_commit(db, current_user.user_id)
+        return ProgressUpdateBatchOut(updates=res)
+    except IntegrityException as e:
+
+        logger.error(f"IntegrityError when inserting progress updates: {str(e)}")
+        raise IntegrityException(
+            "Integrity error when inserting progress updates",
+            context = {"detail": "Possible duplicate entry or foreign key constraint failure in the progress updates."}
+        )
+    except GeneralDataException as e:
+
+        logger.error(f"Database error when inserting progress updates: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while inserting the progress updates",
+            context={"detail": "Database error occurred while inserting progress updates"}
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in inserting progress updates: {str(e)}")
+        raise GeneralDataException(
+            "Unexpected error occured while inserting progress updates",
+            context={"detail" : "An unexpected error occurred while inserting progress updates"}
+        )
+
+
+async def get_progress_history_svc(db: AsyncSession, entity_id: UUID, current_user: User, limit: int, cursor: Optional[str] = None) -> ProgressHistoryOut:
+    """
+    - One page of the progress history of a task, newest first
+    - next_cursor fetches the following page and is None on the last page
+    """
+    try:
+        after = decode_cursor(cursor, datetime.fromisoformat, int)
+        rows = await get_progress_events(db, entity_id, current_user.user_id, limit + 1, after)
+        rows, next_cursor = page_of(rows, limit, lambda row: (row["created_at"], row["id"]))
+        return ProgressHistoryOut(events=[ProgressEventOut.model_validate(dict(row)) for row in rows],
+                                  next_cursor=next_cursor)
+    except InvalidCursor:
+        raise
+    except GeneralDataException as e:
+
+        logger.error(f"Database error when reading progress history: {str(e)}")
+        raise GeneralDataException(
+            "Data base error occured while reading the progress history",
+            context={"detail": "Database error occurred while reading progress history"}
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in reading progress history: {str(e)}")
+        raise GeneralDataException(
+            "Unexpected error occured while reading progress history",
+            context={"detail" : "An unexpected error occurred while reading progress history"}
+        )
+
+
 async def get_progress_by_user_entity_svc( db: AsyncSession, current_user: User, entity_id: UUID = None):
     try:
         logger.info(f"User id is {current_user.user_id}")
@@ -147,16 +210,36 @@ def calculate_goal_discipline_score(plan, total_tasks, completed_tasks, avg_task
         )
 
 
+async def _load_on_read_pool(build, *args):
+    # cache loads may outlive the request, so they read on a session of their own
+    results = await gather_reads(lambda read_db: build(*args, read_db))
+    return results[0]
+
+
 async def get_plan_dashboard(plan_detail: ProgressUpdateSummaryInput, current_user: User, db: AsyncSession) -> Optional[List]:
+    """
+    - Dashboard of each plan of the user, or of plan_detail.plan_id only
+    - Served from dashboard_cache, progress, date shift and plan status writes invalidate it
+    """
+    return await dashboard_cache.get(current_user.user_id, ("plans", plan_detail.plan_id),
+                                     lambda: _load_on_read_pool(_build_plan_dashboard, plan_detail, current_user))
+
+
+async def get_user_dashboard(current_user: User, db: AsyncSession) -> Optional[List]:
+    """
+    - Scoreboard over all plans of the user
+    - Served from dashboard_cache, progress, date shift and plan status writes invalidate it
+    """
+    return await dashboard_cache.get(current_user.user_id, ("scoreboard",),
+                                     lambda: _load_on_read_pool(_build_user_dashboard, current_user))
+
+
+async def _build_plan_dashboard(plan_detail: ProgressUpdateSummaryInput, current_user: User, db: AsyncSession) -> Optional[List]:
     try:
         plan_array = []
-        if plan_detail.plan_id is not None:
-            res = await get_dashboard_summary_sql(db,current_user.user_id, plan_detail.plan_id )
-        else:
-            res = await get_dashboard_summary_sql(db,current_user.user_id )
-        ret_task_delay = await calculate_task_delay(current_user.user_id, db)
-        
-        detail_map = {d["plan_id"]: d for d in ret_task_delay} if ret_task_delay else {}
+        # one row per plan with the summary and the task figures, read from the aggregates
+        res = await get_dashboard_rows(db, current_user.user_id, plan_detail.plan_id)
+        detail_map = {d["plan_id"]: d for d in res}
         today = datetime.now(timezone.utc)
         for row in res:
             total_current_tasks = 0
@@ -247,16 +330,19 @@ async def get_plan_dashboard_detail(plan_id, current_user: User, db: AsyncSessio
     try:
         filter_params = {}
         filter_params["plan_id"] = plan_id
-        plan = await get_plan(filter_params, db)
+        # the reads are independent, so they run side by side on the read pool
+        plan, tasks, entity_progress, task_changes, plan_changes = await gather_reads(
+            lambda read_db: get_plan(filter_params, read_db),
+            lambda read_db: get_executable_plan(filter_params, read_db),
+            lambda read_db: get_progress_tracking_by_plan(read_db, plan_id, current_user.user_id),
+            lambda read_db: get_task_change_history(read_db, plan_id),
+            lambda read_db: get_plan_change_history(read_db, plan_id)
+        )
         if not plan:
             raise GeneralDataException(
                 f"There is no plan with a id {plan_id}",
             context={"detail": f"There is no plan with a id {plan_id}"}
             )
-        tasks = await get_executable_plan(filter_params, db)
-        entity_progress = await get_progress_tracking_by_plan(db, plan_id, current_user.user_id)
-        task_changes = await get_task_change_history(db, plan_id)
-        plan_changes = await get_plan_change_history(db, plan_id)
 
         # Index changes by entity_id
         task_change_map = {}
@@ -354,10 +440,10 @@ async def get_plan_dashboard_detail(plan_id, current_user: User, db: AsyncSessio
         )
 
 
-async def get_user_dashboard(current_user: User, db: AsyncSession) -> Optional[List]:
+async def _build_user_dashboard(current_user: User, db: AsyncSession) -> Optional[List]:
     try:
         plan_array = []
-        res = await get_dashboard_summary_sql(db,current_user.user_id )
+        res = await get_dashboard_rows(db, current_user.user_id)
         if res is None or len(res) <= 0:
              response = {
                     "total_plans": 'N/A',
@@ -369,9 +455,7 @@ async def get_user_dashboard(current_user: User, db: AsyncSession) -> Optional[L
                     "completed_tasks_for_today": 'N/A'    
                         }
              return response
-        ret_task_delay = await calculate_task_delay(current_user.user_id, db)
-        
-        detail_map = {d["plan_id"]: d for d in ret_task_delay} if ret_task_delay else {}
+        detail_map = {d["plan_id"]: d for d in res}
         today = datetime.now(timezone.utc)
         n_total_plans = 0
         n_total_tasks = 0
@@ -5,7 +5,7 @@ import openai
 
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from typing import Optional, Any, List
+from typing import Optional, Any, List, Dict
 
 from qdrant_client import QdrantClient
 from qdrant_client.models import PointStruct, Distance, VectorParams
@@ -19,15 +19,23 @@ from app.data.dbinit import get_db
 from app.data.user import User
 from app.common.exception import DatabaseConnectionException, RecordNotFoundException, IntegrityException, MissingDataException, GeneralDataException
 from app.model.supplement_info import UXSupplementInput, ISupplementDetail
-from app.data.supplement_info import get_data, DBSupplementData
+from app.data.supplement_info import get_data, replace_plan_supplement_data, DBSupplementData
+from app.data.dbinit import SessionLocal
+from app.common.embedding import get_embeddings
 from app.data.user_plan_detail import get_plan_day_detail, UserPlanActivityDetail
 from app.data.user_plan import get_executable_plan
 from app.data.user import User
-from app.common.qdrant_common import QdrantClient
+from app.common.qdrant_common import QdrantClient, QUANTIZED_SEARCH_PARAMS, ensure_collection
 import structlog
+import uuid
 
 logger = structlog.get_logger()
 async def get_supplemental_data(obj_input: UXSupplementInput, db: AsyncSession, current_user: User, client: QdrantClient ):
+    """
+    Read path for supplement links. The links are precomputed when the plan is approved
+    (see precompute_supplement_links_svc), so this is a single indexed lookup on
+    user_plan_activity_helper_data with no embedding or vector store calls.
+    """
     try:
         filter_params = {}
         filter_params["plan_id"] = obj_input.plan_id
@@ -35,20 +43,16 @@ async def get_supplemental_data(obj_input: UXSupplementInput, db: AsyncSession,
         
         if obj_input.activity_id:
             filter_params["entity_id"] = obj_input.activity_id
-        logger.info("Fetching data from executable plan")
-        obj_activity_resultset = await get_executable_plan(filter_params=filter_params, db=db)
-        
-        for i in range(len(obj_activity_resultset)):
-            obj_supplement_data_resultset = []
-            obj_supplement_data_resultset = await get_data(db=db, filter_params=filter_params)
-            for j in range(len(obj_supplement_data_resultset)):
-                user_output.append(ISupplementDetail(
-                    site_url = obj_supplement_data_resultset[j].ext_site_url,
-                    site_title = obj_supplement_data_resultset[j].ext_site_title,
-                    site_keyword=obj_supplement_data_resultset[j].ext_site_keyword,
-                    entity_id= str(obj_supplement_data_resultset[j].entity_id),
-                    relevance_score= 0.0
-                ))
+        logger.info("Fetching precomputed supplement data")
+        obj_supplement_data_resultset = await get_data(db=db, filter_params=filter_params)
+        for row in obj_supplement_data_resultset:
+            user_output.append(ISupplementDetail(
+                site_url = row.ext_site_url,
+                site_title = row.ext_site_title,
+                site_keyword= row.ext_site_keyword or "",
+                entity_id= str(row.entity_id),
+                relevance_score= row.relevance_score or 0.0
+            ))
         return user_output
     except IntegrityException as e:
 
@@ -114,4 +118,68 @@ async def get_from_vector_store(text: str, client: QdrantClient)->Optional[List[
         raise GeneralDataException(
             f"General Error when retrieving supplemental data from vector store: {str(e)}",
             context={"detail": f"General Error when retrieving supplemental data from vector store: {str(e)}"}
-        )
\ No newline at end of file
+        )
+
+
+def build_supplement_rows(plan_id: str, entity_id: str, points, top_k: int) -> List[Dict[str, Any]]:
+    """
+    Flatten the links of the vector store hits into helper data rows, best score first,
+    keeping at most top_k links for the entity.
+    """
+    rows = []
+    for point in sorted(points, key=lambda p: p.score, reverse=True):
+        for item in (point.payload or {}).get("content", []):
+            if not item.get("link"):
+                continue
+            rows.append({
+                "rec_id": uuid.uuid4(),
+                "plan_id": str(plan_id),
+                "entity_id": str(entity_id),
+                "ext_site_url": item.get("link"),
+                "ext_site_title": item.get("title"),
+                "ext_site_keyword": item.get("keyword"),
+                "relevance_score": point.score
+            })
+            if len(rows) >= top_k:
+                return rows
+    return rows
+
+
+async def precompute_supplement_links_svc(plan_id: str, client: QdrantClient, top_k: Optional[int] = None) -> int:
+    """
+    Post-approval stage. Activities don't change once a plan is approved, so the top-k
+    supplement links of every approved entity are computed once and stored with their
+    relevance score. Runs as a background task after the approval is committed, so it
+    uses its own session and only logs failures.
+    """
+    top_k = top_k or settings.SUPPLEMENT_TOP_K
+    try:
+        collection_name = settings.QDRANT_ACTIVITY_COLLECTION_NAME
+        if not await client.collection_exists(collection_name):
+            logger.error(f"Activity collection {collection_name} is missing. Skipping supplement links for plan {plan_id}")
+            return 0
+
+        async with SessionLocal() as db:
+            obj_activity_resultset = await get_executable_plan(filter_params={"plan_id": plan_id}, db=db)
+            entities = [row for row in obj_activity_resultset if row.activity_desc and row.activity_desc.strip()]
+            if not entities:
+                return 0
+
+            vectors = await get_embeddings([row.activity_desc for row in entities])
+            await ensure_collection(client, collection_name, len(vectors[0]))
+            responses = await client.query_batch_points(
+                collection_name=collection_name,
+                requests=[models.QueryRequest(query=vector, limit=top_k, with_payload=True, params=QUANTIZED_SEARCH_PARAMS) for vector in vectors]
+            )
+
+            helper_rows = []
+            for entity, response in zip(entities, responses):
+                helper_rows.extend(build_supplement_rows(plan_id, entity.entity_id, response.points, top_k))
+
+            n_rows = await replace_plan_supplement_data(db, plan_id, helper_rows)
+            await db.commit()
+            logger.info(f"Stored {n_rows} supplement links for {len(entities)} entities of plan {plan_id}")
+            return n_rows
+    except Exception as e:
+        logger.error(f"Error when precomputing supplement links for plan {plan_id}: {str(e)}")
+        return 0
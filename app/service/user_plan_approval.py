@@ -1,23 +1,25 @@
 from fastapi import HTTPException, status, Request
-from app.model.user_plan import UXPlanApprovalPL, IExecutionPlanDetail, UXApprovedPlanDetail, UXUpdateApprovedPlan, UXUserPlanIdentifier, UXUpcomingActivitiesRequest, UXUpcomingActivitiesResponse, UXUpcomingActivitiesResponseRS, UXUserPlanIdentifierRS, IUXCreatedPlan, UXUserPlanUpdate
+from app.model.user_plan import UXPlanApprovalPL, IExecutionPlanDetail, UXApprovedPlanDetail, UXUpdateApprovedPlan, UXUserPlanIdentifier, UXUpcomingActivitiesRequest, UXUpcomingActivitiesResponse, UXUpcomingActivitiesResponseRS, UXUserPlanIdentifierRS, IUXCreatedPlan, UXUserPlanUpdate, UXBulkReminderUpdate, UXBulkStatusUpdate, execution_plan_details_adapter, created_plan_adapter
 from app.model.user_prompt_response import WeeklyPlanIdentifier, ActivityByDayIdentifier, ActivityDetail, ActivityDetailIdentifier, PlanDetailForUserManagement
 from app.model.common import RoutineSummary, GeneralRecommendationAndGuidelines
 from app.model.plan_manager import FmpSubscriberGet
 from app.data.user import User
 from app.data.user_plan_detail import get_plan_weekly_detail, get_plan_day_detail, get_plan_activity_detail
-from app.data.user_plan import (insert_approved_plan, 
+from app.data.user_plan import (approve_created_plan,
                                 get_executable_plan, 
                                 update_plan, 
                                 update_executable_plan, 
+                                bulk_update_executable_plan,
+                                shift_plan_dates,
                                 get_plan, 
+                                get_plans_page,
                                 get_general_guidelines, 
                                 get_plan_routine_summary, 
                                 get_upcoming_activities_db, 
                                 get_created_plan,
-                                insert_into_plan_detail_change_log,
-                                insert_into_plan_change_log,
                                 get_task_change_history,
-                                get_goal_builder)
+                                get_goal_builder,
+                                get_created_plan_document)
 from app.common.date_functions import convert_to_user_timezone, convert_user_time_to_utc, format_date_time
 from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
@@ -27,10 +29,14 @@ from enum import Enum
 import structlog
 import pytz
 from app.common.date_functions import convert_to_user_timezone, convert_user_time_to_utc, format_date_time
-from app.common.exception import DatabaseConnectionException, IntegrityException, TimeZoneException, GeneralDataException, UserNotFound, PlanAlreadyApproved
+from app.common.exception import DatabaseConnectionException, RecordNotFoundException, IntegrityException, TimeZoneException, GeneralDataException, UserNotFound, PlanAlreadyApproved, InvalidCursor
+from app.common.pagination import decode_cursor, page_of
 from app.common.site_enums import Level, EntityType, PlanStatus
 from app.common.utility_functions import extract_number
+from app.common.dashboard_cache import dashboard_cache
 from app.service.rewards import RewardsService
+from app.config.config import settings
+from app.data.dbinit import gather_reads
 from uuid import UUID
 from typing import Optional
 logger = structlog.get_logger()
@@ -67,160 +73,47 @@ async def build_approved_plan(obj_plan: UXPlanApprovalPL,  db: AsyncSession,curr
 
         del filter_params["user_id"] 
 
-        obj_created_plan = await get_created_plan(filter_params, db)
-
-        b_approved_plan = await get_executable_plan(filter_params, db)
-
-        if b_approved_plan:
-            raise PlanAlreadyApproved(
-                reason= "Plan Exists",
-                plan_id= {"detail": f"Plan Exists {str(obj_plan.plan_id)}"}
-                )
-
-        week_obj_hash = {}
-        day_obj_hash = {}
-        dt_start_date = None
-        if plan_resultset[0].plan_type == "Weekly":
-            if len(obj_created_plan) < 1:
-                logger.error("The plan is a weekly plan, but no data in the  table {str(plan_resultset.plan_id)}")
+        days_to_increment = 10
+        if plan_resultset[0].plan_type == "Monthly" or plan_resultset[0].plan_type == "Yearly":
+            days_to_increment = 30
+        goal_days = await extract_number(plan_resultset[0].goal_duration)
+
+        # one INSERT ... SELECT from created_plan, start dates are derived in SQL
+        obj_approved_plan = await approve_created_plan(plan_id=obj_plan.plan_id,
+                                                       start_date=user_time_in_otc,
+                                                       status_id=PlanStatus.TO_BE_STARTED.value,
+                                                       goal_days=goal_days,
+                                                       default_days=days_to_increment,
+                                                       db=db)
+        if not obj_approved_plan:
+            b_approved_plan = await get_executable_plan(filter_params, db)
+            if b_approved_plan:
+                raise PlanAlreadyApproved(
+                    reason= "Plan Exists",
+                    plan_id= {"detail": f"Plan Exists {str(obj_plan.plan_id)}"}
+                    )
+            if plan_resultset[0].plan_type == "Weekly":
+                logger.error(f"The plan is a weekly plan, but no data in the  table {str(obj_plan.plan_id)}")
                 raise GeneralDataException(
                 message= "The plan is a weekly plan, but no data in the  table",
-                context= {"detail": f"The plan is a weekly plan, but no data in the  table {str(plan_resultset.plan_id)}"}
+                context= {"detail": f"The plan is a weekly plan, but no data in the  table {str(obj_plan.plan_id)}"}
                 )
-            day_counter = 0
-            for i in range(len(obj_created_plan)):
-                logger.info ( f"The value is {obj_created_plan[i].entity_type}")
-
-                if EntityType(obj_created_plan[i].entity_type) == EntityType.WEEK:
-                    if i == 0 :
-                        dt_start_date = user_time_in_otc
-                        #dt_start_date = obj_plan.plan_start_date
-                    else:
-                        dt_start_date = user_time_in_otc + timedelta(days=7)
-                        #dt_start_date = obj_plan.plan_start_date + timedelta(days=7)
-                elif EntityType(obj_created_plan[i].entity_type) == EntityType.DAY:
-                    #dt_start_date = obj_plan.plan_start_date + timedelta(days=day_counter) 
-                    dt_start_date = user_time_in_otc + timedelta(days=day_counter)
-                    day_counter += 1
-                elif EntityType(obj_created_plan[i].entity_type) == EntityType.ACTIVITY:
-                    dt_start_date = dt_start_date
-                else:
-                    pass
-                
-                obj_execution_plan = IExecutionPlanDetail(plan_id = obj_created_plan[i].plan_id,
-                                        sequence_id= obj_created_plan[i].sequence_id,
-                                        level_id=obj_created_plan[i].level_id,
-                                        entity_type = obj_created_plan[i].entity_type,
-                                        parent_id=obj_created_plan[i].parent_id,
-                                        entity_id = obj_created_plan[i].entity_id,
-                                        start_date = dt_start_date,
-                                        status_id= PlanStatus.TO_BE_STARTED,
-                                        reminder_request = None,
-                                        progress_measure= 0.0,
-                                        activity_desc= obj_created_plan[i].entity_desc,
-                                        request_reminder_time= None
-                                        )
-                obj_execution_plan_db = await insert_approved_plan(obj_execution_plan, db)
-        elif plan_resultset[0].plan_type == "Daily":
-            for i in range(len(obj_created_plan)):
-                logger.info ( f"The value is {obj_created_plan[i].entity_type}")
-                if EntityType(obj_created_plan[i].entity_type) == EntityType.DAY:
-                    dt_start_date = user_time_in_otc + timedelta(days=i) 
-                    #dt_start_date = obj_plan.plan_start_date + timedelta(days=i)
-                elif EntityType(obj_created_plan[i].entity_type) == EntityType.ACTIVITY:
-                    dt_start_date = dt_start_date
-                else:
-                    pass
-                
-                obj_execution_plan = IExecutionPlanDetail(plan_id = obj_created_plan[i].plan_id,
-                                        sequence_id= obj_created_plan[i].sequence_id,
-                                        level_id=obj_created_plan[i].level_id,
-                                        entity_type = obj_created_plan[i].entity_type,
-                                        parent_id=obj_created_plan[i].parent_id,
-                                        entity_id = obj_created_plan[i].entity_id,
-                                        start_date = dt_start_date,
-                                        status_id= PlanStatus.TO_BE_STARTED,
-                                        reminder_request = None,
-                                        progress_measure= 0.0,
-                                        activity_desc= obj_created_plan[i].entity_desc,
-                                        request_reminder_time= None
-                                        )
-                obj_execution_plan_db = await insert_approved_plan(obj_execution_plan, db)
-        else:
-            count_of_milestones = sum(1 for item in obj_created_plan if item.entity_type == EntityType.MILESTONE.value)
-
-            days = await extract_number(plan_resultset[0].goal_duration)
-            if days == 0:
-                if plan_resultset[0].plan_type == "Monthly" or plan_resultset[0].plan_type == "Yearly":
-                    days_to_increment = 30
-                else:
-                    days_to_increment = 10
-            else:
-                days_to_increment = int(days/count_of_milestones)
-            milestone_counter = 0
-            for i in range(len(obj_created_plan)):
-                logger.info ( f"The value is {obj_created_plan[i].entity_type}")
-                if EntityType(obj_created_plan[i].entity_type) == EntityType.MILESTONE:
-                    dt_start_date = user_time_in_otc + timedelta(days=milestone_counter*days_to_increment) 
-                    milestone_counter += 1
-                    #dt_start_date = obj_plan.plan_start_date + timedelta(days=i*days_to_increment) 
-                elif EntityType(obj_created_plan[i].entity_type) == EntityType.ACTIVITY:
-                    dt_start_date = dt_start_date
-                elif EntityType(obj_created_plan[i].entity_type) == EntityType.TASK:
-                    dt_start_date = dt_start_date
-                else:
-                    pass
-                
-                obj_execution_plan = IExecutionPlanDetail(plan_id = obj_created_plan[i].plan_id,
-                                        sequence_id= obj_created_plan[i].sequence_id,
-                                        level_id=obj_created_plan[i].level_id,
-                                        entity_type = obj_created_plan[i].entity_type,
-                                        parent_id=obj_created_plan[i].parent_id,
-                                        entity_id = obj_created_plan[i].entity_id,
-                                        start_date = dt_start_date,
-                                        status_id= PlanStatus.TO_BE_STARTED,
-                                        reminder_request = None,
-                                        progress_measure= 0.0,
-                                        activity_desc= obj_created_plan[i].entity_desc,
-                                        request_reminder_time= None
-                                        )
-                obj_execution_plan_db = await insert_approved_plan(obj_execution_plan, db)
 
         value_params = {}
         value_params["plan_start_date"] = user_time_in_otc
-        value_params["plan_end_date"] = dt_start_date
+        value_params["plan_end_date"] = obj_approved_plan[-1].start_date if obj_approved_plan else None
         value_params["approved_by_user"] =  PlanStatus.APPROVED_BY_USER.value
         value_params["plan_status"] = PlanStatus.IN_PROGRESS.value
         obj_update_plan = await update_plan(obj_plan.plan_id,value_params=value_params, db=db )
+        dashboard_cache.invalidate_after_commit(db, current_user.user_id)
         
         #reward_response = await rewards_service.process_plan_creation_rewards(
         #current_user.user_id, obj_plan.plan_id
         #    )
         
-        obj_approved_plan = await get_executable_plan(filter_params=filter_params, db=db)
-        obj_approved_plan_for_ux = []
-        
         for i in range(len(obj_approved_plan)):
-            '''
-            x = IExecutionPlanDetail(
-                plan_id = obj_approved_plan[i].plan_id,
-                sequence_id= obj_approved_plan[i].sequence_id,
-                level_id = obj_approved_plan[i].level_id,
-                entity_id= obj_approved_plan[i].entity_id,
-                entity_type= obj_approved_plan[i].entity_type,
-                parent_id= obj_approved_plan[i].parent_id,
-                start_date=obj_approved_plan[i].start_date,
-                status_id=obj_approved_plan[i].status_id,
-                reminder_request=obj_approved_plan[i].reminder_request,
-                progress_measure=obj_approved_plan[i].progress_measure,
-                activity_desc=obj_approved_plan[i].activity_desc,
-                request_reminder_time= obj_approved_plan[i].request_reminder_time
-            )
-            
-            obj_approved_plan_for_ux.append(x)   
-            '''
             obj_approved_plan[i].start_date = convert_to_user_timezone(obj_approved_plan[i].start_date, request_metadata["timezone"])
-            obj_approved_plan_for_ux.append(IExecutionPlanDetail.model_validate(obj_approved_plan[i])) 
+        obj_approved_plan_for_ux = execution_plan_details_adapter.validate_python(obj_approved_plan, from_attributes=True)
 
         
 
@@ -281,7 +174,6 @@ async def update_approved_plan_dates(obj_plan: UXUpdateApprovedPlan, db: AsyncSe
         current_utc = datetime.now(timezone.utc)
         filter_params["plan_id"] = obj_plan.plan_id
         #filter_params["user_id"] = current_user.user_id
-        plan_start_date = plan_start_date = None
         ret = await get_plan(filter_params, db)
         if len(ret) <= 0:
             raise GeneralDataException(f"THere is no plan with id: {filter_params['plan_id']}",
@@ -296,63 +188,17 @@ async def update_approved_plan_dates(obj_plan: UXUpdateApprovedPlan, db: AsyncSe
             message= "Past activity cannot be updated",
             context= {"detail": f" Activity in the past cannot be updated {obj_plan.entity_id}"}
             )
-        filter_params["change_reason"] = obj_plan.change_reason
-        if obj_plan.sequence_id is not None:  
-            if obj_plan.sequence_id == 0: # This means it is a plan level update
-                new_plan_start_date = ret[0].plan_start_date + timedelta(days=obj_plan.days_to_move)
-                plan_end_date = None
-                if ret[0].plan_end_date is not None:
-                    plan_end_date = ret[0].plan_end_date + timedelta(days=obj_plan.days_to_move)
-                else:
-                    plan_end_date = new_plan_start_date + timedelta(days=90) # This should not happen. If this condition is met, we should revisit the logic
-                res = await insert_into_plan_change_log(db, 
-                                                        filter_params["plan_id"],
-                                                        ret[0].plan_start_date, 
-                                                        new_plan_start_date,
-                                                        obj_plan.change_reason
-                                                        )
-                value_params = {}
-                value_params["plan_start_date"] = new_plan_start_date
-                value_params["plan_end_date"] = plan_end_date
-                update_user_plan = await update_plan(obj_plan.plan_id,value_params, db)
-
-            obj_executable_plan_detail = await get_executable_plan(filter_params=filter_params, db=db)
-            for i in range(len(obj_executable_plan_detail)):
-                #print(type(obj_plan.sequence_id), type(obj_executable_plan_detail[i].sequence_id))
-                #print(type(obj_plan.entity_id), type(obj_executable_plan_detail[i].entity_id))
-                print(f"{obj_plan.sequence_id} -- {obj_plan.entity_id} db: {obj_executable_plan_detail[i].sequence_id} -- {obj_executable_plan_detail[i].entity_id}")
-                if obj_plan.sequence_id != 0 and obj_plan.sequence_id > obj_executable_plan_detail[i].sequence_id:
-                    continue
-                if (obj_plan.sequence_id == obj_executable_plan_detail[i].sequence_id) and (obj_plan.entity_id == str(obj_executable_plan_detail[i].entity_id)):
-                    filter_params["change_reason"] = obj_plan.change_reason
-                else:
-                    filter_params["change_reason"] = "system"
-                new_date = obj_executable_plan_detail[i].start_date + timedelta(days=obj_plan.days_to_move)
-                if obj_plan.sequence_id == 10000 and i == 0:
-                    plan_start_date = new_date
-                if i == len(obj_executable_plan_detail) -1:
-                        plan_end_date = new_date
-                if (obj_plan.sequence_id == obj_executable_plan_detail[i].sequence_id) and (obj_plan.entity_id == str(obj_executable_plan_detail[i].entity_id)):
-                    ret = await insert_into_plan_detail_change_log(db,
-                                                    obj_plan.plan_id,
-                                                    obj_executable_plan_detail[i].entity_id,
-                                                    obj_executable_plan_detail[i].start_date,
-                                                    new_date,
-                                                    filter_params["change_reason"]
-                                                    )
-                update_filter = {}
-                value_params = {}
-                update_filter["plan_id"] = str(obj_executable_plan_detail[i].plan_id)
-                update_filter["entity_id"] = str(obj_executable_plan_detail[i].entity_id)
-                value_params["start_date"] = new_date
-                obj_task_update = await update_executable_plan(update_filter,value_params, db)
-            if obj_plan.sequence_id == 10000:
-                value_params["plan_start_date"] = plan_start_date
-                value_params["plan_end_date"] = plan_end_date
-                update_user_plan = await update_plan(obj_plan.plan_id,value_params, db)
-            else:
-                value_params["plan_end_date"] = plan_end_date
-                update_user_plan = await update_plan(obj_plan.plan_id,value_params, db)
+        if obj_plan.sequence_id is not None:
+            # one statement moves the nodes, logs the change and recomputes the plan start and end
+            plan_dates = await shift_plan_dates(obj_plan.plan_id,
+                                                obj_plan.sequence_id,
+                                                obj_plan.entity_id,
+                                                obj_plan.days_to_move,
+                                                obj_plan.change_reason,
+                                                db)
+            logger.info(f"Moved plan {obj_plan.plan_id} from sequence {obj_plan.sequence_id} by {obj_plan.days_to_move} days, "
+                        f"plan now runs {plan_dates['plan_start_date']} to {plan_dates['plan_end_date']}")
+            dashboard_cache.invalidate_after_commit(db, ret[0].user_id)
         return 1;
     except SQLAlchemyError as e:
         logger.error(f"Database error when updating the approved user plan: {str(e)}")
@@ -399,11 +245,18 @@ async def set_reminder_svc(obj_plan: UXUpdateApprovedPlan, db: AsyncSession, cur
         update_filter["plan_id"] = obj_plan.plan_id
         update_filter["entity_id"] = obj_plan.entity_id
         update_filter["sequence_id"] = obj_plan.sequence_id
+        update_filter["user_id"] = current_user.user_id
         value_params["reminder_request"] = obj_plan.reminder_request
         value_params["request_reminder_time"] = obj_plan.request_reminder_time
         obj_task_update = await update_executable_plan(update_filter,value_params, db)
+        if not obj_task_update:
+            raise RecordNotFoundException(f"Task {obj_plan.entity_id} not found in plan {obj_plan.plan_id}",
+                                          context={"detail": f"Task {obj_plan.entity_id} not found in plan {obj_plan.plan_id}"})
         return 1
     
+    except RecordNotFoundException as e:
+        logger.error(f"Task not found when setting the reminder: {str(e)}")
+        raise
     except SQLAlchemyError as e:
         logger.error(f"Database error when setting the reminder: {str(e)}")
         raise HTTPException(
@@ -450,10 +303,18 @@ async def update_objective_status_svc(obj_plan: UXUpdateApprovedPlan, db: AsyncS
         update_filter["plan_id"] = obj_plan.plan_id
         update_filter["entity_id"] = obj_plan.entity_id
         update_filter["sequence_id"] = obj_plan.sequence_id
+        update_filter["user_id"] = current_user.user_id
         value_params["status_id"] = obj_plan.reminder_request
         obj_task_update = await update_executable_plan(update_filter,value_params, db)
+        if not obj_task_update:
+            raise RecordNotFoundException(f"Task {obj_plan.entity_id} not found in plan {obj_plan.plan_id}",
+                                          context={"detail": f"Task {obj_plan.entity_id} not found in plan {obj_plan.plan_id}"})
+        dashboard_cache.invalidate_after_commit(db, current_user.user_id)
         return 1
     
+    except RecordNotFoundException as e:
+        logger.error(f"Task not found when updating the objective status: {str(e)}")
+        raise
     except SQLAlchemyError as e:
         logger.error(f"Database error when updating the objective status: {str(e)}")
         raise HTTPException(
@@ -488,6 +349,96 @@ async def update_objective_status_svc(obj_plan: UXUpdateApprovedPlan, db: AsyncS
 
 
 
+def _latest_change_per_task(changes) -> list:
+    # a task listed twice keeps its last change, UPDATE ... FROM would pick one at random
+    latest = {}
+    for change in changes:
+        latest[(change.entity_id, change.sequence_id)] = change.model_dump()
+    return list(latest.values())
+
+
+async def bulk_set_reminder_svc(obj_update: UXBulkReminderUpdate, db: AsyncSession, current_user: User, request_metadata: Request) -> UXApprovedPlanDetail:
+    """
+    - Set the reminders of several tasks of an approved plan in one statement
+    - Returns the updated tasks, tasks that are not part of the plan are ignored
+    """
+    try:
+        updated_rows = await bulk_update_executable_plan(str(obj_update.plan_id),
+                                                         str(current_user.user_id),
+                                                         _latest_change_per_task(obj_update.changes),
+                                                         ["reminder_request", "request_reminder_time"],
+                                                         db)
+        logger.info(f"Set {len(updated_rows)} of {len(obj_update.changes)} reminders for plan {obj_update.plan_id}")
+        return UXApprovedPlanDetail(plan_detail=execution_plan_details_adapter.validate_python(updated_rows, from_attributes=True),
+                                    routine_summary=None,
+                                    general_guidelines=None)
+
+    except RecordNotFoundException as e:
+        logger.error(f"Plan not found when setting the reminders: {str(e)}")
+        raise
+    except IntegrityException as e:
+
+        logger.error(f"IntegrityError when setting the reminders: {str(e)}")
+        raise IntegrityException(
+            f"Integrity error when setting the reminders: {str(e)}",
+            context = {"detail": "Error when setting the reminders."}
+        )
+    except GeneralDataException as e:
+
+        logger.error(f"Database error when setting the reminders: {str(e)}")
+        raise GeneralDataException(
+            f"Data base error when setting the reminders: {str(e)}",
+            context={"detail": f"Data base error when setting the reminders: {str(e)}"}
+        )
+    except Exception as e:
+        logger.error(f"Some general error when setting the reminders: {str(e)}")
+        raise GeneralDataException(
+            message=f"Some general error when setting the reminders: {str(e)}",
+            context={"detail": f"Some general error when setting the reminders: {str(e)}"})
+
+
+async def bulk_update_objective_status_svc(obj_update: UXBulkStatusUpdate, db: AsyncSession, current_user: User, request_metadata: Request) -> UXApprovedPlanDetail:
+    """
+    - Set the status of several tasks of an approved plan in one statement
+    - Returns the updated tasks, tasks that are not part of the plan are ignored
+    """
+    try:
+        updated_rows = await bulk_update_executable_plan(str(obj_update.plan_id),
+                                                         str(current_user.user_id),
+                                                         _latest_change_per_task(obj_update.changes),
+                                                         ["status_id"],
+                                                         db)
+        logger.info(f"Updated the status of {len(updated_rows)} of {len(obj_update.changes)} tasks for plan {obj_update.plan_id}")
+        if updated_rows:
+            dashboard_cache.invalidate_after_commit(db, current_user.user_id)
+        return UXApprovedPlanDetail(plan_detail=execution_plan_details_adapter.validate_python(updated_rows, from_attributes=True),
+                                    routine_summary=None,
+                                    general_guidelines=None)
+
+    except RecordNotFoundException as e:
+        logger.error(f"Plan not found when updating the objective status: {str(e)}")
+        raise
+    except IntegrityException as e:
+
+        logger.error(f"IntegrityError when updating the objective status: {str(e)}")
+        raise IntegrityException(
+            f"IntegrityError when updating the objective status: {str(e)}",
+            context = {"detail": f"IntegrityError when updating the objective status: {str(e)}"}
+        )
+    except GeneralDataException as e:
+
+        logger.error(f"Database error when updating the objective status: {str(e)}")
+        raise GeneralDataException(
+            f"Database error when updating the objective status: {str(e)}",
+            context={"detail": f"Database error when updating the objective status: {str(e)}"}
+        )
+    except Exception as e:
+        logger.error(f"Some general error when updating the objective status: {str(e)}")
+        raise GeneralDataException(
+            message=f"Some general error when updating the objective status: {str(e)}",
+            context={"detail": f"Some general error when updating the objective status: {str(e)}"})
+
+
 async def redo_plan():
     """
     - Ensure the plan to be copied is successful
@@ -495,16 +446,17 @@ async def redo_plan():
 
     """
 
-async def get_all_plans(db: AsyncSession, current_user: User, request_metadata: Request):
+async def get_all_plans(db: AsyncSession, current_user: User, request_metadata: Request, limit: int = 100, cursor: Optional[str] = None):
     """
-    - get all plans by user
+    - get the plans of the user, newest first, one page at a time
+    - next_cursor of the response fetches the following page, it is None on the last page
 
     """
     try:
 
-        filter_params = {}
-        filter_params["user_id"] = current_user.user_id
-        obj_user_plan_db = await get_plan(filter_params=filter_params, db=db)
+        after = decode_cursor(cursor, datetime.fromisoformat, UUID)
+        obj_user_plan_rows = await get_plans_page(current_user.user_id, limit, after, db)
+        obj_user_plan_db, next_cursor = page_of(obj_user_plan_rows, limit, lambda plan: (plan.created_dt, plan.plan_id))
         obj_x = []
         if not obj_user_plan_db:
             return UXUserPlanIdentifierRS(content=[])
@@ -536,8 +488,10 @@ async def get_all_plans(db: AsyncSession, current_user: User, request_metadata:
             
             obj_x.append(obj_user_plan_ux)
 
-        rs = UXUserPlanIdentifierRS(content=obj_x)
+        rs = UXUserPlanIdentifierRS(content=obj_x, next_cursor=next_cursor)
         return rs
+    except InvalidCursor:
+        raise
     except IntegrityException as e:
         await db.rollback()
         logger.error(f"IntegrityError when retrieving all plans: {str(e)}")
@@ -644,13 +598,16 @@ async def get_upcoming_activities_svc(obj: UXUpcomingActivitiesRequest, db: Asyn
         filter_params["days_to_add"] = obj.days_to_add
         if obj.plan_id is not None:
             filter_params["plan_id"] = obj.plan_id.strip()
-        obj_result = await get_upcoming_activities_db(filter_params=filter_params, db=db)
+        # milestones, weeks and activities are not listed, filtered in SQL so every page is full
+        filter_params["exclude_entity_types"] = [EntityType.MILESTONE.value, EntityType.WEEK.value, EntityType.ACTIVITY.value]
+        filter_params["after"] = decode_cursor(obj.cursor, int, UUID)
+        filter_params["limit"] = obj.limit
+        obj_rows = await get_upcoming_activities_db(filter_params=filter_params, db=db)
+        obj_result, next_cursor = page_of(obj_rows, obj.limit, lambda row: (row["sequence_id"], row["entity_id"]))
         current_utc = datetime.now(timezone.utc)
         obj_output = []
         if obj_result is not None and len(obj_result) > 0:
             for row in obj_result:
-                if row["entity_type"] == 1000 or row["entity_type"] == 2 or row["entity_type"] ==  999:
-                    continue
                 logger.info(f"The row values are {row}")
                 format_user_time = format_date_time(str(row["start_date"]))
                 dt = convert_user_time_to_utc(format_user_time, request_metadata["timezone"] )
@@ -676,11 +633,13 @@ async def get_upcoming_activities_svc(obj: UXUpcomingActivitiesRequest, db: Asyn
                     status_id=row["status_id"])
 
                 obj_output.append(obj_x)
-            rs = UXUpcomingActivitiesResponseRS(content=obj_output)
+            rs = UXUpcomingActivitiesResponseRS(content=obj_output, next_cursor=next_cursor)
         else:
             rs = UXUpcomingActivitiesResponseRS(content=None)
         return rs
     
+    except InvalidCursor:
+        raise
     except GeneralDataException as e:
         await db.rollback()
         logger.error(f"Database error when selecting upcoming activities: {str(e)}")
@@ -707,7 +666,33 @@ async def get_created_plan_detail_svc(plan_id: str, db: AsyncSession, current_us
         if fmp_flag is None:
             filter_params["user_id"] = str(current_user.user_id)
         filter_params["plan_id"] = plan_id
-        obj_user_plan_db = await get_plan(filter_params=filter_params, db=db)
+        if settings.PLAN_DOCUMENT_MODE:
+            # single primary key lookup, plans created before document mode fall through
+            obj_document = await get_created_plan_document(plan_id, filter_params.get("user_id"), db)
+            if obj_document is not None:
+                obj_plan_detail = PlanDetailForUserManagement.model_validate(obj_document.document)
+                obj_plan_detail.plan_header = obj_plan_detail.plan_header.model_copy(update={
+                    "plan_name": obj_document.plan_name,
+                    "plan_goal": obj_document.plan_goal,
+                    "plan_start_date": obj_document.plan_start_date,
+                    "plan_end_date": obj_document.plan_end_date
+                })
+                return obj_plan_detail
+
+        plan_filter_params = dict(filter_params)
+        filter_params["intent"] = "display"
+        # the reads are independent, so they run side by side on the read pool
+        (obj_user_plan_db,
+         obj_goals,
+         obj_routine_summary,
+         obj_general_guidelines,
+         obj_created_plan) = await gather_reads(
+            lambda read_db: get_plan(filter_params=plan_filter_params, db=read_db),
+            lambda read_db: get_goal_builder(filter_params, read_db),
+            lambda read_db: get_plan_routine_summary(filter_params=filter_params, db=read_db),
+            lambda read_db: get_general_guidelines(filter_params=filter_params, db=read_db),
+            lambda read_db: get_created_plan(filter_params, read_db)
+        )
         if not obj_user_plan_db:
             raise GeneralDataException(
                 "Error in extracting plan detail",
@@ -718,8 +703,6 @@ async def get_created_plan_detail_svc(plan_id: str, db: AsyncSession, current_us
                     "Error in extracting plan detail",
                  {"detail": f"There is more than one row for this id .{plan_id}"}
             )
-        filter_params["intent"] = "display"
-        obj_goals =  await get_goal_builder(filter_params, db)
         root_id = None
         prev_plan_id = None
         if obj_goals:
@@ -736,7 +719,6 @@ async def get_created_plan_detail_svc(plan_id: str, db: AsyncSession, current_us
                                               root_id=root_id,
                                               prev_plan_id=prev_plan_id)
 
-        obj_routine_summary = await get_plan_routine_summary(filter_params=filter_params, db=db)
         obj_x = []
         if obj_routine_summary is not None and len(obj_routine_summary) > 0:
 
@@ -744,19 +726,14 @@ async def get_created_plan_detail_svc(plan_id: str, db: AsyncSession, current_us
                 obj_x.append(obj_routine_summary[i].routine)
         obj_routine = RoutineSummary(summary_item=obj_x)
         obj_x = []
-        obj_general_guidelines = await get_general_guidelines(filter_params=filter_params,db=db)
         if obj_general_guidelines is not None and len(obj_general_guidelines) > 0 :
 
             for i in range(len(obj_general_guidelines)):
                 obj_x.append(obj_general_guidelines[i].guideline)
         obj_gg = GeneralRecommendationAndGuidelines(general_descripton=obj_x)
 
-        obj_x = []
-        obj_created_plan = await get_created_plan(filter_params, db)
+        obj_x = created_plan_adapter.validate_python(obj_created_plan, from_attributes=True)
 
-        for i in range(len(obj_created_plan)):
-            obj_x.append(IUXCreatedPlan.model_validate(obj_created_plan[i]))
-        
         obj_prompt_response_for_user = PlanDetailForUserManagement(
                                                             plan_header= obj_user_plan_ux,
                                                             routine_summary= obj_routine,
@@ -819,25 +796,12 @@ async def get_executable_plan_detail_svc(plan_id: str, db: AsyncSession, current
 
         
         obj_executable_plan_detail = await get_executable_plan(filter_params=filter_params, db=db)
-        for i in range(len(obj_executable_plan_detail)):
-            obj_x = IExecutionPlanDetail(plan_id = str(obj_executable_plan_detail[i].plan_id),
-                                            sequence_id=obj_executable_plan_detail[i].sequence_id,
-                                            level_id=obj_executable_plan_detail[i].level_id,
-                                            entity_id=str(obj_executable_plan_detail[i].entity_id),
-                                            entity_type=obj_executable_plan_detail[i].entity_type,
-                                            parent_id=obj_executable_plan_detail[i].parent_id,
-                                            start_date=obj_executable_plan_detail[i].start_date,
-                                            status_id=obj_executable_plan_detail[i].status_id,
-                                            reminder_request=obj_executable_plan_detail[i].reminder_request,
-                                            progress_measure=obj_executable_plan_detail[i].progress_measure,
-                                            activity_desc=obj_executable_plan_detail[i].activity_desc  ,
-                                            request_reminder_time=obj_executable_plan_detail[i].request_reminder_time
-                                            )
-            obj_executable_resultset.append(obj_x)
-        
-        return UXApprovedPlanDetail(plan_detail=obj_executable_resultset,
-                                    routine_summary=obj_routine,
-                                    general_guidelines=obj_gg)
+        obj_executable_resultset = execution_plan_details_adapter.validate_python(obj_executable_plan_detail, from_attributes=True)
+
+        # every part is validated already, so the envelope is assembled without a second pass
+        return UXApprovedPlanDetail.model_construct(plan_detail=obj_executable_resultset,
+                                                    routine_summary=obj_routine,
+                                                    general_guidelines=obj_gg)
     
     except IntegrityException as e:
         logger.error(f"Some integrity error at the db level when retrieving all exexcutable plans: {str(e)}")
@@ -926,10 +890,7 @@ async def get_child_tasks_svc(plan_id: UUID, entity_id: UUID, db: AsyncSession,
         filter_params["parent_id"] = entity_id
 
         obj_routine_summary = await get_executable_plan(filter_params,db)
-        obj_child_tasks = []
-        for i in range(len(obj_routine_summary)):
-            obj_child_tasks.append(IExecutionPlanDetail.model_validate(obj_routine_summary[i])) 
-        return obj_child_tasks
+        return execution_plan_details_adapter.validate_python(obj_routine_summary, from_attributes=True)
 
     except SQLAlchemyError as e:
         logger.error(f"Database error when updating the private or follow flag: {str(e)}")
@@ -19,9 +19,11 @@ from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.common.utility_functions import count_words_alpha_numeric
 from app.common.exception import IntegrityException, GeneralDataException, UserNotFound, YoudraGeminiError, YoudraOpenAIError, PlanContextChange, PlanIllegalText, NotEnoughInfoToGenerateGoal
-from app.common.qdrant_common import QdrantClient
+from app.common.qdrant_common import QdrantClient, ensure_collection
+from app.common.embedding import get_embeddings
 from qdrant_client.models import PointStruct, Distance, VectorParams, Filter, FieldCondition, MatchValue
 from app.common.messaging import publish_message
+from app.service.plan_persistence import flatten_plan, persist_plan_batch
 import aio_pika
 import uuid
 import re
@@ -39,34 +41,6 @@ from app.model.user_prompt_response import MileStone, WeeklyPlanWithDailyDetail,
 # Set up logging
 logger = structlog.get_logger()
 
-async def parse_activity(input_str: str) -> Tuple[str, str, str]:
-    if not input_str or not input_str.strip():
-        return "", "", ""
-    
-    input_str = input_str.strip()
-
-    if "—" in input_str:  # em dash
-        parts = input_str.split("—")
-        activity_desc = parts[0].strip()
-        suggested_duration = ""
-        suggested_repetition = ""
-
-        for part in parts[1:]:
-            part = part.strip().lower()
-            if "suggested duration" in part:
-                match = re.search(r"(\d+)", part)
-                if match:
-                    suggested_duration = match.group(1)
-            elif "suggested repetition" in part:
-                match = re.search(r"(\d+)", part)
-                if match:
-                    suggested_repetition = match.group(1)
-
-        return activity_desc, suggested_duration, suggested_repetition
-    else:
-        return input_str, "", ""
-
-
 async def load_plan(obj_user_profile: UserPromptResponse, 
                     db: AsyncSession, 
                     current_user: User,
@@ -93,6 +67,7 @@ async def load_plan(obj_user_profile: UserPromptResponse,
         obj_user_plan_db = await user_plan.insert_plan( obj_user_plan, db)
         message["plan_id"] = str(obj_user_plan_db.plan_id)
         message["user_id"] = str(obj_user_plan_db.user_id)
+        revision_of = str(ic_prev_plan_id) if ic_root_id is not None and ic_prev_plan_id is not None else None
         if ic_root_id is None:
             ic_prev_plan_id = ic_root_id = str(obj_user_plan_db.plan_id)
         
@@ -112,162 +87,14 @@ async def load_plan(obj_user_profile: UserPromptResponse,
                 detail="Failed to create user plan"
             )      
         logger.info(f"User plan is successfully inserted and the plan id is {obj_user_plan_db.plan_id}")
-        if obj_user_profile.plan_type == "Weekly":
-            print ("The number of week count is ", len(obj_user_profile.plan))
-            for i in range(len(obj_user_profile.plan)):
-                week_sequence_id = (i+1)*10000
-                obj_wk_created_plan = ICreatedPlan(plan_id=obj_user_plan_db.plan_id,
-                                                sequence_id= week_sequence_id,
-                                                level_id=Level.ROOT,
-                                                entity_type=EntityType.WEEK,
-                                                parent_id=None,
-                                                suggested_start_time=None,
-                                                suggestion_duration=None,
-                                                status_id=1,
-                                                source_id=0,
-                                                entity_desc=obj_user_profile.plan[i].weekly_objective)
-                obj_wk_created_plan_db = await insert_created_plan(obj_wk_created_plan,db)
-                obj_created_plan.append(obj_wk_created_plan_db)
-                message_detail[str(obj_wk_created_plan_db.entity_id)] = obj_wk_created_plan_db.entity_desc
-
-                for j in range(len(obj_user_profile.plan[i].dailyactivity)):
-                    day_sequence_id = week_sequence_id + (j+1)*100
-                    obj_d_created_plan = ICreatedPlan(plan_id=obj_user_plan_db.plan_id,
-                                sequence_id= day_sequence_id,
-                                level_id=Level.BRANCH,
-                                entity_type=EntityType.DAY,
-                                parent_id=obj_wk_created_plan_db.entity_id,
-                                suggested_start_time=obj_user_profile.plan[i].dailyactivity[j].suggested_time,
-                                suggestion_duration=obj_user_profile.plan[i].dailyactivity[j].suggested_duration,
-                                status_id=1,
-                                source_id=0,
-                                entity_desc=obj_user_profile.plan[i].dailyactivity[j].daily_objective)
-                    
-                    obj_d_created_plan_db = await insert_created_plan(obj_d_created_plan,db)
-                    message_detail[str(obj_d_created_plan_db.entity_id)] = obj_d_created_plan_db.entity_desc
-                    obj_created_plan.append(obj_d_created_plan_db)
-
-                    for k in range(len( obj_user_profile.plan[i].dailyactivity[j].activity_detail)):
-
-                        activity_sequence_id = day_sequence_id + (k+1)
-                        activity_description, activity_time, activity_duration = await parse_activity(obj_user_profile.plan[i].dailyactivity[j].activity_detail[k].activity)
-                        obj_activity_created_plan = ICreatedPlan(plan_id=obj_user_plan_db.plan_id,
-                                sequence_id= activity_sequence_id,
-                                level_id=Level.LEAF,
-                                entity_type=EntityType.ACTIVITY,
-                                parent_id=obj_d_created_plan_db.entity_id,
-                                suggested_start_time= activity_time, #obj_user_profile.plan[i].dailyactivity[j].suggested_time,
-                                suggestion_duration=activity_duration , # obj_user_profile.plan[i].dailyactivity[j].suggested_duration,
-                                status_id=1,
-                                source_id=0,
-                                entity_desc= activity_description) #obj_user_profile.plan[i].dailyactivity[j].activity_detail[k].activity)
-                    
-                        obj_activity_created_plan_db = await insert_created_plan(obj_activity_created_plan,db)
-                        message_detail[str(obj_activity_created_plan_db.entity_id)] = obj_activity_created_plan_db.entity_desc
-                        obj_created_plan.append(obj_activity_created_plan_db)
-
-
-        elif obj_user_profile.plan_type == "Daily":
-            for i in range(len(obj_user_profile.plan)):
-                day_sequence_id = (i+1)*10000
-                obj_d_created_plan = ICreatedPlan(plan_id=obj_user_plan_db.plan_id,
-                                sequence_id= day_sequence_id,
-                                level_id=Level.ROOT,
-                                entity_type=EntityType.DAY,
-                                parent_id=None,
-                                suggested_start_time=obj_user_profile.plan[i].suggested_time,
-                                suggestion_duration=obj_user_profile.plan[i].suggested_duration,
-                                status_id=1,
-                                source_id=0,
-                                entity_desc=obj_user_profile.plan[i].daily_objective)
-                    
-                obj_d_created_plan_db = await insert_created_plan(obj_d_created_plan,db)
-                message_detail[str(obj_d_created_plan_db.entity_id)] = obj_d_created_plan_db.entity_desc
-                obj_created_plan.append(obj_d_created_plan_db)
-
-
-                for k in range(len( obj_user_profile.plan[i].activity_detail)):
-                    (activity_description, activity_time, activity_duration) = await parse_activity(obj_user_profile.plan[i].activity_detail[k].activity)
-                    activity_sequence_id = day_sequence_id + (k+1)
-                    obj_activity_created_plan = ICreatedPlan(plan_id=obj_user_plan_db.plan_id,
-                            sequence_id= activity_sequence_id,
-                            level_id=Level.LEAF,
-                            entity_type=EntityType.ACTIVITY,
-                            parent_id=obj_d_created_plan_db.entity_id,
-                            suggested_start_time= activity_time, #obj_user_profile.plan[i].suggested_time,
-                            suggestion_duration=activity_duration, #obj_user_profile.plan[i].suggested_duration,
-                            status_id=1,
-                            source_id=0,
-                            entity_desc=activity_description) #obj_user_profile.plan[i].activity_detail[k].activity)
-                
-                    obj_activity_created_plan_db = await insert_created_plan(obj_activity_created_plan,db)
-                    message_detail[str(obj_activity_created_plan_db.entity_id)] = obj_activity_created_plan_db.entity_desc
-                    obj_created_plan.append(obj_activity_created_plan_db)
-
-        else:
-            print ("This is a plan request with no time criteria")
-            magic_day_number_constant = "Day-0"
-            for i in range(len(obj_user_profile.plan)):
-                week_sequence_id = (i+1)*10000
-                obj_ms_created_plan = ICreatedPlan(plan_id=obj_user_plan_db.plan_id,
-                                                sequence_id= week_sequence_id,
-                                                level_id=Level.ROOT,
-                                                entity_type=EntityType.MILESTONE,
-                                                parent_id=None,
-                                                suggested_start_time=None,
-                                                suggestion_duration=None,
-                                                status_id=1,
-                                                source_id=0,
-                                                entity_desc=obj_user_profile.plan[i].milestone_desc)
-                obj_ms_created_plan_db = await insert_created_plan(obj_ms_created_plan,db)
-                obj_created_plan.append(obj_ms_created_plan_db)
-                message_detail[str(obj_ms_created_plan_db.entity_id)] = obj_ms_created_plan_db.entity_desc
-
-                for j in range(len(obj_user_profile.plan[i].activities)):
-                    day_sequence_id = week_sequence_id + (j+1)*100
-                    obj_d_created_plan = ICreatedPlan(plan_id=obj_user_plan_db.plan_id,
-                                    sequence_id= day_sequence_id,
-                                    level_id=Level.BRANCH,
-                                    entity_type=EntityType.TASK,
-                                    parent_id=obj_ms_created_plan_db.entity_id,
-                                    suggested_start_time=obj_user_profile.plan[i].activities[j].suggested_time,
-                                    suggestion_duration=obj_user_profile.plan[i].activities[j].suggested_duration,
-                                    status_id=1,
-                                    source_id=0,
-                                    entity_desc=obj_user_profile.plan[i].activities[j].daily_objective)
-                        
-                    obj_d_created_plan_db = await insert_created_plan(obj_d_created_plan,db)
-                    message_detail[str(obj_d_created_plan_db.entity_id)] = obj_d_created_plan_db.entity_desc
-                    obj_created_plan.append(obj_d_created_plan_db)
-
-                    for k in range(len( obj_user_profile.plan[i].activities[j].activity_detail)):
-
-                        activity_sequence_id = day_sequence_id + (k+1)
-                        activity_description, activity_time, activity_duration = await parse_activity(obj_user_profile.plan[i].activities[j].activity_detail[k].activity)
-                        obj_activity_created_plan = ICreatedPlan(plan_id=obj_user_plan_db.plan_id,
-                                sequence_id= activity_sequence_id,
-                                level_id=Level.LEAF,
-                                entity_type=EntityType.ACTIVITY,
-                                parent_id=obj_d_created_plan_db.entity_id,
-                                suggested_start_time= activity_time, #obj_user_profile.plan[i].suggested_time,
-                                suggestion_duration=activity_duration, #obj_user_profile.plan[i].suggested_duration,
-                                status_id=1,
-                                source_id=0,
-                                entity_desc=activity_description) #obj_user_profile.plan[i].activity_detail[k].activity)
-                    
-                        obj_activity_created_plan_db = await insert_created_plan(obj_activity_created_plan,db)
-                        message_detail[str(obj_activity_created_plan_db.entity_id)] = obj_activity_created_plan_db.entity_desc            
-                        obj_created_plan.append(obj_activity_created_plan_db)
 
+        # entity ids are generated client side, so the whole tree is written with one
+        # multi-row insert per table instead of one round trip per node
+        # a revision copies the subtrees that did not change from the previous plan
+        obj_plan_batch = flatten_plan(obj_user_profile, obj_user_plan_db.plan_id)
+        obj_created_plan = await persist_plan_batch(obj_plan_batch, db, revision_of, current_user.user_id)
+        message_detail = {str(row["entity_id"]): row["entity_desc"] for row in obj_created_plan}
 
-        if obj_user_profile.routine_summary is not None:
-            for i in range(len(obj_user_profile.routine_summary.summary_item)):
-                #obj_rs = RoutineSummary(summary_item=obj_user_profile.routine_summary[i].summary_item)
-                res = await insert_plan_routine_summary(obj_user_plan_ux.plan_id, obj_user_profile.routine_summary.summary_item[i],db )
-        if obj_user_profile.general_recommendation_guideline is not None:
-            for i in range(len(obj_user_profile.general_recommendation_guideline.general_descripton)):
-                #obj_gg = GeneralRecommendationAndGuidelines(general_descripton=obj_user_profile.general_recommendation_guideline[i].general_descripton)
-                res = await insert_general_guideline(obj_user_plan_ux.plan_id, obj_user_profile.general_recommendation_guideline.general_descripton[i], db)
         obj_prompt_response_for_user = PlanDetailForUserManagement(
                                                                 plan_header= obj_user_plan_ux,
                                                                 routine_summary= obj_user_profile.routine_summary,
@@ -275,6 +102,10 @@ async def load_plan(obj_user_profile: UserPromptResponse,
                                                                 created_plan=obj_created_plan,
                                                                 plan_trail= None
                                                                    )
+        if settings.PLAN_DOCUMENT_MODE:
+            await user_plan.upsert_created_plan_document(obj_user_plan_db.plan_id,
+                                                         obj_prompt_response_for_user.model_dump(mode="json"),
+                                                         db)
         message["detail"] = message_detail
         message["task_type"] = "get_serp_for_plan"
         await publish_message(message, msg_connection)
@@ -612,22 +443,21 @@ async def get_embedding(client: OpenAI, text: str):
     return response.data[0].embedding
     
 async def find_relevance(text: str,  q_client: QdrantClient, session_id: str):
+    """
+    Ranks the goal builder messages of a session against the text, best match first.
+    The session_id payload index keeps the filtered search to the session's points.
+    """
     try:
-        ai_client = OpenAI(api_key=settings.OPEN_AI_APIKEY)
-        # Define collection name
         collection_name = settings.QDRANT_GOAL_BUILDER_COLLECTION_NAME
         exists = await q_client.collection_exists(collection_name)
-    # Create collection (if not exists)
         if not exists:
-                await q_client.create_collection(
-                collection_name=collection_name,
-                    vectors_config=VectorParams(size=len( await get_embedding(ai_client, "test")), distance=Distance.COSINE)
-                )   
-                logger.info(f"Creating the goal builder collection {collection_name}")
+            logger.info(f"Goal builder collection {collection_name} does not exist yet")
+            return []
         top_k = 100
-        search_result = await q_client.search(
+        query_vector = (await get_embeddings([text]))[0]
+        response = await q_client.query_points(
             collection_name=collection_name,
-            query_vector= await get_embedding(ai_client, text),
+            query=query_vector,
             limit=top_k,
             query_filter=Filter(
                 must=[
@@ -635,8 +465,7 @@ async def find_relevance(text: str,  q_client: QdrantClient, session_id: str):
                 ]
             )
         )
-
-        return search_result
+        return response.points
 
     except Exception as e:
         logger.error (f" Error in find relevance function {str(e)}")
@@ -651,26 +480,22 @@ async def upsert_message(message: str, session_id: str, plan_id: str, q_client:
 
         collection_name = settings.QDRANT_GOAL_BUILDER_COLLECTION_NAME
 
-        exists = await q_client.collection_exists(collection_name)
-        # Create collection (if not exists)
-        if not exists:
-            await q_client.create_collection(
-                    collection_name=collection_name,
-                        vectors_config=VectorParams(size=len(await get_embedding(ai_client, "test")), distance=Distance.COSINE)
-                    )   
-            logger.info(f"Creating the goal builder collection {collection_name}")
-
         embedding = await get_embedding(ai_client,message)
+        # Create collection (if not exists) with payload indexes and quantization
+        await ensure_collection(q_client, collection_name, len(embedding))
+
+        payload = {
+            "text": message,
+            "session_id": session_id,
+            "plan_id": str(plan_id)
+        }
         await q_client.upsert(
             collection_name=collection_name,
             points=[
                 PointStruct(
                     id=plan_id,
                     vector=embedding,
-                    payload={
-                        "text": message,
-                        "session_id": session_id
-                    }
+                    payload=payload
                 )
             ]
         )
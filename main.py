@@ -30,6 +30,10 @@ import structlog
 from app.common.middleware import log_requests
 from app.common.timezone import TimezoneHeaderMiddleware
 from app.common.messaging import rabbitmq_manager
+from app.common.dashboard_cache import dashboard_cache
+from app.data.user import User
+from app.service.user import get_current_active_user
+from app.service.billing import ensure_platform_admin
 from fastapi.responses import JSONResponse
 from app.common.exception import UserNotFound, PlanAlreadyApproved, PlanContextChange, PlanIllegalText, PlanExists, YoudraOpenAIError, YoudraGeminiError
 
@@ -232,6 +236,13 @@ def greet():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/dashboard-cache")
+def dashboard_cache_metrics(current_user: User = Depends(get_current_active_user)):
+    # hit ratio (stale hits count as hits) and latency of the loads behind the dashboards;
+    # process wide figures, so platform admins only
+    ensure_platform_admin(current_user)
+    return dashboard_cache.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", reload=True)
\ No newline at end of file
@@ -0,0 +1,122 @@
+# scripts/benchmark_plan_serialization.py
+#
+# Times building and rendering the executed plan detail response for a synthetic plan,
+# from executable_plan rows to response bytes. No database is needed, the rows are
+# transient ORM objects.
+#
+#   field_by_field  one IExecutionPlanDetail per row built field by field, then FastAPI's
+#                   response_model handling (dump, validate, jsonable_encoder, json.dumps)
+#   type_adapter    execution_plan_details_adapter over the whole list, ModelJSONResponse
+#   orjson          execution_plan_details_adapter, then ORJSONResponse over model_dump()
+#                   (only when orjson is installed)
+#
+#   python -m scripts.benchmark_plan_serialization --tasks 1000 --repeat 50
+#
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()  # make sure POSTGRES_* etc. are in the environment
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.data.user_plan import ExecutablePlan
+from app.model.user_plan import IExecutionPlanDetail, UXApprovedPlanDetail, execution_plan_details_adapter
+from app.model.common import RoutineSummary, GeneralRecommendationAndGuidelines
+from app.common.responses import ModelJSONResponse
+from app.common.site_enums import Level, EntityType
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def synthetic_rows(n_tasks: int):
+    plan_id = uuid.uuid4()
+    start = datetime.now(timezone.utc)
+    rows = []
+    for i in range(n_tasks):
+        rows.append(ExecutablePlan(plan_id=plan_id, entity_id=uuid.uuid4(), parent_id=uuid.uuid4(),
+                                   entity_type=EntityType.ACTIVITY.value, status_id=1, level_id=Level.LEAF.value,
+                                   sequence_id=10000 + i, reminder_request=0, progress_measure=0.0,
+                                   activity_desc=f"activity {i} of the synthetic plan", start_date=start + timedelta(days=i // 4),
+                                   request_reminder_time=None))
+    return rows
+
+
+ROUTINE = RoutineSummary(summary_item=[f"routine {i}" for i in range(5)])
+GUIDELINES = GeneralRecommendationAndGuidelines(general_descripton=[f"guideline {i}" for i in range(5)])
+RESPONSE_FIELD = create_model_field("response", UXApprovedPlanDetail)
+
+
+def field_by_field(rows) -> bytes:
+    plan_detail = []
+    for row in rows:
+        plan_detail.append(IExecutionPlanDetail(plan_id=str(row.plan_id),
+                                                sequence_id=row.sequence_id,
+                                                level_id=row.level_id,
+                                                entity_id=str(row.entity_id),
+                                                entity_type=row.entity_type,
+                                                parent_id=row.parent_id,
+                                                start_date=row.start_date,
+                                                status_id=row.status_id,
+                                                reminder_request=row.reminder_request,
+                                                progress_measure=row.progress_measure,
+                                                activity_desc=row.activity_desc,
+                                                request_reminder_time=row.request_reminder_time))
+    response = UXApprovedPlanDetail(plan_detail=plan_detail, routine_summary=ROUTINE, general_guidelines=GUIDELINES)
+    content = asyncio.run(serialize_response(field=RESPONSE_FIELD, response_content=response))
+    return JSONResponse(content).body
+
+
+def build_with_adapter(rows) -> UXApprovedPlanDetail:
+    return UXApprovedPlanDetail.model_construct(
+        plan_detail=execution_plan_details_adapter.validate_python(rows, from_attributes=True),
+        routine_summary=ROUTINE,
+        general_guidelines=GUIDELINES
+    )
+
+
+def type_adapter(rows) -> bytes:
+    return ModelJSONResponse(build_with_adapter(rows)).body
+
+
+def with_orjson(rows) -> bytes:
+    return ORJSONResponse(build_with_adapter(rows).model_dump()).body
+
+
+METHODS = {"field_by_field": field_by_field, "type_adapter": type_adapter}
+if orjson is not None:
+    METHODS["orjson"] = with_orjson
+
+
+def main(args):
+    rows = synthetic_rows(args.tasks)
+    reference = json.loads(field_by_field(rows))
+    print(f"{args.tasks} tasks, median of {args.repeat} runs")
+    for name, method in METHODS.items():
+        body = method(rows)  # warm up
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            method(rows)
+            timings.append((time.perf_counter() - started) * 1000)
+        # orjson writes UTC as +00:00 where pydantic writes Z, so it is not byte compatible
+        same = "same output" if json.loads(body) == reference else "output differs"
+        print(f"{name:>15} {statistics.median(timings):8.2f} ms {len(body):>9} bytes  {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark building and rendering the executed plan detail response")
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    main(parser.parse_args())
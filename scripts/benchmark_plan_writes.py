@@ -0,0 +1,112 @@
+# scripts/benchmark_plan_writes.py
+#
+# Times the ways a generated plan can be written to created_plan: one INSERT per
+# node, asyncpg executemany, multi-row INSERT and COPY. Every run happens in its own
+# transaction that is rolled back, so the database is left as it was.
+#
+#   python -m scripts.benchmark_plan_writes --sizes 50 200 1000 5000 --repeat 5
+#
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()  # make sure POSTGRES_* etc. are in the environment
+
+from sqlalchemy import insert, text
+
+from app.data.dbinit import SessionLocal
+from app.data.bulk_write import copy_records, BULK_INSERT_CHUNK_SIZE
+from app.data.user_plan import CreatedPlan
+from app.service.plan_persistence import PlanBatch
+from app.common.site_enums import Level, EntityType
+
+
+def synthetic_plan(plan_id, n_nodes: int) -> PlanBatch:
+    """Weekly shaped plan: 7 days per week and 4 activities per day, cut at n_nodes."""
+    batch = PlanBatch(plan_id)
+    week = 0
+    while len(batch) < n_nodes:
+        week += 1
+        week_sequence_id = week*10000
+        week_id = batch.add_node(week_sequence_id, Level.ROOT.value, EntityType.WEEK.value, None, f"week {week}")
+        for day in range(1, 8):
+            if len(batch) >= n_nodes:
+                break
+            day_sequence_id = week_sequence_id + day*100
+            day_id = batch.add_node(day_sequence_id, Level.BRANCH.value, EntityType.DAY.value, week_id, f"day {day}", "7am", "30")
+            for activity in range(1, 5):
+                if len(batch) >= n_nodes:
+                    break
+                batch.add_node(day_sequence_id + activity, Level.LEAF.value, EntityType.ACTIVITY.value, day_id,
+                               f"activity {activity} of day {day}", "20", "3")
+    return batch
+
+
+async def per_row(db, rows):
+    for row in rows:
+        await db.execute(insert(CreatedPlan).values(**row).returning(CreatedPlan.entity_id))
+
+
+async def executemany(db, rows):
+    columns = list(rows[0])
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    placeholders = ", ".join(f"${i+1}" for i in range(len(columns)))
+    await raw_connection.driver_connection.executemany(
+        f"INSERT INTO created_plan ({', '.join(columns)}) VALUES ({placeholders})",
+        [tuple(row[column] for column in columns) for row in rows]
+    )
+
+
+async def multi_row(db, rows):
+    for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+        await db.execute(insert(CreatedPlan).values(rows[start:start + BULK_INSERT_CHUNK_SIZE]))
+
+
+async def copy(db, rows):
+    columns = list(rows[0])
+    await copy_records(db, "created_plan", columns, [tuple(row[column] for column in columns) for row in rows])
+
+
+METHODS = {"per_row": per_row, "executemany": executemany, "multi_row": multi_row, "copy": copy}
+
+
+async def timed_run(method, n_nodes: int) -> float:
+    async with SessionLocal() as db:
+        plan_id = uuid.uuid4()
+        await db.execute(
+            text("""INSERT INTO user_plan (plan_id, user_id, plan_name, plan_type, plan_goal)
+                    VALUES (:plan_id, :user_id, 'benchmark', 'Weekly', 'benchmark')"""),
+            {"plan_id": plan_id, "user_id": uuid.uuid4()}
+        )
+        rows = synthetic_plan(plan_id, n_nodes).created_plan_rows()
+        started = time.perf_counter()
+        await method(db, rows)
+        elapsed = time.perf_counter() - started
+        await db.rollback()
+    return elapsed * 1000
+
+
+async def main(args):
+    print(f"{'nodes':>6} " + " ".join(f"{name:>12}" for name in METHODS) + "   (median ms)")
+    for n_nodes in args.sizes:
+        medians = []
+        for name, method in METHODS.items():
+            if name == "per_row" and n_nodes > args.per_row_limit:
+                medians.append("skipped")
+                continue
+            runs = [await timed_run(method, n_nodes) for _ in range(args.repeat)]
+            medians.append(f"{statistics.median(runs):.1f}")
+        print(f"{n_nodes:>6} " + " ".join(f"{value:>12}" for value in medians))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark created_plan write paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--per-row-limit", type=int, default=5000, help="largest plan to time with one INSERT per node")
+    asyncio.run(main(parser.parse_args()))
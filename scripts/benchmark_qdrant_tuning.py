@@ -0,0 +1,120 @@
+# scripts/benchmark_qdrant_tuning.py
+#
+# Compares a collection created the old way (plain VectorParams) with one created
+# through ensure_collection (keyword payload indexes + int8 quantization with rescoring).
+# Run against a local Qdrant container:
+#
+#   docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant
+#   python -m scripts.benchmark_qdrant_tuning --points 50000 --sessions 5000
+#
+# numpy is not a requirement of the app, it comes with qdrant-client.
+#
+import argparse
+import asyncio
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from app.common.qdrant_common import ensure_collection, QUANTIZED_SEARCH_PARAMS
+
+BASELINE = "bench_goal_builder_baseline"
+TUNED = "bench_goal_builder_tuned"
+
+
+async def load(client, collection_name, vectors, session_ids, batch_size=1000):
+    for start in range(0, len(vectors), batch_size):
+        await client.upsert(
+            collection_name=collection_name,
+            points=[
+                models.PointStruct(
+                    id=i,
+                    vector=vectors[i].tolist(),
+                    payload={"session_id": session_ids[i], "plan_id": str(uuid.uuid4())}
+                )
+                for i in range(start, min(start + batch_size, len(vectors)))
+            ]
+        )
+
+
+async def run_queries(client, collection_name, queries, query_sessions, top_k, params=None, filtered=True):
+    latencies = []
+    results = []
+    for vector, session_id in zip(queries, query_sessions):
+        query_filter = None
+        if filtered:
+            query_filter = models.Filter(
+                must=[models.FieldCondition(key="session_id", match=models.MatchValue(value=session_id))]
+            )
+        started = time.perf_counter()
+        response = await client.query_points(
+            collection_name=collection_name,
+            query=vector.tolist(),
+            query_filter=query_filter,
+            limit=top_k,
+            search_params=params
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append([point.id for point in response.points])
+    return np.array(latencies), results
+
+
+def recall(results, truth):
+    hits = [len(set(r) & set(t)) / max(len(t), 1) for r, t in zip(results, truth)]
+    return float(np.mean(hits))
+
+
+def report(label, latencies, rec):
+    print(f"{label:<34} p50={np.percentile(latencies, 50):7.2f}ms "
+          f"p95={np.percentile(latencies, 95):7.2f}ms recall@k={rec:.4f}")
+
+
+async def main(args):
+    client = AsyncQdrantClient(url=args.url, timeout=120)
+    rng = np.random.default_rng(7)
+    vectors = rng.standard_normal((args.points, args.dim), dtype=np.float32)
+    session_ids = [str(i % args.sessions) for i in range(args.points)]
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    query_sessions = [str(rng.integers(args.sessions)) for _ in range(args.queries)]
+
+    for name in (BASELINE, TUNED):
+        if await client.collection_exists(name):
+            await client.delete_collection(name)
+    await client.create_collection(
+        collection_name=BASELINE,
+        vectors_config=models.VectorParams(size=args.dim, distance=models.Distance.COSINE)
+    )
+    await ensure_collection(client, TUNED, args.dim)
+
+    for name in (BASELINE, TUNED):
+        started = time.perf_counter()
+        await load(client, name, vectors, session_ids)
+        print(f"loaded {args.points} points into {name} in {time.perf_counter() - started:.1f}s")
+
+    exact = models.SearchParams(exact=True)
+    for filtered in (True, False):
+        scope = "session filter" if filtered else "unfiltered"
+        _, truth = await run_queries(client, BASELINE, queries, query_sessions, args.top_k, exact, filtered)
+        latencies, results = await run_queries(client, BASELINE, queries, query_sessions, args.top_k, None, filtered)
+        report(f"baseline ({scope})", latencies, recall(results, truth))
+        latencies, results = await run_queries(client, TUNED, queries, query_sessions, args.top_k, QUANTIZED_SEARCH_PARAMS, filtered)
+        report(f"tuned ({scope})", latencies, recall(results, truth))
+
+    if not args.keep:
+        for name in (BASELINE, TUNED):
+            await client.delete_collection(name)
+    await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Qdrant payload indexes and int8 quantization")
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--points", type=int, default=50000)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,158 @@
+# scripts/benchmark_upcoming_activities.py
+#
+# Times the upcoming activities query on a synthetic dataset (1M executable_plan rows by
+# default), the old single query with one OR over status and dates against the UNION ALL
+# of get_upcoming_activities_db. Apply the migrations first (the new query relies on the
+# partial indexes of migration 4). The synthetic users and plans are committed so VACUUM
+# can set the visibility map for index only scans, and deleted again at the end.
+#
+#   python -m scripts.benchmark_upcoming_activities --users 1000 --plans-per-user 4 --rows-per-plan 250
+#
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone, timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()  # make sure POSTGRES_* etc. are in the environment
+
+from sqlalchemy import text
+
+from app.data.dbinit import SessionLocal, engine
+from app.data.user_plan import get_upcoming_activities_db
+from app.common.site_enums import EntityType
+
+BENCHMARK_PLAN_NAME = "benchmark-upcoming-activities"
+
+SEED_PLANS_SQL = text("""
+    INSERT INTO user_plan (plan_id, user_id, plan_name, plan_type, plan_goal)
+    SELECT md5('benchmark-plan-' || u || '-' || p)::uuid, md5('benchmark-user-' || u)::uuid,
+           :plan_name, 'Weekly', 'benchmark'
+    FROM generate_series(1, :users) u, generate_series(1, :plans_per_user) p
+""")
+
+# 70% complete, 5% in progress, 25% not started, dates spread over a year around today
+SEED_ROWS_SQL = text("""
+    INSERT INTO executable_plan (plan_id, entity_id, entity_type, status_id, level_id, sequence_id,
+                                 reminder_request, progress_measure, activity_desc, start_date)
+    SELECT u.plan_id, gen_random_uuid(),
+           (ARRAY[2, 3, 999, 1001])[1 + n % 4],
+           CASE WHEN n % 20 < 14 THEN 100 WHEN n % 20 = 14 THEN 1 ELSE 0 END,
+           999, 10000 + n, 0, 0, 'benchmark activity',
+           now() + (random() * 360 - 180) * interval '1 day'
+    FROM user_plan u, generate_series(1, :rows_per_plan) n
+    WHERE u.plan_name = :plan_name
+""")
+
+CLEANUP_SQL = [
+    "DELETE FROM executable_plan WHERE plan_id IN (SELECT plan_id FROM user_plan WHERE plan_name = :plan_name)",
+    "DELETE FROM plan_version WHERE plan_id IN (SELECT plan_id FROM user_plan WHERE plan_name = :plan_name)",
+    "DELETE FROM user_plan WHERE plan_name = :plan_name",
+]
+
+# get_upcoming_activities_db as it was before the UNION ALL rewrite
+LEGACY_SQL = text("""
+    SELECT u.plan_id AS user_plan_id, u.plan_name, e.entity_id, e.sequence_id, e.activity_desc,
+           to_char(e.start_date, 'YYYY-MM-DD HH24:MI:SS') AS start_date, e.reminder_request,
+           e.request_reminder_time, e.entity_type, e.status_id, e.progress_measure,
+           coalesce(p.progress_percent, 0.0) AS progress_percent
+    FROM executable_plan e
+    JOIN user_plan u ON e.plan_id = u.plan_id
+    LEFT JOIN progress_update p ON e.plan_id = p.plan_id AND e.entity_id = p.entity_id
+    WHERE (e.status_id = 1
+           OR (e.status_id = 0 AND (e.start_date <= now() OR e.start_date BETWEEN :start AND :end)))
+      AND e.entity_type != 999
+      AND e.entity_type NOT IN (1000, 2, 999)
+      AND u.user_id = :user_id
+    ORDER BY e.sequence_id, e.entity_id
+    LIMIT :limit
+""")
+
+
+def filter_params_for(user_id, limit: int):
+    return {
+        "user_id": user_id,
+        "start_date": datetime.now(timezone.utc),
+        "days_to_add": 7,
+        "exclude_entity_types": [EntityType.MILESTONE.value, EntityType.WEEK.value, EntityType.ACTIVITY.value],
+        "limit": limit,
+    }
+
+
+async def legacy(db, filter_params):
+    result = await db.execute(LEGACY_SQL, {
+        "user_id": filter_params["user_id"],
+        "start": filter_params["start_date"],
+        "end": filter_params["start_date"] + timedelta(days=filter_params["days_to_add"]),
+        "limit": filter_params["limit"] + 1
+    })
+    return result.mappings().all()
+
+
+async def union_all(db, filter_params):
+    return await get_upcoming_activities_db(filter_params=filter_params, db=db)
+
+
+METHODS = {"or_query": legacy, "union_all": union_all}
+
+
+async def seed(args):
+    async with SessionLocal() as db:
+        await db.execute(SEED_PLANS_SQL, {"plan_name": BENCHMARK_PLAN_NAME, "users": args.users,
+                                          "plans_per_user": args.plans_per_user})
+        await db.execute(SEED_ROWS_SQL, {"plan_name": BENCHMARK_PLAN_NAME, "rows_per_plan": args.rows_per_plan})
+        await db.commit()
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE executable_plan"))
+        await conn.execute(text("VACUUM ANALYZE user_plan"))
+
+
+async def cleanup():
+    async with SessionLocal() as db:
+        for statement in CLEANUP_SQL:
+            await db.execute(text(statement), {"plan_name": BENCHMARK_PLAN_NAME})
+        await db.commit()
+
+
+async def main(args):
+    total = args.users * args.plans_per_user * args.rows_per_plan
+    print(f"seeding {total} executable_plan rows")
+    await seed(args)
+    try:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                text("SELECT DISTINCT user_id FROM user_plan WHERE plan_name = :plan_name LIMIT :n"),
+                {"plan_name": BENCHMARK_PLAN_NAME, "n": args.sample_users}
+            )
+            user_ids = result.scalars().all()
+
+        print(f"{args.sample_users} users x {args.repeat} runs, page of {args.limit}")
+        for name, method in METHODS.items():
+            timings = []
+            rows = 0
+            async with SessionLocal() as db:
+                for user_id in user_ids:
+                    filter_params = filter_params_for(user_id, args.limit)
+                    await method(db, filter_params)  # warm up
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        rows = len(await method(db, filter_params))
+                        timings.append((time.perf_counter() - started) * 1000)
+            print(f"{name:>10}  median {statistics.median(timings):8.2f} ms  p95 "
+                  f"{statistics.quantiles(timings, n=20)[-1]:8.2f} ms  ({rows} rows last page)")
+    finally:
+        await cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the upcoming activities query")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--plans-per-user", type=int, default=4)
+    parser.add_argument("--rows-per-plan", type=int, default=250)
+    parser.add_argument("--sample-users", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
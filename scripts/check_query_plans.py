@@ -0,0 +1,148 @@
+# scripts/check_query_plans.py
+#
+# EXPLAINs the hot queries and fails (exit code 1) when any of them reads one of the
+# checked tables with a sequential scan. Sequential scans are disabled for the check, so
+# the planner only falls back to one when no index can serve the predicate, whatever the
+# table sizes of the database it runs against. Run it after adding a migration or
+# changing one of these queries:
+#
+#   python -m scripts.check_query_plans            # check the database as it is
+#   python -m scripts.check_query_plans --migrate  # apply pending migrations first
+#
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()  # make sure POSTGRES_* etc. are in the environment
+
+from sqlalchemy import text
+
+from app.data.dbinit import SessionLocal, engine
+from app.data.migrations import apply_migrations
+
+# name -> (sql, params). The predicates mirror the queries in app/data; keep them in step.
+HOT_QUERIES = {
+    "rollup parent of task": (
+        "SELECT parent_id FROM executable_plan WHERE entity_id = :entity_id",
+        {"entity_id": uuid.uuid4()},
+    ),
+    "rollup children of parent": (
+        """SELECT COALESCE(SUM(p.cumulative_progress), 0), COUNT(e.entity_id)
+           FROM executable_plan e
+           LEFT JOIN progress_tracking p ON e.entity_id = p.entity_id
+           WHERE e.parent_id = :parent_id AND (e.entity_type = 3 OR e.entity_type = 1001)""",
+        {"parent_id": uuid.uuid4()},
+    ),
+    "plans of user": (
+        "SELECT plan_id FROM user_plan WHERE user_id = :user_id",
+        {"user_id": uuid.uuid4()},
+    ),
+    "goal builder chain": (
+        "SELECT plan_id, sequence_id FROM goal_builder WHERE root_id = :root_id ORDER BY sequence_id",
+        {"root_id": uuid.uuid4()},
+    ),
+    "progress of task": (
+        "SELECT progress_percent FROM progress_update WHERE entity_id = :entity_id AND plan_id = :plan_id",
+        {"entity_id": uuid.uuid4(), "plan_id": uuid.uuid4()},
+    ),
+    "org invite": (
+        "SELECT member_id FROM org_member WHERE invite_token = :token",
+        {"token": uuid.uuid4().hex},
+    ),
+    # the three branches of get_upcoming_activities_db
+    "upcoming in progress": (
+        """SELECT e.plan_id, e.entity_id, e.sequence_id
+           FROM executable_plan e JOIN user_plan u ON e.plan_id = u.plan_id
+           WHERE u.user_id = :user_id AND e.status_id = 1 AND e.entity_type != 999
+           ORDER BY e.sequence_id, e.entity_id LIMIT 201""",
+        {"user_id": uuid.uuid4()},
+    ),
+    "upcoming overdue": (
+        """SELECT e.plan_id, e.entity_id, e.sequence_id
+           FROM executable_plan e JOIN user_plan u ON e.plan_id = u.plan_id
+           WHERE u.user_id = :user_id AND e.status_id = 0 AND e.start_date <= now() AND e.entity_type != 999
+           ORDER BY e.sequence_id, e.entity_id LIMIT 201""",
+        {"user_id": uuid.uuid4()},
+    ),
+    "upcoming due soon": (
+        """SELECT e.plan_id, e.entity_id, e.sequence_id
+           FROM executable_plan e JOIN user_plan u ON e.plan_id = u.plan_id
+           WHERE u.user_id = :user_id AND e.status_id = 0 AND e.start_date > now()
+             AND e.start_date BETWEEN :start AND :start + interval '7 days' AND e.entity_type != 999
+           ORDER BY e.sequence_id, e.entity_id LIMIT 201""",
+        {"user_id": uuid.uuid4(), "start": datetime.now(timezone.utc)},
+    ),
+    "progress history page": (
+        """SELECT id, progress_percent, created_at FROM progress_event
+           WHERE entity_id = :entity_id AND (created_at, id) < (:created_at, 9223372036854775807)
+           ORDER BY created_at DESC, id DESC LIMIT 21""",
+        {"entity_id": uuid.uuid4(), "created_at": datetime.now(timezone.utc)},
+    ),
+    "dashboard open tasks of plan": (
+        "SELECT start_day, open_tasks FROM plan_open_task_day WHERE plan_id = :plan_id AND open_tasks > 0",
+        {"plan_id": uuid.uuid4()},
+    ),
+}
+
+CHECKED_TABLES = {"executable_plan", "user_plan", "goal_builder", "progress_update", "org_member", "progress_event", "plan_open_task_day"}
+
+
+def seq_scans(plan_node):
+    """Relations read by a Seq Scan anywhere in the plan tree."""
+    found = []
+    if plan_node.get("Node Type") == "Seq Scan":
+        found.append(plan_node.get("Relation Name"))
+    for child in plan_node.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def scan_summary(plan_node):
+    """Node type and relation (or index) of every scan in the plan tree."""
+    found = []
+    if "Scan" in plan_node.get("Node Type", ""):
+        found.append(f"{plan_node['Node Type']} {plan_node.get('Index Name') or plan_node.get('Relation Name')}")
+    for child in plan_node.get("Plans", []):
+        found.extend(scan_summary(child))
+    return found
+
+
+async def explain(sql: str, params):
+    async with SessionLocal() as db:
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+        result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params)
+        plan = result.scalar()
+        await db.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def main(args):
+    if args.migrate:
+        applied = await apply_migrations(engine)
+        print(f"applied migrations {applied}" if applied else "no pending migrations")
+
+    failures = []
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = await explain(sql, params)
+        bad = [table for table in seq_scans(plan) if table in CHECKED_TABLES]
+        print(f"{'FAIL' if bad else 'ok':>4}  {name:<30} {', '.join(scan_summary(plan))}")
+        if bad:
+            failures.append(name)
+
+    if failures:
+        print(f"{len(failures)} hot queries fall back to a sequential scan: {', '.join(failures)}")
+        sys.exit(1)
+    print("all hot queries use an index")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail when a hot query falls back to a sequential scan")
+    parser.add_argument("--migrate", action="store_true", help="apply pending migrations before checking")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,50 @@
+# scripts/compact_progress_events.py
+#
+# Background compaction of the progress history. Every entity's events older than the
+# retention window (PROGRESS_EVENT_RETENTION_DAYS) are folded into one summary event, a
+# batch of entities per transaction so the locks it takes stay short. Safe to re-run, an
+# entity that was compacted already is skipped until it has new old events. Schedule it
+# (e.g. nightly cron) with a single instance running at a time:
+#
+#   python -m scripts.compact_progress_events
+#   python -m scripts.compact_progress_events --days 30 --batch-size 200
+#
+import argparse
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()  # make sure POSTGRES_* etc. are in the environment
+
+import structlog
+
+from app.config.config import settings
+from app.data.dbinit import SessionLocal
+from app.data.progress_mgmt import compact_progress_events
+
+logger = structlog.get_logger()
+
+
+async def main(args):
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.days)
+    total_entities = total_events = 0
+    while True:
+        async with SessionLocal() as db:
+            entities, events = await compact_progress_events(db, cutoff, args.batch_size)
+            await db.commit()
+        if not entities:
+            break
+        total_entities += entities
+        total_events += events
+        logger.info(f"Compacted {events} progress events of {entities} entities")
+    logger.info(f"Progress event compaction done, {total_events} events of {total_entities} entities "
+                f"older than {cutoff.isoformat()} folded into {total_entities} summaries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold old progress events into one summary event per entity")
+    parser.add_argument("--days", type=int, default=settings.PROGRESS_EVENT_RETENTION_DAYS,
+                        help="keep the events of the last DAYS days as they are")
+    parser.add_argument("--batch-size", type=int, default=500, help="entities per transaction")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,245 @@
+# scripts/reembed_collections.py
+#
+# Rebuilds a vector collection with a new embedding model. Goal builder prompts are
+# streamed from Postgres with a server side cursor in key order. Activities have no
+# source table (the helper data is derived from the collection), so they are scrolled
+# out of the current activity collection and re-embedded from their stored payloads,
+# keeping point ids and payloads as they are. Batches are embedded concurrently and
+# upserted into a new collection. Progress is checkpointed after every contiguous run
+# of finished batches, so an interrupted run resumes where it stopped. When the source
+# is exhausted the alias is pointed at the new collection in one atomic alias update.
+#
+#   python -m scripts.reembed_collections goal_builder goal_builder_v2 \
+#       --alias goal_builder --model text-embedding-3-small --dimensions 512 \
+#       --batch-size 256 --concurrency 4
+#
+#   python -m scripts.reembed_collections activity activity_v2 \
+#       --from-collection activity --alias activity --model text-embedding-3-small
+#
+# The services read QDRANT_GOAL_BUILDER_COLLECTION_NAME / QDRANT_ACTIVITY_COLLECTION_NAME,
+# so those settings should hold the alias name, not a physical collection name.
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()  # make sure POSTGRES_* etc. are in the environment
+
+from sqlalchemy import text
+from qdrant_client.http import models
+
+from app.config.config import settings
+from app.data.dbinit import SessionLocal
+from app.common.embedding import get_embeddings, EMBEDDING_MODEL
+from app.common.qdrant_common import QdrantClient, ensure_collection
+
+
+# Postgres sources yield (key, text, ...) rows ordered by key. The key doubles as the
+# point id, so replaying a batch after a crash overwrites instead of duplicating.
+SQL_SOURCES = {
+    "goal_builder": """
+        SELECT plan_id::text AS key, prompt_text AS text, session_id::text AS session_id
+        FROM goal_builder
+        WHERE plan_id::text > :after
+        ORDER BY plan_id::text
+    """,
+}
+
+# Collection sources are re-embedded from the points of the collection they are
+# scrolled from: collection read by default, payload field holding the embedded text.
+COLLECTION_SOURCES = {
+    "activity": (settings.QDRANT_ACTIVITY_COLLECTION_NAME, "activity"),
+}
+
+
+_collection_lock = asyncio.Lock()
+
+
+def build_payload(source: str, row) -> dict:
+    return {"text": row.text, "session_id": row.session_id, "plan_id": row.key}
+
+
+async def sql_batches(args, after: str):
+    """Batches of (point id, text, payload) streamed from Postgres, with the key to resume after."""
+    async with SessionLocal() as db:
+        result = await db.stream(
+            text(SQL_SOURCES[args.source]).execution_options(yield_per=args.batch_size),
+            {"after": after}
+        )
+        async for rows in result.partitions(args.batch_size):
+            points = [(str(uuid.UUID(row.key)), row.text, build_payload(args.source, row)) for row in rows]
+            yield points, rows[-1].key
+
+
+async def collection_batches(client, args, offset):
+    """
+    Batches of (point id, text, payload) scrolled from the current collection, with the
+    offset of the next page. A None offset means the collection has been read to the end.
+    """
+    from_collection, text_field = COLLECTION_SOURCES[args.source]
+    from_collection = args.from_collection or from_collection
+    if from_collection == args.target:
+        raise SystemExit(f"Cannot re-embed {from_collection} into itself, build a new collection and swap the alias")
+    if offset is None:
+        return
+    offset = offset or None
+    while True:
+        records, offset = await client.scroll(
+            collection_name=from_collection,
+            limit=args.batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False
+        )
+        if records:
+            yield [(record.id, (record.payload or {}).get(text_field), record.payload) for record in records], offset
+        if offset is None:
+            return
+
+
+class Checkpoint:
+    """
+    Position that is known to be upserted up to, together with the rows done so far:
+    the last key for Postgres sources, the next scroll offset for collection sources.
+    Batches finish out of order, so the position only moves past a batch once every
+    batch before it has finished too.
+    """
+
+    def __init__(self, path: str, source: str, target: str):
+        self.path = path
+        self.state = {"source": source, "target": target, "last_key": "", "rows_done": 0}
+        self.pending = {}
+        self.next_seq = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("source") != source or saved.get("target") != target:
+                raise SystemExit(f"Checkpoint {path} belongs to {saved.get('source')} -> {saved.get('target')}")
+            self.state = saved
+
+    def done(self, seq: int, last_key: str, n_rows: int):
+        self.pending[seq] = (last_key, n_rows)
+        advanced = False
+        while self.next_seq in self.pending:
+            key, rows = self.pending.pop(self.next_seq)
+            self.state["last_key"] = key
+            self.state["rows_done"] += rows
+            self.next_seq += 1
+            advanced = True
+        if advanced:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+
+
+async def process_batch(client, args, points, resume_key, seq, checkpoint, stats):
+    texts = [text or "" for _, text, _ in points]
+    vectors = await get_embeddings(texts, model=args.model, dimensions=args.dimensions)
+    async with _collection_lock:
+        # the first batch to finish creates the collection, its vectors give the size
+        await ensure_collection(client, args.target, len(vectors[0]))
+    await client.upsert(
+        collection_name=args.target,
+        points=[
+            models.PointStruct(id=point_id, vector=vector, payload=payload)
+            for (point_id, _, payload), vector in zip(points, vectors)
+        ],
+        wait=True
+    )
+    checkpoint.done(seq, resume_key, len(points))
+    stats["rows"] += len(points)
+
+
+async def swap_alias(client, alias: str, target: str):
+    existing = await client.get_aliases()
+    operations = [
+        models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias))
+        for item in existing.aliases if item.alias_name == alias
+    ]
+    operations.append(
+        models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=alias))
+    )
+    # one request, so readers never see the alias missing
+    await client.update_collection_aliases(change_aliases_operations=operations)
+    print(f"alias {alias} -> {target}")
+
+
+async def reembed(args):
+    checkpoint_path = args.checkpoint or f".reembed_{args.source}_{args.target}.json"
+    checkpoint = Checkpoint(checkpoint_path, args.source, args.target)
+    if checkpoint.state["last_key"] != "":
+        print(f"resuming after key {checkpoint.state['last_key']} ({checkpoint.state['rows_done']} rows done)")
+
+    client = QdrantClient()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stats = {"rows": 0}
+    tasks = set()
+    failures = []
+    started = time.perf_counter()
+    last_report = started
+
+    async def run(points, resume_key, seq):
+        try:
+            await process_batch(client, args, points, resume_key, seq, checkpoint, stats)
+        except Exception as e:
+            failures.append(e)
+        finally:
+            semaphore.release()
+
+    if args.source in SQL_SOURCES:
+        batches = sql_batches(args, checkpoint.state["last_key"])
+    else:
+        batches = collection_batches(client, args, checkpoint.state["last_key"])
+
+    try:
+        seq = 0
+        async for points, resume_key in batches:
+            # bounds the number of batches in flight, and with it memory use
+            await semaphore.acquire()
+            task = asyncio.create_task(run(points, resume_key, seq))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            seq += 1
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                print(f"{stats['rows']} rows, {stats['rows'] / (now - started):.1f} rows/sec")
+                last_report = now
+            if failures:
+                break
+        await batches.aclose()
+        await asyncio.gather(*tasks)
+        if failures:
+            raise RuntimeError(f"{len(failures)} batches failed, run again to resume from {checkpoint_path}") from failures[0]
+
+        elapsed = time.perf_counter() - started
+        print(f"re-embedded {stats['rows']} rows into {args.target} in {elapsed:.1f}s "
+              f"({stats['rows'] / max(elapsed, 1e-9):.1f} rows/sec)")
+
+        if args.alias:
+            await swap_alias(client, args.alias, args.target)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed goal builder or activity rows into a new Qdrant collection")
+    parser.add_argument("source", choices=sorted([*SQL_SOURCES, *COLLECTION_SOURCES]))
+    parser.add_argument("target", help="collection to build")
+    parser.add_argument("--from-collection", help="collection (or alias) to scroll for collection sources, "
+                                                  "defaults to the configured one")
+    parser.add_argument("--alias", help="alias to point at the target once the backfill is done")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--dimensions", type=int, default=None, help="output size for text-embedding-3 models")
+    parser.add_argument("--batch-size", type=int, default=256, help="rows per embedding call and upsert")
+    parser.add_argument("--concurrency", type=int, default=4, help="batches in flight")
+    parser.add_argument("--checkpoint", help="checkpoint file, defaults to .reembed_<source>_<target>.json")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    asyncio.run(reembed(parser.parse_args()))
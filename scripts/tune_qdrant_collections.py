@@ -0,0 +1,39 @@
+# scripts/tune_qdrant_collections.py
+#
+# One-off admin step that adds the keyword payload indexes and the int8 quantization
+# (see app/common/qdrant_common.py) to collections created before them. Changing the
+# quantization makes Qdrant re-optimize the collection in the background, so run it
+# outside peak traffic. Collections created by ensure_collection are tuned already.
+#
+#   python -m scripts.tune_qdrant_collections                 # the configured collections
+#   python -m scripts.tune_qdrant_collections goal_builder_v2  # named collections
+#
+import argparse
+import asyncio
+
+from dotenv import load_dotenv
+
+load_dotenv()  # make sure QDRANT_* etc. are in the environment
+
+from app.config.config import settings
+from app.common.qdrant_common import QdrantClient, tune_collection
+
+
+async def main(args):
+    names = args.collections or [settings.QDRANT_GOAL_BUILDER_COLLECTION_NAME, settings.QDRANT_ACTIVITY_COLLECTION_NAME]
+    client = QdrantClient()
+    try:
+        for name in names:
+            if not await client.collection_exists(name):
+                print(f"skipping {name}, no such collection")
+                continue
+            await tune_collection(client, name)
+            print(f"tuned {name}")
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add payload indexes and quantization to existing Qdrant collections")
+    parser.add_argument("collections", nargs="*", help="collection names, default the configured goal builder and activity collections")
+    asyncio.run(main(parser.parse_args()))